@@ -1,23 +1,52 @@
-from nltk.corpus import stopwords
-from sklearn.feature_extraction.text import TfidfVectorizer
-import pandas as pd
-
+import collections
+import threading
 import warnings
 
+import keyword_rank
+import tokenizer
+import transcript
+
+
+def frequent_words(word_num, high=30, low=10):
+    more_than_30 = []
+    more_than_10 = []
+    for word, count in word_num.items():
+        if int(count) >= high:
+            more_than_30.append(word)
+        elif high > int(count) >= low:
+            more_than_10.append(word)
+
+    return more_than_30, more_than_10
+
 
 class AnalyzeText:
-    def __init__(self, speakers, speaker_count, random_keywords_count):
+    def __init__(self, speakers, speaker_count, random_keywords_count,
+                 idf_index=None, language_code="en-US",
+                 frequent_counts=(30, 10)):
         self.speakers = speakers
         self.speaker_count = speaker_count
-        self.stopword_set = set(stopwords.words('english'))
-        self.stopword_set = self.stopword_set.union(
-            set(speaker.strip() for speaker in self.speakers))
+        # Word counts and keywords share one tokenizer and stopword set,
+        # chosen by the meeting language.
+        self.tokenize = tokenizer.tokenizer_for(language_code)
+        self.language_stopwords = tokenizer.stopwords_for(language_code)
         self.random_keywords_count = random_keywords_count
+        # Counts at which a word is "mentioned more than" 30 / 10 times
+        self.frequent_counts = frequent_counts
+        # Optional idf_index.IdfIndex over past meetings; without it the
+        # suggestions are fitted on this meeting alone.
+        self.idf_index = idf_index
+
+    @property
+    def stopword_set(self):
+        # Built from the current speaker names so renames are picked up.
+        return self.language_stopwords.union(
+            word for speaker in self.speakers for word in self.tokenize(speaker))
 
     def word_count(self, output):
+        stopword_set = self.stopword_set
         word_num = {}
-        for word in output.lower().split():
-            if word not in self.stopword_set:
+        for word in self.tokenize(output):
+            if word not in stopword_set:
                 if word not in word_num:
                     word_num[word] = 1
                 else:
@@ -25,33 +54,93 @@ class AnalyzeText:
 
         return word_num
 
-    def analyze(self, output):
-        word_num = self.word_count(output)
+    def word_counter(self):
+        """Return a WordCounter to be fed final results during the meeting."""
+        return WordCounter(self)
+
+    def analyze(self, output, word_counter=None, name=None):
+        """Return the frequent words and keyword suggestions for `output`.
+
+        `name` is the meeting's export filename if it has one; a meeting
+        already in the IDF index is then scored without being counted twice.
+        """
+        if word_counter is not None:
+            word_num = word_counter.counts()
+        else:
+            word_num = self.word_count(output)
+
+        more_than_30, more_than_10 = frequent_words(word_num,
+                                                    *self.frequent_counts)
 
-        more_than_30 = []
-        more_than_10 = []
-        for word, count in word_num.items():
-            if int(count) >= 30:
-                more_than_30.append(word)
-            elif 30 > int(count) >= 10:
-                more_than_10.append(word)
+        stop_words = self.stopword_set
+        if self.idf_index is not None:
+            terms, scores = self.idf_index.scores(output, stop_words, name=name)
+            random_keywords = [terms[i] for i in keyword_rank.top_k(
+                scores, self.random_keywords_count)]
+            return more_than_30, more_than_10, random_keywords
+
+        # Only needed without an IDF index; sklearn is slow to import.
+        from sklearn.feature_extraction.text import TfidfVectorizer
 
         warnings.filterwarnings('ignore')
-        tfidf_vectorizer = TfidfVectorizer(analyzer='word',
-                                           stop_words=sorted(
-                                               list(self.stopword_set.union(
-                                                   name.strip(': ')
-                                                   for name in self.speakers)))
-                                           )
+        tfidf_vectorizer = TfidfVectorizer(
+            analyzer=lambda text: [word for word in self.tokenize(text)
+                                   if word not in stop_words])
         tfidf_vectors = tfidf_vectorizer.fit_transform([output])
         first_tfidf_vector = tfidf_vectors[0]
-        random_keywords = pd.DataFrame(first_tfidf_vector.T.todense(),
-                                       index=tfidf_vectorizer.
-                                       get_feature_names(),
-                                       columns=["tfidf"])
-        random_keywords = random_keywords.sort_values(by=["tfidf"],
-                                                      ascending=False)
-        random_keywords = random_keywords.head(
-            self.random_keywords_count).index.tolist()
+        random_keywords = keyword_rank.top_keywords(
+            first_tfidf_vector.data, first_tfidf_vector.indices,
+            tfidf_vectorizer.get_feature_names(), self.random_keywords_count)
 
         return more_than_30, more_than_10, random_keywords
+
+
+class WordCounter:
+    """Word counts kept up to date as final results arrive.
+
+    Gives the same counts as ``AnalyzeText.word_count`` on the rendered
+    transcript without re-reading it. Raw counts are kept for every token and
+    the stopword set is applied when counts are read, so changes to the
+    stopwords need no recount. Speaker name prefixes are counted per line
+    rather than per word, so a rename only changes which tokens those line
+    counts are credited to.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self._counts = collections.Counter()
+        self._lines = collections.Counter()
+        # Number of distinct words seen before each speaker's first line,
+        # used to list words in the order they first appear in the text.
+        self._first_line = {}
+        self._lock = threading.Lock()
+
+    def add(self, speaker, text):
+        """Count one final result said by speaker index `speaker`."""
+        with self._lock:
+            if speaker not in self._first_line:
+                self._first_line[speaker] = len(self._counts)
+            self._lines[speaker] += 1
+            self._counts.update(self.analyzer.tokenize(text))
+
+    def counts(self):
+        """Return {word: count} in first-appearance order, like word_count."""
+        stopword_set = self.analyzer.stopword_set
+        with self._lock:
+            order = dict((word, rank) for rank, word in enumerate(self._counts))
+            merged = collections.Counter(self._counts)
+            for speaker, lines in self._lines.items():
+                # Name words come just before the words of the first line.
+                rank = self._first_line[speaker] - 0.5
+                name = transcript.speaker_name(self.analyzer.speakers, speaker)
+                for word in self.analyzer.tokenize(name):
+                    merged[word] += lines
+                    order[word] = min(order.get(word, rank), rank)
+
+        words = sorted((word for word in merged if word not in stopword_set),
+                       key=order.__getitem__)
+        return collections.OrderedDict((word, merged[word]) for word in words)
+
+    def snapshot(self):
+        """Return (more_than_30, more_than_10) for the meeting so far."""
+        return frequent_words(self.counts(), *self.analyzer.frequent_counts)
@@ -0,0 +1,192 @@
+"""Recorders that compress meeting audio while it is captured.
+
+``recorder(codec, filename, sample_rate)`` returns an object with the
+WavRecorder interface (write, close, duration, data_size), so it can be used
+anywhere a WavRecorder is. For FLAC and Opus, ``write`` only queues the
+frames; a worker thread encodes them, so capture only waits on the encoder
+if it falls more than ``MAX_QUEUED`` writes behind.
+
+FLAC and Opus are written with the soundfile package (libsndfile; Opus needs
+SoundFile 0.11 and libsndfile 1.0.29 or later), which is only imported when
+one is used.
+"""
+import os
+import queue
+import threading
+import time
+
+import wav_recorder
+
+LINEAR16 = "linear16"
+FLAC = "flac"
+OGG_OPUS = "ogg_opus"
+
+# codec -> (file extension, RecognitionConfig.AudioEncoding name,
+#           soundfile format, soundfile subtype)
+CODECS = {
+    LINEAR16: (".wav", "LINEAR16", None, None),
+    FLAC: (".flac", "FLAC", "FLAC", "PCM_16"),
+    OGG_OPUS: (".opus", "OGG_OPUS", "OGG", "OPUS"),
+}
+
+# Opus only encodes these rates; Cloud Speech accepts the same ones.
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# Writes queued for the encoder before ``write`` blocks: about a minute of
+# 100 ms chunks.
+MAX_QUEUED = 600
+# How often the encoder flushes the file, so a crash loses at most this many
+# seconds of a long recording.
+FLUSH_SECONDS = 30
+
+
+def _codec(codec):
+    if codec not in CODECS:
+        raise ValueError("Unknown audio codec %r, expected one of %s"
+                         % (codec, ", ".join(sorted(CODECS))))
+    return CODECS[codec]
+
+
+def extension(codec):
+    return _codec(codec)[0]
+
+
+def recognition_encoding(codec):
+    """The RecognitionConfig.AudioEncoding name for files in `codec`."""
+    return _codec(codec)[1]
+
+
+def recorder(codec, filename, sample_rate, channels=1, sample_width=2):
+    """Open a recorder writing `filename` (with its extension) in `codec`."""
+    _codec(codec)
+    if codec == LINEAR16:
+        return wav_recorder.WavRecorder(filename, sample_rate,
+                                        channels=channels,
+                                        sample_width=sample_width)
+    return EncodingRecorder(codec, filename, sample_rate, channels=channels,
+                            sample_width=sample_width)
+
+
+def read_pcm(path):
+    """Decode a recording written by `recorder` back to 16-bit PCM bytes."""
+    if path.endswith(".wav"):
+        import wave
+
+        with wave.open(path, 'rb') as f:
+            return f.readframes(f.getnframes())
+    import soundfile
+
+    samples, _ = soundfile.read(path, dtype='int16')
+    return samples.tobytes()
+
+
+class EncodingRecorder(object):
+    """Compresses PCM frames to FLAC or Ogg Opus on a worker thread.
+
+    Frames are copied into a queue of at most `max_queued` writes by
+    ``write`` and encoded in the order they arrived; the file is flushed
+    every `flush_seconds`. ``close`` waits until everything queued has been
+    written. Once the encoder has failed, every later ``write`` and
+    ``close`` raises its error.
+    """
+
+    def __init__(self, codec, filename, sample_rate, channels=1,
+                 sample_width=2, max_queued=MAX_QUEUED,
+                 flush_seconds=FLUSH_SECONDS):
+        import soundfile
+
+        if sample_width != 2:
+            raise ValueError("Only 16-bit audio can be encoded")
+        _, _, file_format, subtype = _codec(codec)
+        if subtype not in soundfile.available_subtypes(file_format):
+            raise ValueError(
+                "This soundfile/libsndfile can't write %s (%s needs SoundFile"
+                " 0.11 and libsndfile 1.0.29 or later); use %s or %s instead"
+                % (codec, subtype, FLAC, LINEAR16))
+        if codec == OGG_OPUS and sample_rate not in OPUS_SAMPLE_RATES:
+            raise ValueError("Opus can't encode %d Hz audio" % sample_rate)
+
+        self.codec = codec
+        self.filename = filename
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.data_size = 0
+
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = soundfile.SoundFile(filename, 'w', samplerate=sample_rate,
+                                         channels=channels, format=file_format,
+                                         subtype=subtype)
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(max_queued)
+        self._error = None
+        self._closed = False
+        self._worker = threading.Thread(target=self._encode, daemon=True)
+        self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def duration(self):
+        """Seconds of audio written so far."""
+        return self.data_size / float(self.sample_rate * self.channels
+                                      * self.sample_width)
+
+    def _raise_error(self):
+        # Kept, so nothing more is accepted once part of the audio is lost.
+        if self._error is not None:
+            raise self._error
+
+    def write(self, data):
+        """Queue raw frames (bytes, bytearray or memoryview) for encoding."""
+        self._raise_error()
+        # Ring buffer views are reused by the capture thread; keep a copy.
+        data = bytes(data)
+        self.data_size += len(data)
+        self._queue.put(data)
+
+    def _encode(self):
+        frame_size = self.channels * self.sample_width
+        leftover = b''
+        next_flush = time.monotonic() + self.flush_seconds
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                data = leftover + data
+                usable = len(data) - len(data) % frame_size
+                leftover = data[usable:]
+                if usable:
+                    self._file.buffer_write(data[:usable], dtype='int16')
+                if time.monotonic() >= next_flush:
+                    self._file.flush()
+                    next_flush = time.monotonic() + self.flush_seconds
+            except Exception as error:
+                self._error = error
+        try:
+            self._file.close()
+        except Exception as error:
+            if self._error is None:
+                self._error = error
+
+    def close(self):
+        if self._closed:
+            self._raise_error()
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        self._raise_error()
@@ -0,0 +1,119 @@
+"""Re-run the analysis over every exported transcript in a directory.
+
+Usage: python batch_analyze.py [directory] [--workers N] [--chunksize N]
+
+Writes ``<meeting>.analysis.json`` next to each ``<meeting>.txt`` with the
+same word lists and suggestions Dolly prints after a meeting, using the
+current stopwords and thresholds. Runs headless on a process pool.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import analyze_text
+import idf_index
+import tokenizer
+import transcript
+
+SIDECAR_SUFFIX = ".analysis.json"
+
+_options = None
+_index = None
+
+
+def _init_worker(options, index_path):
+    global _options, _index
+    _options = options
+    _index = idf_index.IdfIndex.load(index_path) if index_path else None
+
+
+def analyze_file(path):
+    """Analyze one exported transcript and write its sidecar; return its size."""
+    text = transcript.load_export_text(path)
+    speakers = transcript.export_speakers(text)
+    language_code = _options.language
+    if language_code == "auto":
+        language_code = tokenizer.detect_language(text)
+
+    analyzer = analyze_text.AnalyzeText(
+        speakers=speakers, speaker_count=len(speakers),
+        random_keywords_count=_options.keywords, idf_index=_index,
+        language_code=language_code,
+        frequent_counts=(_options.high, _options.low))
+    # Every transcript here is in the index already.
+    more_than_30, more_than_10, random_keywords = analyzer.analyze(
+        text, name=os.path.basename(path))
+
+    result = {
+        "transcript": os.path.basename(path),
+        "language_code": language_code,
+        "speakers": [speaker.strip(": ") for speaker in speakers],
+        "more_than_30": more_than_30,
+        "more_than_10": more_than_10,
+        "random_keywords": random_keywords,
+    }
+    sidecar = path[:-len(".txt")] + SIDECAR_SUFFIX
+    with open(sidecar, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    return len(text.encode("utf-8"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("directory", nargs="?", default="output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="transcripts per task (default: automatic)")
+    parser.add_argument("--language", default="auto",
+                        help="meeting language code, or auto to detect")
+    parser.add_argument("--keywords", type=int, default=5)
+    parser.add_argument("--high", type=int, default=30)
+    parser.add_argument("--low", type=int, default=10)
+    parser.add_argument("--index", default=None,
+                        help="IDF index path (default: <directory>/idf_index.npz)")
+    options = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(options.directory, "*.txt")))
+    if not paths:
+        print("No transcripts in " + options.directory)
+        return
+
+    # Bring the archive index up to date once, then share it read-only.
+    index_path = options.index or os.path.join(options.directory,
+                                               "idf_index.npz")
+    idf_index.IdfIndex.open(index_path, options.directory)
+
+    chunksize = options.chunksize or max(1, len(paths) // (options.workers * 4))
+    start = time.time()
+    last_report = 0
+    done = 0
+    total_bytes = 0
+    pool = multiprocessing.Pool(options.workers, initializer=_init_worker,
+                                initargs=(options, index_path))
+    try:
+        for size in pool.imap_unordered(analyze_file, paths, chunksize):
+            done += 1
+            total_bytes += size
+            now = time.time()
+            if now - last_report >= 0.5 or done == len(paths):
+                last_report = now
+                sys.stderr.write("\r%d/%d transcripts, %.1f/s" % (
+                    done, len(paths), done / (now - start)))
+                sys.stderr.flush()
+    finally:
+        pool.close()
+        pool.join()
+
+    elapsed = time.time() - start
+    sys.stderr.write("\n")
+    print("Analyzed %d transcripts (%.1f MB) in %.1f s: %.1f transcripts/s, "
+          "%.2f MB/s" % (done, total_bytes / 1e6, elapsed, done / elapsed,
+                         total_bytes / 1e6 / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compare the audio codecs by size and encode CPU per audio minute.
+
+Usage: python benchmarks/bench_audio_codec.py [minutes] [codecs...]
+
+Records synthetic speech-like audio (pitched, syllable-modulated tones over
+background noise, with pauses) at 16 kHz through audio_codec.recorder, in
+100 ms writes as the microphone delivers them, and reports the file size,
+process CPU time (including the encoder thread) and the longest write()
+call, which is how long capture would have been held up.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_codec  # noqa: E402
+
+SAMPLE_RATE = 16000
+CHUNK = SAMPLE_RATE // 10
+
+
+def speech_like(seconds, seed=0):
+    rng = np.random.RandomState(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / float(SAMPLE_RATE)
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    talking = (np.sin(2 * np.pi * 0.1 * t) > -0.5)
+    signal = 3000 * voice * syllables * talking + 60 * rng.randn(len(t))
+    return np.clip(signal, -32768, 32767).astype('<i2').tobytes()
+
+
+def run(codec, pcm, directory):
+    path = os.path.join(directory, "bench" + audio_codec.extension(codec))
+    longest_write = 0
+    cpu = time.process_time()
+    wall = time.time()
+    with audio_codec.recorder(codec, path, SAMPLE_RATE) as recorder:
+        for start in range(0, len(pcm), CHUNK * 2):
+            before = time.time()
+            recorder.write(pcm[start:start + CHUNK * 2])
+            longest_write = max(longest_write, time.time() - before)
+    return (os.path.getsize(path), time.process_time() - cpu,
+            time.time() - wall, longest_write)
+
+
+def main(minutes, codecs):
+    pcm = speech_like(minutes * 60)
+    directory = tempfile.mkdtemp()
+    try:
+        print("%10s %14s %8s %14s %14s %12s" % (
+            "codec", "KB/audio min", "ratio", "CPU s/min", "wall s/min",
+            "max write ms"))
+        for codec in codecs:
+            size, cpu, wall, longest = run(codec, pcm, directory)
+            print("%10s %14.1f %7.2fx %14.3f %14.3f %12.3f" % (
+                codec, size / 1024.0 / minutes, len(pcm) / float(size),
+                cpu / minutes, wall / minutes, longest * 1000))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    main(minutes, sys.argv[2:] or [audio_codec.LINEAR16, audio_codec.FLAC,
+                                   audio_codec.OGG_OPUS])
@@ -0,0 +1,57 @@
+"""Compare pandas sort-and-head with keyword_rank.top_keywords.
+
+Usage: python benchmarks/bench_keyword_rank.py [vocabulary sizes...]
+
+Builds a random sparse TF-IDF row for each vocabulary size and times both
+ways of picking the top 5 words. pandas is only needed for the comparison.
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import keyword_rank  # noqa: E402
+
+K = 5
+
+
+def pandas_top(data, indices, feature_names, size):
+    dense = np.zeros(size)
+    dense[indices] = data
+    frame = pd.DataFrame(dense, index=feature_names, columns=["tfidf"])
+    frame = frame.sort_values(by=["tfidf"], ascending=False)
+    return frame.head(K).index.tolist()
+
+
+def main(sizes):
+    rng = np.random.RandomState(0)
+    print("%10s %12s %12s %8s" % ("vocab", "pandas ms", "top_k ms", "speedup"))
+    for size in sizes:
+        feature_names = ["w%07d" % i for i in range(size)]
+        indices = np.sort(rng.choice(size, size // 2, replace=False))
+        # Quantised scores so there are plenty of ties to break.
+        data = np.round(rng.rand(len(indices)), 3)
+
+        expected = pandas_top(data, indices, feature_names, size)
+        result = keyword_rank.top_keywords(data, indices, feature_names, K)
+        # pandas orders ties arbitrarily; compare the scores, not the words.
+        score = dict(zip((feature_names[i] for i in indices), data))
+        assert [score[w] for w in result] == [score[w] for w in expected]
+
+        number = 20
+        slow = timeit.timeit(
+            lambda: pandas_top(data, indices, feature_names, size),
+            number=number) / number
+        fast = timeit.timeit(
+            lambda: keyword_rank.top_keywords(data, indices, feature_names, K),
+            number=number) / number
+        print("%10d %12.3f %12.3f %7.1fx" % (size, slow * 1000, fast * 1000,
+                                             slow / fast))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000, 1000000])
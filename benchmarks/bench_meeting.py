@@ -0,0 +1,165 @@
+"""Run whole meetings against the local recognizer and time every stage.
+
+Usage: python benchmarks/bench_meeting.py [--speed 200] [--paths stream,split,async]
+                                          [minutes...]
+
+Each meeting (1 minute to 8 hours by default) is a minute of synthetic
+speech-like audio played in a loop by speech_to_text.AudioFileStream at
+`speed` times real time, transcribed by recognizer_backend.SyntheticRecognizer
+and then analyzed, in a fresh process per run so memory is measured per
+meeting. Reported per run:
+
+* responses/s  recognizer responses (interim and final) or long-running
+               results handled per second of wall time
+* latency      streaming: mean and worst time from the end of an utterance's
+               audio to its line being shown, in real-time seconds;
+               long paths: time from the end of the audio to the transcript
+* analysis     word counts and keyword suggestions for the transcript
+* peak RSS     maximum resident memory of the run's process
+"""
+import argparse
+from concurrent import futures
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import audio_codec  # noqa: E402
+from bench_audio_codec import speech_like  # noqa: E402
+from job_manager import RecognitionJobManager  # noqa: E402
+import recognizer_backend  # noqa: E402
+from renderer import TerminalRenderer  # noqa: E402
+import speech_to_text  # noqa: E402
+from storage_backend import LocalStorageBackend  # noqa: E402
+import wav_recorder  # noqa: E402
+
+SAMPLE_RATE = 16000
+CHUNK = SAMPLE_RATE // 10
+SPEAKERS = ["Alice: ", "Bob: "]
+
+
+class CountingRenderer(TerminalRenderer):
+    def __init__(self):
+        super(CountingRenderer, self).__init__(quiet=True)
+        self.responses = 0
+
+    def interim(self, text):
+        self.responses += 1
+
+    def final(self, line):
+        self.responses += 1
+
+
+class TimedSpeechToText(speech_to_text.SpeechToText):
+    """Notes when each streaming result is added, to measure latency."""
+
+    def __init__(self, config, renderer, speed):
+        super(TimedSpeechToText, self).__init__(config, renderer=renderer)
+        self.speed = speed
+        self.started = None
+        self.latencies = []
+
+    def add_result(self, meeting, result, *args, **kwargs):
+        segment = super(TimedSpeechToText, self).add_result(
+            meeting, result, *args, **kwargs)
+        if self.started is not None:
+            audio_end = self.started + segment.end / self.speed
+            self.latencies.append((time.time() - audio_end) * self.speed)
+        return segment
+
+
+def run_meeting(path, minutes, speed, source):
+    import analyze_text
+    import idf_index
+
+    seconds = minutes * 60
+    recognizer = recognizer_backend.SyntheticRecognizer(speed=speed * 20)
+    config = speech_to_text.SpeechToTextConfig(
+        SPEAKERS, len(SPEAKERS), SAMPLE_RATE, CHUNK, "en-US",
+        r'\b(exit|quit)\b',
+        storage_backend=LocalStorageBackend("uploads"),
+        job_manager=RecognitionJobManager(recognizer, min_interval=0.01,
+                                          max_interval=0.1),
+        streaming_limit=speech_to_text.STREAMING_LIMIT / float(speed),
+        codec=audio_codec.LINEAR16, recognizer=recognizer,
+        # The limit above is in wall time; the default buffer holds a
+        # session of audio time.
+        audio_source=lambda rate, chunk, **kwargs: speech_to_text.AudioFileStream(
+            rate, chunk, source, speed=speed, duration=seconds))
+    renderer = CountingRenderer()
+    stt = TimedSpeechToText(config, renderer, speed)
+
+    started = time.time()
+    stt.started = started
+    if path == "stream":
+        meeting = stt.short_stream_meet()
+        latency = stt.latencies
+        responses = renderer.responses
+    else:
+        # Long paths: how long after the end of the audio the transcript is
+        # ready.
+        stt.started = None
+        if path == "split":
+            meeting = stt.long_split_meet(seconds)
+        else:
+            meeting = stt.long_asynchronous_meet(seconds)
+        latency = [(time.time() - (started + seconds / float(speed)))]
+        responses = len(meeting)
+    elapsed = time.time() - started
+
+    analysis_started = time.time()
+    analyzer = analyze_text.AnalyzeText(SPEAKERS, len(SPEAKERS), 5,
+                                        idf_index=idf_index.IdfIndex())
+    analyzer.analyze(meeting.render())
+    analysis = time.time() - analysis_started
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (len(meeting), responses / elapsed, sum(latency) / max(1, len(latency)),
+            max(latency or [0]), analysis, peak_kb / 1024.0)
+
+
+def _in_directory(directory, *args):
+    os.chdir(directory)
+    # The long paths print progress; keep the table readable.
+    sys.stdout = open(os.devnull, "w")
+    return run_meeting(*args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("minutes", nargs="*", type=float,
+                        default=[1, 10, 60, 480])
+    parser.add_argument("--speed", type=float, default=200)
+    parser.add_argument("--paths", default="stream,split,async")
+    options = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    try:
+        source = os.path.join(directory, "speech.wav")
+        with wav_recorder.WavRecorder(source, SAMPLE_RATE) as recorder:
+            recorder.write(speech_like(60))
+
+        print("%6s %8s %9s %12s %12s %12s %10s %10s" % (
+            "path", "minutes", "segments", "responses/s", "latency s",
+            "worst s", "analysis s", "peak MB"))
+        for path in options.paths.split(","):
+            for minutes in options.minutes:
+                run_directory = tempfile.mkdtemp(dir=directory)
+                with futures.ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(_in_directory, run_directory,
+                                             path, minutes, options.speed,
+                                             source).result()
+                shutil.rmtree(run_directory)
+                print("%6s %8g %9d %12.1f %12.3f %12.3f %10.3f %10.1f"
+                      % ((path, minutes) + result))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
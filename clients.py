@@ -0,0 +1,110 @@
+"""Process-wide registry of the cloud and audio clients.
+
+Each client is created once, on first use or by warm_up() in the
+background at startup, and reused by every meeting and mode afterwards.
+"""
+import threading
+
+SPEECH_ADDRESS = "speech.googleapis.com:443"
+# Ping an idle connection every 30 s so it is still open (and its TLS
+# session and auth token still valid) when the next meeting starts,
+# rather than reconnecting in front of the first result.
+KEEPALIVE_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+]
+DEFAULT_CREDENTIALS_FILE = "Dolly-secret.json"
+
+_lock = threading.Lock()
+# Held while a bucket is looked up, which takes a request; separate from
+# _lock, which storage_client() takes inside it.
+_bucket_lock = threading.Lock()
+_speech_client = None
+_speech_channel = None
+_audio_interface = None
+_storage_clients = {}
+_buckets = {}
+
+
+def speech_client():
+    """Return the process-wide SpeechClient, creating it on first use.
+
+    It runs on one gRPC channel with keepalive, shared by streaming,
+    long-running and short synchronous recognitions.
+    """
+    global _speech_client, _speech_channel
+    with _lock:
+        if _speech_client is None:
+            from google.api_core import grpc_helpers
+            from google.cloud import speech_v1p1beta1 as speech
+            from google.cloud.speech_v1p1beta1.gapic.transports import \
+                speech_grpc_transport
+
+            transport_class = speech_grpc_transport.SpeechGrpcTransport
+            # What transport_class.create_channel does, but with channel
+            # options, which it only accepts from google-cloud-speech 1.2.
+            _speech_channel = grpc_helpers.create_channel(
+                SPEECH_ADDRESS, scopes=transport_class._OAUTH_SCOPES,
+                options=KEEPALIVE_OPTIONS)
+            _speech_client = speech.SpeechClient(
+                transport=transport_class(channel=_speech_channel))
+    return _speech_client
+
+
+def warm_speech_channel(timeout=10):
+    """Connect the speech channel now; return True once it is ready.
+
+    Credentials are loaded and the TCP and TLS handshakes done up front, so
+    the first request of a meeting doesn't wait for them.
+    """
+    import grpc
+
+    speech_client()
+    try:
+        grpc.channel_ready_future(_speech_channel).result(timeout=timeout)
+    except grpc.FutureTimeoutError:
+        return False
+    return True
+
+
+def storage_client(credentials_file=DEFAULT_CREDENTIALS_FILE):
+    """Return the Cloud Storage client for a service account file."""
+    with _lock:
+        client = _storage_clients.get(credentials_file)
+        if client is None:
+            from google.cloud import storage
+            client = storage.Client.from_service_account_json(credentials_file)
+            _storage_clients[credentials_file] = client
+    return client
+
+
+def storage_bucket(name, credentials_file=DEFAULT_CREDENTIALS_FILE):
+    """Return the bucket `name`, looked up once per process.
+
+    Upload threads asking for it at the same time wait for a single lookup.
+    """
+    key = (name, credentials_file)
+    with _bucket_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = storage_client(credentials_file).get_bucket(name)
+            _buckets[key] = bucket
+    return bucket
+
+
+def audio_interface():
+    """Return the process-wide PyAudio instance, creating it on first use.
+
+    Streams opened on it are closed by their users; the interface itself
+    stays up for the life of the process.
+    """
+    global _audio_interface
+    with _lock:
+        if _audio_interface is None:
+            import pyaudio
+            _audio_interface = pyaudio.PyAudio()
+    return _audio_interface
@@ -4,24 +4,116 @@
 # https://cloud.google.com/speech-to-text/docs/streaming-recognize#speech-streaming-recognize-python
 # https://cloud.google.com/speech-to-text/docs/multiple-voices
 
+import time
+
+# Timestamps for --startup-time, relative to when this module started loading.
+STARTUP = time.time()
+startup_marks = []
+
 import datetime
+import os
+import sys
+import threading
 
-import speech_to_text
-import analyze_text
+import audio_codec
+import clients
+import wake_word
 
-START_COMMAND = ["hey dolly", "hey, dolly"]
+# The transcription and analysis modules pull in google.cloud, pyaudio, nltk
+# and numpy. They are imported by warm_up() in the background while the user
+# answers the prompts, and by the stage that needs them otherwise.
+
+# 0 (strict) to 1 (lenient), see keyword_spotter.KeywordSpotter
+WAKE_WORD_SENSITIVITY = 0.5
 AVAILABLE_LANGUAGE = ["english", "korean", "japanese", "chinese"]
 SAMPLE_RATE = 16000
 CHUNK = int(SAMPLE_RATE // 10)  # 100ms
 RANDOM_KEYWORDS_COUNT = 5
+OUTPUT_DIRECTORY = "output"
+# Document frequencies over every exported meeting, for the suggestions
+IDF_INDEX_PATH = OUTPUT_DIRECTORY + "/idf_index.npz"
+# Transcribe meetings of any length live; when False, meetings over 5
+# minutes are recorded and transcribed as they go on instead
+LIVE_LONG_MEETINGS = True
+# Transcribe long meetings in silence-delimited chunks while recording
+SPLIT_LONG_MEETINGS = True
+# Codec for recorded and uploaded audio: "flac", "ogg_opus" or "linear16"
+AUDIO_CODEC = audio_codec.FLAC
+# Leave silence out of what is streamed and uploaded
+VOICE_GATING = True
+# Audio per streaming request, grown towards the maximum while behind
+MIN_REQUEST_MS = 100
+MAX_REQUEST_MS = 500
+# When the network falls behind: "drop" the oldest audio once the capture
+# buffer is full, or "spill" up to SPILL_SECONDS of it to disk
+BACKPRESSURE = "drop"
+SPILL_SECONDS = 3600
+# Pipeline latencies and counters, rewritten every METRICS_INTERVAL seconds
+METRICS_PATH = OUTPUT_DIRECTORY + "/metrics.prom"
+METRICS_INTERVAL = 10
+# Also serve them on http://127.0.0.1:<port>/metrics when set
+METRICS_PORT = None
+
+_export_lock = threading.Lock()
+
+
+def mark(stage):
+    startup_marks.append((stage, time.time() - STARTUP))
+
+
+def warm_up():
+    """Load the transcription stack and open the cloud and audio clients."""
+    import speech_to_text
+    mark("speech_to_text imported")
+    import analyze_text
+    import idf_index
+    import search_index
+    import transcript_file
+    mark("analysis imported")
+    if AUDIO_CODEC != audio_codec.LINEAR16:
+        import soundfile
+        mark("audio encoder imported")
+    if clients.warm_speech_channel():
+        mark("speech channel connected")
+    if not LIVE_LONG_MEETINGS and not SPLIT_LONG_MEETINGS \
+            and os.path.exists(clients.DEFAULT_CREDENTIALS_FILE):
+        # Long meetings are uploaded to Cloud Storage first.
+        clients.storage_client()
+        mark("storage client ready")
+    clients.audio_interface()
+    mark("audio interface ready")
+
+
+def start_warm_up():
+    thread = threading.Thread(target=warm_up, name="dolly-warm-up")
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def print_startup_time():
+    print("------")
+    print("Startup time:")
+    for stage, seconds in startup_marks:
+        print("%8.1f ms  %s" % (seconds * 1000, stage))
+    print("------")
 
 
 def instructions():
     print()
     print("Starting Dolly...\n")
+    mark("banner printed")
+    start_warm_up()
+
+    if not wake_word.enrolled():
+        # The wake word is recognized on this computer, from the user's
+        # own recordings of it.
+        print("First, let Dolly learn your voice saying 'Hey Dolly'.")
+        wake_word.enroll()
+        print()
 
     print("Start recording with 'Hey Dolly!'")
-    speech_to_text.SpeechToText().short_response(START_COMMAND)
+    wake_word.wait_for_wake_word(sensitivity=WAKE_WORD_SENSITIVITY)
     print()
 
     print("----- Welcome to Dolly! -----")
@@ -79,10 +171,10 @@ def instructions():
     return language_code, exit_command, speaker_count, speakers
 
 
-def output_and_modification(output, speakers, speaker_count):
+def output_and_modification(transcript, speakers, speaker_count):
     print("------")
     print("Dolly heard:")
-    print(output)
+    print(transcript)
     print("------")
 
     switch = ""
@@ -110,16 +202,18 @@ def output_and_modification(output, speakers, speaker_count):
 
             if int(answer) < len(speakers):
                 new_name = input("New name: ") + ": "
-                old_name = speakers[answer]
                 speakers[answer] = new_name
-                output = output.replace(old_name, new_name)
+                transcript.rename(answer, new_name)
                 print("======")
-                print(output)
+                print(transcript)
                 print("======")
-    return output
+    return transcript
+
 
+def print_export_analysis(transcript, more_than_30, more_than_10,
+                          random_keywords, name=None):
+    import transcript_file
 
-def print_export_analysis(output, more_than_30, more_than_10, random_keywords):
     print()
     print("------")
     print("Mentioned more than 30 times:")
@@ -138,15 +232,25 @@ def print_export_analysis(output, more_than_30, more_than_10, random_keywords):
     print("Exporting transcript...")
     print()
 
+    # Named after the current minute unless meetings running side by side
+    # need names of their own.
+    if name is None:
+        name = datetime.datetime.now().strftime("%Y-%m-%d_%H:%M")
+
+    # The binary file keeps word timings and confidences; the readable
+    # transcript is generated from it.
+    binary = transcript_file.write(transcript,
+                                   OUTPUT_DIRECTORY + "/" + name + ".dolly")
+    with transcript_file.TranscriptFile(binary) as exported:
+        output = exported.render()
+
     output += "\n------\n Mentioned more than 30 times: " + str(more_than_30)
     output += "\n------\n Mentioned more than 10 times: " + str(more_than_10)
     output += "\n------\n Dolly's random suggestions: " + str(random_keywords)
     output += "\n------\n"
 
-    now = datetime.datetime.now()
-    now = now.strftime("%Y-%m-%d_%H:%M")
-
-    f = open("output/" + now + ".txt", "x")
+    filename = OUTPUT_DIRECTORY + "/" + name + ".txt"
+    f = open(filename, "x")
     f.write(output)
     f.close()
 
@@ -154,15 +258,94 @@ def print_export_analysis(output, more_than_30, more_than_10, random_keywords):
     print("Finished exporting")
     print("======")
 
+    return filename
+
+
+def start_metrics():
+    import metrics
+
+    metrics.write_every(METRICS_PATH, METRICS_INTERVAL)
+    if METRICS_PORT is not None:
+        metrics.serve(METRICS_PORT)
+
+
+def speech_config(language_code, exit_command, speaker_count, speakers,
+                  sample_rate=SAMPLE_RATE, chunk=CHUNK, **kwargs):
+    """The SpeechToTextConfig for a meeting, with the settings above."""
+    import speech_to_text
+
+    return speech_to_text.SpeechToTextConfig(speakers, speaker_count,
+                                             sample_rate, chunk,
+                                             language_code, exit_command,
+                                             codec=AUDIO_CODEC,
+                                             voice_gating=VOICE_GATING,
+                                             min_request_ms=MIN_REQUEST_MS,
+                                             max_request_ms=MAX_REQUEST_MS,
+                                             backpressure=BACKPRESSURE,
+                                             spill_seconds=SPILL_SECONDS,
+                                             **kwargs)
+
+
+def meeting_analyzer(config, index):
+    import analyze_text
+
+    return analyze_text.AnalyzeText(
+        speakers=config.speakers, speaker_count=config.speaker_count,
+        random_keywords_count=RANDOM_KEYWORDS_COUNT, idf_index=index,
+        language_code=config.language_code)
+
+
+def meeting(config, index, name=None, renderer=None, modify=False,
+            recorder=None):
+    """A meeting_core.Meeting that is analyzed and exported when it ends.
+
+    With `modify`, the user is first asked to review the speakers, as after
+    a meeting from the microphone.
+    """
+    import meeting_core
+
+    analyzer = meeting_analyzer(config, index)
+    word_counter = analyzer.word_counter()
+
+    def analyze(transcript):
+        if modify:
+            transcript = output_and_modification(
+                transcript, config.speakers, config.speaker_count)
+        return analyze_and_export(transcript, analyzer, index, word_counter,
+                                  name=name)
+
+    return meeting_core.Meeting(config, name=name, renderer=renderer,
+                                word_counter=word_counter, analyze=analyze,
+                                recorder=recorder)
+
+
+def run_meetings(meetings):
+    """Run meetings side by side until all have ended; see meeting_core.
+
+    Returns each meeting's transcript or the exception it failed with.
+    """
+    import asyncio
+    import meeting_core
+    import metrics
+
+    results = asyncio.run(meeting_core.run_meetings(meetings))
+    metrics.write(METRICS_PATH)
+    return results
+
 
 def run(language_code, exit_command, speaker_count, speakers):
     global SAMPLE_RATE, CHUNK
 
-    config = speech_to_text.SpeechToTextConfig(speakers, speaker_count,
-                                               SAMPLE_RATE, CHUNK,
-                                               language_code, exit_command)
+    import idf_index
+
+    start_metrics()
+    config = speech_config(language_code, exit_command, speaker_count,
+                           speakers)
+    index = idf_index.IdfIndex.open(IDF_INDEX_PATH, OUTPUT_DIRECTORY)
 
-    short_or_long = ""
+    # Live sessions roll over every few minutes, so length only matters
+    # when long meetings are recorded instead.
+    short_or_long = "n" if LIVE_LONG_MEETINGS else ""
     while short_or_long not in ['y', 'n']:
         short_or_long = input("Will your meeting be "\
                               "over 5 minutes? (y/n): ").lower()
@@ -170,31 +353,97 @@ def run(language_code, exit_command, speaker_count, speakers):
     if short_or_long == 'n':
         print("Dolly is litening...")
         print()
-        text = speech_to_text.SpeechToText(config).short_stream_meet()
-    elif short_or_long == 'y':
-        time = ""
-        while not isinstance(time, int):
-            time = input("Approximately, how long will "\
-                         "your meeting be? (min): ")
-            try:
-                time = int(time)
-            except:
-                continue
-        print("Dolly is litening...")
-        print()
-        time = time * 60
-        text = speech_to_text.SpeechToText(config).long_asynchronous_meet(
-            seconds=time)
+        now = datetime.datetime.now()
+        now = now.strftime("%Y-%m-%d_%H:%M")
+        recorder = audio_codec.recorder(
+            AUDIO_CODEC, "output/audio_short_meeting/" + now
+            + audio_codec.extension(AUDIO_CODEC), SAMPLE_RATE)
+        # A live meeting runs on the asyncio core, like several rooms do.
+        [result] = run_meetings([meeting(config, index, modify=True,
+                                         recorder=recorder)])
+        if isinstance(result, Exception):
+            raise result
+        return
+
+    import metrics
+    import speech_to_text
+
+    # Long meetings are recorded and transcribed in the background with
+    # long-running recognitions, which the asyncio core doesn't run.
+    # Words are counted as results come in, so the analysis is ready as
+    # soon as the meeting ends.
+    analyzer = meeting_analyzer(config, index)
+    word_counter = analyzer.word_counter()
+    stt = speech_to_text.SpeechToText(config, word_counter=word_counter)
+    time = ""
+    while not isinstance(time, int):
+        time = input("Approximately, how long will "\
+                     "your meeting be? (min): ")
+        try:
+            time = int(time)
+        except:
+            continue
+    print("Dolly is litening...")
+    print()
+    time = time * 60
+    if SPLIT_LONG_MEETINGS:
+        transcript = stt.long_split_meet(seconds=time)
+    else:
+        transcript = stt.long_asynchronous_meet(seconds=time)
 
-    text = output_and_modification(text, config.speakers, config.speaker_count)
+    transcript = output_and_modification(transcript, config.speakers,
+                                         config.speaker_count)
+    analyze_and_export(transcript, analyzer, index, word_counter)
+    metrics.write(METRICS_PATH)
 
-    more_than_30, more_than_10, random_keywords = analyze_text.AnalyzeText(
-        speakers=config.speakers, speaker_count=config.speaker_count,
-        random_keywords_count=RANDOM_KEYWORDS_COUNT).analyze(text)
-    print_export_analysis(text, more_than_30, more_than_10, random_keywords)
+
+def _stage(name):
+    import metrics
+
+    return metrics.histogram("dolly_stage_seconds",
+                             "Time spent in each step after the meeting",
+                             stage=name).time()
+
+
+def analyze_and_export(transcript, analyzer, index, word_counter=None,
+                       name=None):
+    """Analyze a finished meeting, export it and add it to the indexes.
+
+    Returns the exported transcript's filename. Meetings finishing at the
+    same time are analyzed side by side but take turns exporting, as they
+    share the indexes.
+    """
+    import search_index
+
+    text = transcript.render()
+    with _stage("analysis"):
+        more_than_30, more_than_10, random_keywords = analyzer.analyze(
+            text, word_counter=word_counter)
+
+    with _export_lock:
+        with _stage("export"):
+            filename = print_export_analysis(transcript, more_than_30,
+                                             more_than_10, random_keywords,
+                                             name=name)
+
+        with _stage("index"):
+            index.add_document(os.path.basename(filename), text)
+            index.save(IDF_INDEX_PATH)
+            # Adds this meeting (and any export it missed) to the search index.
+            search_index.SearchIndex.open(OUTPUT_DIRECTORY)
+    return filename
 
 
 if __name__ == '__main__':
+    if "--startup-time" in sys.argv:
+        # Measure cold start on this machine without running a meeting.
+        print()
+        print("Starting Dolly...\n")
+        mark("banner printed")
+        warm_up()
+        print_startup_time()
+        sys.exit()
+
     language_code, exit_command, speaker_count, speakers = instructions()
 
     run(language_code, exit_command, speaker_count, speakers)
@@ -0,0 +1,286 @@
+"""How captured audio is cut into streaming requests, and what happens when
+the network can't take it as fast as it is captured.
+
+FramingPolicy keeps every request between ``min_ms`` and ``max_ms`` of
+audio. While the upstream keeps up, requests stay at the minimum for the
+lowest latency; when a backlog builds, they grow (up to the maximum) so
+fewer requests, each with its own overhead, are needed to catch up.
+
+With the default "drop" backpressure the generator reads the capture ring
+directly; if the upstream stalls for longer than the ring holds, the oldest
+audio is overwritten and counted as dropped. With "spill" a SpillQueue
+drains the ring on its own thread, keeps up to ``memory_seconds`` in memory
+and moves the rest to a temporary file, up to ``spill_seconds``, so a long
+stall costs disk rather than audio. It also keeps the audio a new session
+may have to replay, however long ago it was captured.
+"""
+import bisect
+import collections
+import tempfile
+import threading
+
+import metrics
+
+SAMPLE_WIDTH = 2  # bytes per LINEAR16 sample
+
+DROP = "drop"
+SPILL = "spill"
+
+REQUEST_BYTES = metrics.histogram(
+    "dolly_request_bytes", "Audio bytes per streaming request",
+    buckets=tuple(1600 * 2 ** i for i in range(8)))
+DROPPED_BYTES = metrics.counter(
+    "dolly_audio_dropped_bytes_total",
+    "Captured audio lost because the upstream fell too far behind")
+SPILLED_BYTES = metrics.counter(
+    "dolly_audio_spilled_bytes_total",
+    "Captured audio moved to disk while the upstream was behind")
+
+
+class FramingPolicy(object):
+    """Picks the size of the next request from the backlog."""
+
+    def __init__(self, sample_rate, min_ms=100, max_ms=500):
+        bytes_per_ms = sample_rate * SAMPLE_WIDTH / 1000.0
+        self.min_bytes = self._whole_samples(min_ms * bytes_per_ms)
+        self.max_bytes = max(self.min_bytes,
+                             self._whole_samples(max_ms * bytes_per_ms))
+        self.frame_bytes = self.min_bytes
+
+    @staticmethod
+    def _whole_samples(size):
+        return max(SAMPLE_WIDTH, int(size) // SAMPLE_WIDTH * SAMPLE_WIDTH)
+
+    def update(self, backlog):
+        """Adapt to the `backlog` bytes left waiting after a read.
+
+        A full frame still waiting means the upstream is behind: double the
+        frame. Otherwise halve it, back towards the minimum. Since audio
+        arrives in real time, waiting for a frame never takes longer than
+        the frame is long.
+        """
+        if backlog >= self.frame_bytes:
+            self.frame_bytes = min(self.max_bytes, self.frame_bytes * 2)
+        else:
+            self.frame_bytes = max(self.min_bytes, self.frame_bytes // 2)
+        self.frame_bytes = self._whole_samples(self.frame_bytes)
+
+
+class SpillQueue(object):
+    """Bounded queue between a ring buffer reader and a slow consumer.
+
+    A fill thread drains `reader` as fast as the capture comes in. The
+    newest ``memory_seconds`` of audio are kept in memory and older audio
+    that hasn't been read yet in a temporary file, up to ``spill_seconds``.
+    ``bytes_dropped`` counts audio lost in the ring or past the spill limit.
+
+    One queue serves a whole meeting. Each session reads it through a
+    SpillReader of its own, and what has been read is kept until it is
+    ``release``d, so the next session can replay it.
+    """
+
+    def __init__(self, reader, sample_rate, memory_seconds=10,
+                 spill_seconds=3600):
+        bytes_per_second = sample_rate * SAMPLE_WIDTH
+        self.memory_limit = int(memory_seconds * bytes_per_second)
+        self.spill_limit = max(SAMPLE_WIDTH, int(spill_seconds * bytes_per_second))
+        self.bytes_spilled = 0
+        self.bytes_dropped = 0
+
+        self._reader = reader
+        # (position, data) runs that have been read, kept for replay, and
+        # their positions for bisect; all older than the queued runs.
+        self._replay = []
+        self._replay_starts = []
+        # (position, data) runs, all newer than everything on disk.
+        self._memory = collections.deque()
+        self._memory_size = 0
+        # (position, file offset, length) runs in the spill file.
+        self._spilled = collections.deque()
+        self._spilled_size = 0
+        self._spill_file = None
+        self._spill_end = 0  # bytes ever written to the spill file
+        self._end = reader.position  # end of the newest run
+
+        self._cond = threading.Condition()
+        self._closed = False
+        self._ended = False
+        self._thread = threading.Thread(target=self._fill,
+                                        name="dolly-spill-queue")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def reader(self, position):
+        """Return a SpillReader from `position`, or the oldest audio kept."""
+        with self._cond:
+            if self._replay:
+                oldest = self._replay[0][0]
+            elif self._spilled:
+                oldest = self._spilled[0][0]
+            elif self._memory:
+                oldest = self._memory[0][0]
+            else:
+                oldest = self._end
+            return SpillReader(self, min(max(position, oldest), self._end))
+
+    def release(self, position):
+        """Forget the audio read before `position`; it won't be replayed."""
+        with self._cond:
+            count = bisect.bisect_right(self._replay_starts, position)
+            if count:
+                start, chunk = self._replay[count - 1]
+                if start + len(chunk) > position:
+                    count -= 1  # still needed from `position` on
+            del self._replay[:count]
+            del self._replay_starts[:count]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self._spill_file is not None:
+            self._spill_file.close()
+
+    def _fill(self):
+        dropped = self._reader.bytes_dropped
+        while True:
+            data = self._reader.read(timeout=0.1)
+            with self._cond:
+                if self._closed or data is None:
+                    self._ended = True
+                    self._cond.notify_all()
+                    return
+                if self._reader.bytes_dropped != dropped:
+                    self.bytes_dropped += self._reader.bytes_dropped - dropped
+                    dropped = self._reader.bytes_dropped
+                if not data:
+                    continue
+                chunk = b''.join(data)
+                self._add(self._reader.position - len(chunk), chunk)
+                self._cond.notify_all()
+
+    def _add(self, position, chunk):
+        self._memory.append((position, chunk))
+        self._memory_size += len(chunk)
+        self._end = position + len(chunk)
+        while self._memory_size > self.memory_limit:
+            position, chunk = self._memory.popleft()
+            self._memory_size -= len(chunk)
+            if self._spilled_size + len(chunk) > self.spill_limit:
+                self.bytes_dropped += len(chunk)
+                continue
+            self._spill(position, chunk)
+            self.bytes_spilled += len(chunk)
+            SPILLED_BYTES.inc(len(chunk))
+
+    def _spill(self, position, chunk):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="dolly-spill-")
+        # The file is used as a ring: runs leave it oldest first, so there
+        # is always room behind the oldest one still in it.
+        while chunk:
+            offset = self._spill_end % self.spill_limit
+            take = min(len(chunk), self.spill_limit - offset)
+            self._spill_file.seek(offset)
+            self._spill_file.write(chunk[:take])
+            self._spilled.append((position, offset, take))
+            self._spilled_size += take
+            self._spill_end += take
+            position += take
+            chunk = chunk[take:]
+
+    def _dequeue(self):
+        """Move the oldest queued run to the replay list."""
+        if self._spilled:
+            position, offset, length = self._spilled.popleft()
+            self._spilled_size -= length
+            self._spill_file.seek(offset)
+            chunk = self._spill_file.read(length)
+        else:
+            position, chunk = self._memory.popleft()
+            self._memory_size -= len(chunk)
+        self._replay.append((position, chunk))
+        self._replay_starts.append(position)
+
+    def _run_from(self, position):
+        """The first run kept that ends after `position`, or None."""
+        i = max(0, bisect.bisect_right(self._replay_starts, position) - 1)
+        for start, chunk in self._replay[i:i + 2]:
+            if start + len(chunk) > position:
+                return start, chunk
+        while self._spilled or self._memory:
+            self._dequeue()
+            start, chunk = self._replay[-1]
+            if start + len(chunk) > position:
+                return start, chunk
+        return None
+
+    def _read(self, reader, max_bytes, min_bytes, timeout):
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._ended or self._closed or reader.closed
+                or self._end - reader.position >= min_bytes,
+                timeout)
+            if reader.closed:
+                return None
+
+            parts = []
+            size = 0
+            while max_bytes is None or size < max_bytes:
+                run = self._run_from(reader.position)
+                if run is None:
+                    break
+                start, chunk = run
+                if parts and start > reader.position:
+                    break  # audio was dropped here; stop at the gap
+                skip = max(0, reader.position - start)
+                take = len(chunk) - skip if max_bytes is None \
+                    else min(len(chunk) - skip, max_bytes - size)
+                parts.append(chunk[skip:skip + take])
+                size += take
+                reader.position = start + skip + take
+            if not parts and (self._ended or self._closed):
+                return None
+            return parts
+
+
+class SpillReader(object):
+    """A session's cursor into a SpillQueue.
+
+    Has the read(max_bytes, min_bytes, timeout) / position / available
+    interface of ring_buffer.RingReader, so the generator can use either.
+    Reads return bytes objects covering one contiguous span of the capture;
+    ``position`` is the capture position of the next byte to be read.
+    """
+
+    def __init__(self, queue, position):
+        self.queue = queue
+        self.position = position
+        self.closed = False
+
+    @property
+    def available(self):
+        queue = self.queue
+        with queue._cond:
+            return max(0, queue._end - self.position) \
+                + queue._reader.available
+
+    @property
+    def bytes_dropped(self):
+        return self.queue.bytes_dropped
+
+    def read(self, max_bytes=None, min_bytes=1, timeout=None):
+        """Return up to `max_bytes` of audio from `position` on.
+
+        Blocks until `min_bytes` are queued, the source ends or `timeout`
+        passes. Returns None once the source has ended and all was read, or
+        the reader was closed.
+        """
+        return self.queue._read(self, max_bytes, min_bytes, timeout)
+
+    def close(self):
+        """End the session's reads, including one waiting for audio."""
+        with self.queue._cond:
+            self.closed = True
+            self.queue._cond.notify_all()
@@ -0,0 +1,138 @@
+import glob
+import os
+import threading
+
+import numpy as np
+
+from tokenizer import tokenize
+import transcript
+
+
+class IdfIndex(object):
+    """Document frequencies over every exported meeting, kept on disk.
+
+    Uses the same smoothed IDF as ``TfidfVectorizer``, so scoring a meeting
+    against the index ranks words exactly as fitting a vectorizer on the
+    whole archive would, without refitting anything. The archive mixes
+    languages, so terms come from the language-independent
+    ``tokenizer.tokenize``. The index is stored as
+    a single uncompressed ``.npz``: the vocabulary and document names as
+    newline-joined UTF-8 blobs and the frequencies as a uint32 array.
+
+    Meetings are scored while others are being added, so every method
+    takes the index's lock.
+    """
+
+    def __init__(self):
+        self.terms = []
+        self.term_ids = {}
+        self.df = np.zeros(0, dtype=np.uint32)
+        self.documents = set()
+        self._idf = None
+        self._lock = threading.RLock()
+
+    @property
+    def doc_count(self):
+        return len(self.documents)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with np.load(path) as data:
+            terms = data['terms'].tobytes().decode('utf-8')
+            documents = data['documents'].tobytes().decode('utf-8')
+            index.df = data['df'].astype(np.uint32)
+        index.terms = terms.split('\n') if terms else []
+        index.term_ids = dict((term, i) for i, term in enumerate(index.terms))
+        index.documents = set(documents.split('\n')) if documents else set()
+        return index
+
+    @classmethod
+    def open(cls, path, directory=None):
+        """Load the index at `path`, adding any new exports in `directory`."""
+        if os.path.exists(path):
+            index = cls.load(path)
+        else:
+            index = cls()
+        if directory is not None and index.add_directory(directory):
+            index.save(path)
+        return index
+
+    def save(self, path):
+        with self._lock:
+            terms = '\n'.join(self.terms).encode('utf-8')
+            documents = '\n'.join(sorted(self.documents)).encode('utf-8')
+            # Write next to the target and rename, so readers never see half
+            # a file.
+            temporary = path + '.tmp.npz'
+            np.savez(temporary,
+                     terms=np.frombuffer(terms, dtype=np.uint8),
+                     documents=np.frombuffer(documents, dtype=np.uint8),
+                     df=self.df)
+            os.replace(temporary, path)
+
+    def add_document(self, name, text):
+        """Count `text` once under `name`; return False if already counted."""
+        terms = set(tokenize(text))
+        with self._lock:
+            if name in self.documents:
+                return False
+            ids = []
+            for term in terms:
+                term_id = self.term_ids.get(term)
+                if term_id is None:
+                    term_id = len(self.terms)
+                    self.terms.append(term)
+                    self.term_ids[term] = term_id
+                ids.append(term_id)
+            if len(self.terms) > len(self.df):
+                self.df = np.concatenate((self.df, np.zeros(
+                    len(self.terms) - len(self.df), dtype=np.uint32)))
+            self.df[np.array(ids, dtype=np.intp)] += 1
+            self.documents.add(name)
+            self._idf = None
+            return True
+
+    def add_directory(self, directory):
+        """Add every exported transcript in `directory` not counted yet."""
+        added = 0
+        for path in sorted(glob.glob(os.path.join(directory, '*.txt'))):
+            if self.add_document(os.path.basename(path),
+                                 transcript.load_export_text(path)):
+                added += 1
+        return added
+
+    def idf(self):
+        with self._lock:
+            if self._idf is None:
+                n = self.doc_count
+                self._idf = np.log((1.0 + n) / (1.0 + self.df)) + 1.0
+            return self._idf
+
+    def scores(self, text, stop_words=(), *, name):
+        """Return (terms, tf-idf scores) for the words of a meeting.
+
+        `name` is the meeting's document name, or None for a meeting that
+        was never exported. Unless it is already in the index, the meeting
+        is scored as if it had been added, the way fitting on archive +
+        meeting would. It has no default, so a caller scoring an archived
+        meeting can't forget it and count that meeting twice.
+        """
+        counts = {}
+        for term in tokenize(text):
+            if term not in stop_words:
+                counts[term] = counts.get(term, 0) + 1
+        terms = sorted(counts)
+        tf = np.array([counts[term] for term in terms], dtype=np.float64)
+
+        with self._lock:
+            ids = np.array([self.term_ids.get(term, -1) for term in terms],
+                           dtype=np.intp)
+            if name is not None and name in self.documents:
+                return terms, tf * self.idf()[ids]
+
+            known = ids >= 0
+            df = np.ones(len(terms), dtype=np.float64)
+            df[known] += self.df[ids[known]]
+            n = self.doc_count + 1
+        return terms, tf * (np.log((1.0 + n) / (1.0 + df)) + 1.0)
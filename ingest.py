@@ -0,0 +1,285 @@
+"""Transcribes meeting recordings dropped into a directory.
+
+Usage: python ingest.py incoming/ [--workers 2] [--language en-US]
+                        [--speakers Alice Bob] [--interval 2]
+
+WAV and FLAC files are picked up once they have stopped growing and
+transcribed through the long-running path (see
+SpeechToText.long_audio_transcript) by up to `workers` at a time. Each
+transcript and its analysis are exported to output/ like a live meeting's,
+by dolly.analyze_and_export. Recordings are known by the SHA-256 of their
+content, kept in ``LEDGER_PATH``, so a copied or renamed file is never
+transcribed twice. A file that fails is tried again once it changes.
+
+Queue depth and throughput are printed every `report_seconds` and kept in
+the dolly_ingest_* metrics.
+"""
+import argparse
+from concurrent import futures
+import hashlib
+import json
+import os
+import threading
+import time
+
+import dolly
+import metrics
+
+EXTENSIONS = (".wav", ".flac")
+LEDGER_PATH = dolly.OUTPUT_DIRECTORY + "/ingested.json"
+AUDIO_PREFIX = dolly.OUTPUT_DIRECTORY + "/audio_ingest/"
+
+QUEUED = metrics.gauge("dolly_ingest_queued",
+                       "Recordings waiting for a worker")
+RUNNING = metrics.gauge("dolly_ingest_running",
+                        "Recordings being transcribed")
+FILES = dict((status, metrics.counter(
+    "dolly_ingest_files_total", "Recordings handled", status=status))
+    for status in ("done", "duplicate", "failed"))
+AUDIO_SECONDS = metrics.counter("dolly_ingest_audio_seconds_total",
+                                "Seconds of recorded audio transcribed")
+FILE_SECONDS = metrics.histogram(
+    "dolly_ingest_file_seconds",
+    "From a worker taking a recording to its transcript being exported")
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def audio_chunks(path, chunk_seconds=0.1):
+    """Open a WAV or FLAC file as mono LINEAR16.
+
+    Returns its sample rate, its duration in seconds and a generator of
+    its audio in `chunk_seconds` pieces; other channel counts are mixed
+    down.
+    """
+    import numpy as np
+    import soundfile
+
+    info = soundfile.info(path)
+
+    def chunks():
+        for block in soundfile.blocks(path, int(info.samplerate * chunk_seconds),
+                                      dtype='int16', always_2d=True):
+            if block.shape[1] == 1:
+                block = block[:, 0]
+            else:
+                block = block.mean(axis=1)
+            yield np.ascontiguousarray(block, dtype='<i2').tobytes()
+
+    return info.samplerate, info.duration, chunks()
+
+
+class Ledger(object):
+    """Content hashes of the recordings already transcribed, in a JSON file."""
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+        self._lock = threading.Lock()
+
+    def __contains__(self, digest):
+        with self._lock:
+            return digest in self.entries
+
+    def add(self, digest, source, export):
+        with self._lock:
+            self.entries[digest] = {"source": source, "export": export,
+                                    "time": time.time()}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(self.path + ".tmp", self.path)
+
+
+class IngestService(object):
+    def __init__(self, directory, language_code="en-US",
+                 speakers=("Speaker 1", "Speaker 2"), workers=2,
+                 ledger=None, storage_backend=None, recognizer=None):
+        import clients
+        import idf_index
+        from job_manager import RecognitionJobManager
+
+        self.directory = directory
+        self.language_code = language_code
+        self.speakers = [name + ": " for name in speakers]
+        self.storage_backend = storage_backend
+        self.recognizer = recognizer
+        if ledger is None:
+            ledger = Ledger()
+        self.ledger = ledger
+        # One job manager, so the long-running recognitions of all the
+        # workers together stay within its concurrency limit.
+        self.job_manager = RecognitionJobManager(
+            recognizer if recognizer is not None else clients.speech_client())
+        self.index = idf_index.IdfIndex.open(dolly.IDF_INDEX_PATH,
+                                             dolly.OUTPUT_DIRECTORY)
+        self.executor = futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="dolly-ingest")
+
+        self._lock = threading.Lock()
+        # path -> (path, size, mtime) at the last scan; a file is ready once
+        # it is the same on two scans in a row. Both only hold files still
+        # in the directory.
+        self._stat = {}
+        self._submitted = {}  # path -> the key it was queued with
+        self._active = set()  # hashes being transcribed
+        self.queued = 0
+        self.running = 0
+        self.done = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+        self._last_report = (time.time(), 0, 0.0)
+
+    def scan(self):
+        """Queue the recordings that are new and have stopped growing."""
+        seen = set()
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or not entry.name.lower().endswith(EXTENSIONS):
+                continue
+            seen.add(entry.path)
+            stat = entry.stat()
+            key = (entry.path, stat.st_size, stat.st_mtime)
+            if self._stat.get(entry.path) != key:
+                self._stat[entry.path] = key
+                continue
+            if self._submitted.get(entry.path) == key:
+                continue
+            self._submitted[entry.path] = key
+            with self._lock:
+                self.queued += 1
+                QUEUED.set(self.queued)
+            self.executor.submit(self._process, entry.path)
+        # Forget files that were moved or deleted.
+        for table in (self._stat, self._submitted):
+            for path in set(table) - seen:
+                del table[path]
+
+    def _process(self, path):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            QUEUED.set(self.queued)
+            RUNNING.set(self.running)
+        started = time.time()
+        try:
+            digest = file_hash(path)
+            with self._lock:
+                duplicate = digest in self.ledger or digest in self._active
+                if not duplicate:
+                    self._active.add(digest)
+            if duplicate:
+                with self._lock:
+                    self.duplicates += 1
+                FILES["duplicate"].inc()
+                return
+            try:
+                export, seconds = self.transcribe(path, digest)
+                self.ledger.add(digest, path, export)
+            finally:
+                with self._lock:
+                    self._active.discard(digest)
+            with self._lock:
+                self.done += 1
+                self.audio_seconds += seconds
+            FILES["done"].inc()
+            AUDIO_SECONDS.inc(seconds)
+            FILE_SECONDS.observe(time.time() - started)
+            print("Transcribed %s to %s" % (path, export))
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            FILES["failed"].inc()
+            print("Failed to transcribe %s: %r" % (path, e))
+        finally:
+            with self._lock:
+                self.running -= 1
+                RUNNING.set(self.running)
+
+    def transcribe(self, path, digest):
+        """Transcribe, analyze and export one recording.
+
+        Returns the exported transcript's filename and the recording's
+        length in seconds.
+        """
+        import speech_to_text
+        from renderer import TerminalRenderer
+
+        sample_rate, seconds, audio = audio_chunks(path)
+        # Recordings have no exit command; only live meetings listen for one.
+        config = dolly.speech_config(
+            self.language_code, None, len(self.speakers), self.speakers,
+            sample_rate=sample_rate, chunk=sample_rate // 10,
+            storage_backend=self.storage_backend,
+            job_manager=self.job_manager, recognizer=self.recognizer)
+        stt = speech_to_text.SpeechToText(config,
+                                          renderer=TerminalRenderer(quiet=True))
+        name = os.path.splitext(os.path.basename(path))[0] + "_" + digest[:8]
+        # The recording itself stays where it was dropped.
+        transcript = stt.long_audio_transcript(audio, AUDIO_PREFIX + name,
+                                               record=False)
+        export = dolly.analyze_and_export(
+            transcript, dolly.meeting_analyzer(config, self.index), self.index,
+            name=name)
+        return export, seconds
+
+    def report(self):
+        """Print the queue and the throughput since the last report."""
+        now = time.time()
+        with self._lock:
+            then, done, audio_seconds = self._last_report
+            self._last_report = (now, self.done, self.audio_seconds)
+            elapsed = max(now - then, 1e-9)
+            print("queued %d, running %d, done %d, duplicates %d, failed %d;"
+                  " %.1f recordings/hour, %.1fx real time"
+                  % (self.queued, self.running, self.done, self.duplicates,
+                     self.failed, (self.done - done) * 3600 / elapsed,
+                     (self.audio_seconds - audio_seconds) / elapsed))
+
+    def run(self, interval=2, report_seconds=60):
+        """Scan every `interval` seconds until interrupted."""
+        next_report = time.time() + report_seconds
+        try:
+            while True:
+                self.scan()
+                if time.time() >= next_report:
+                    self.report()
+                    next_report += report_seconds
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print("Finishing the queued recordings...")
+            self.executor.shutdown(wait=True)
+            self.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--language", default="en-US")
+    parser.add_argument("--speakers", nargs="+", default=["Speaker 1", "Speaker 2"])
+    parser.add_argument("--interval", type=float, default=2)
+    parser.add_argument("--report-seconds", type=float, default=60)
+    options = parser.parse_args(argv)
+
+    dolly.start_metrics()
+    service = IngestService(options.directory, options.language,
+                            options.speakers, options.workers)
+    service.run(options.interval, options.report_seconds)
+
+
+if __name__ == '__main__':
+    main()
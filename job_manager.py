@@ -0,0 +1,158 @@
+from concurrent import futures
+import collections
+import threading
+import time
+
+from google.api_core import exceptions
+
+# Errors a later call can get past; anything else fails the job.
+TRANSIENT_ERRORS = (exceptions.ServiceUnavailable,
+                    exceptions.DeadlineExceeded,
+                    exceptions.InternalServerError,
+                    exceptions.Aborted)
+
+
+class _Job(object):
+    __slots__ = ('config', 'audio', 'future', 'operation', 'interval',
+                 'next_poll', 'submitted', 'retries')
+
+    def __init__(self, config, audio, future):
+        self.config = config
+        self.audio = audio
+        self.future = future
+        # None until long_running_recognize has returned.
+        self.operation = None
+        self.interval = 0
+        self.next_poll = 0
+        self.submitted = 0
+        self.retries = 0
+
+
+class RecognitionJobManager(object):
+    """Runs ``long_running_recognize`` operations without blocking callers.
+
+    ``submit`` returns a :class:`concurrent.futures.Future` for the recognize
+    response. At most ``max_concurrent`` operations are in flight; the rest
+    wait their turn. A single background thread polls the running operations,
+    each with its own interval that starts at ``min_interval`` and grows by
+    ``backoff`` up to ``max_interval``, so short jobs finish quickly and long
+    ones don't cost a request every second. Starting and polling an
+    operation are both done on that thread, outside the lock. A transient
+    error from either is retried on the same schedule, at most
+    ``max_retries`` times in a row.
+    """
+
+    def __init__(self, client, max_concurrent=4, min_interval=1.0,
+                 max_interval=30.0, backoff=1.5, max_retries=5):
+        self.client = client
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_retries = max_retries
+
+        self._pending = collections.deque()
+        self._running = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, config, audio, callback=None):
+        """Queue a recognition job; ``callback(future)`` runs when it ends."""
+        future = futures.Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("job manager has been shut down")
+            self._pending.append(_Job(config, audio, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name="dolly-recognize-jobs")
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    @property
+    def running_count(self):
+        return len(self._running)
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def _start_jobs(self):
+        """Give free slots to pending jobs; they are started when polled."""
+        while self._pending and len(self._running) < self.max_concurrent:
+            job = self._pending.popleft()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            job.interval = self.min_interval
+            job.next_poll = time.time()
+            self._running.append(job)
+
+    def _poll(self, job):
+        """Start or poll `job`; return True when it has finished (either way).
+
+        Otherwise the job's next turn is scheduled.
+        """
+        try:
+            if job.operation is None:
+                job.operation = self.client.long_running_recognize(
+                    job.config, job.audio)
+                # The operation has the request now; don't hold on to its
+                # audio.
+                job.audio = None
+                job.submitted = time.time()
+                job.interval = self.min_interval
+                job.retries = 0
+                job.next_poll = job.submitted + job.interval
+                return False
+            if job.operation.done():
+                job.future.set_result(job.operation.result())
+                return True
+            job.retries = 0
+        except TRANSIENT_ERRORS as e:
+            job.retries += 1
+            if job.retries > self.max_retries:
+                job.future.set_exception(e)
+                return True
+        except Exception as e:
+            job.future.set_exception(e)
+            return True
+        job.interval = min(job.interval * self.backoff, self.max_interval)
+        job.next_poll = time.time() + job.interval
+        return False
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._start_jobs()
+                if self._stopped and not self._running and not self._pending:
+                    return
+                if self._running:
+                    wait = min(job.next_poll for job in self._running) \
+                        - time.time()
+                else:
+                    wait = None
+                if wait is None or wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                due = [job for job in self._running
+                       if job.next_poll <= time.time()]
+
+            # Start and poll outside the lock, so neither submit() nor the
+            # other jobs wait on the network.
+            finished = [job for job in due if self._poll(job)]
+
+            with self._cond:
+                for job in finished:
+                    self._running.remove(job)
@@ -0,0 +1,35 @@
+import numpy as np
+
+
+def top_k(values, k, tie_keys=None):
+    """Positions of the `k` largest `values`, largest first.
+
+    Uses argpartition, so the cost is linear in len(values) plus k log k
+    instead of a full sort. Equal values are ordered by `tie_keys`
+    (default: position), lowest first, so the result is deterministic.
+    """
+    values = np.asarray(values)
+    if tie_keys is None:
+        tie_keys = np.arange(len(values))
+    if k <= 0 or len(values) == 0:
+        return np.zeros(0, dtype=np.intp)
+
+    if k < len(values):
+        part = np.argpartition(-values, k - 1)[:k]
+        # Everything tied with the k-th value competes for the last places.
+        candidates = np.flatnonzero(values >= values[part].min())
+    else:
+        candidates = np.arange(len(values))
+    order = np.lexsort((tie_keys[candidates], -values[candidates]))
+    return candidates[order[:k]]
+
+
+def top_keywords(data, indices, feature_names, k):
+    """Top `k` feature names of a sparse row given as data/indices arrays.
+
+    Ties go to the feature with the lower column, which for a vectorizer is
+    the one that sorts first alphabetically.
+    """
+    indices = np.asarray(indices)
+    positions = top_k(data, k, tie_keys=indices)
+    return [feature_names[indices[p]] for p in positions]
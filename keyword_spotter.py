@@ -0,0 +1,227 @@
+"""Local keyword spotting: MFCC features matched against enrolled templates.
+
+A few recordings of the keyword are turned into MFCC templates. The live
+audio is turned into MFCCs as it arrives, and after every chunk the last
+couple of seconds are compared with each template by subsequence DTW, so
+the keyword is found wherever it starts in the window. Everything is numpy
+and runs on the capture thread.
+"""
+import time
+
+import numpy as np
+
+from silence_split import frame_energy_db
+
+FRAME_MS = 25
+HOP_MS = 10
+FFT_SIZE = 512
+MEL_BANDS = 26
+# Cepstra 1-12; c0 is the frame level, which depends on how loud and how
+# far away the talker is rather than on what was said.
+CEPSTRA = slice(1, 13)
+
+
+def mel_filterbank(sample_rate, fft_size=FFT_SIZE, bands=MEL_BANDS,
+                   low_hz=80, high_hz=None):
+    """Triangular mel filters as a (bands, fft_size // 2 + 1) matrix."""
+    high_hz = high_hz or sample_rate / 2.0
+
+    def mel(hz):
+        return 2595 * np.log10(1 + hz / 700.0)
+
+    def hz(mel):
+        return 700 * (10 ** (mel / 2595.0) - 1)
+
+    edges = hz(np.linspace(mel(low_hz), mel(high_hz), bands + 2))
+    bins = np.fft.rfftfreq(fft_size, 1.0 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def dct_matrix(size, count):
+    """Orthonormal DCT-II rows 0..count-1."""
+    n = np.arange(size)
+    matrix = np.cos(np.pi / size * (n + 0.5) * np.arange(count)[:, None])
+    matrix[0] *= np.sqrt(1.0 / size)
+    matrix[1:] *= np.sqrt(2.0 / size)
+    return matrix.astype(np.float32)
+
+
+class MfccExtractor(object):
+    """MFCCs of a stream of int16 samples, fed in arbitrary pieces."""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * FRAME_MS / 1000)
+        self.hop_samples = int(sample_rate * HOP_MS / 1000)
+        self._window = np.hamming(self.frame_samples).astype(np.float32)
+        self._filters = mel_filterbank(sample_rate)
+        self._dct = dct_matrix(MEL_BANDS, CEPSTRA.stop)[CEPSTRA]
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def feed(self, samples):
+        """Return the features of every frame completed by `samples`."""
+        pending = np.concatenate((self._pending,
+                                  np.asarray(samples, dtype=np.float32)))
+        count = 0
+        if len(pending) >= self.frame_samples:
+            count = 1 + (len(pending) - self.frame_samples) // self.hop_samples
+        # Keep the overlap with the next frame.
+        self._pending = pending[count * self.hop_samples:]
+        if not count:
+            return np.zeros((0, CEPSTRA.stop - CEPSTRA.start), np.float32)
+
+        starts = np.arange(count) * self.hop_samples
+        frames = pending[starts[:, None] + np.arange(self.frame_samples)]
+        # Pre-emphasis, within each frame.
+        frames[:, 1:] -= 0.97 * frames[:, :-1]
+        spectrum = np.abs(np.fft.rfft(frames * self._window, FFT_SIZE)) ** 2
+        mel = np.log(spectrum.astype(np.float32).dot(self._filters.T) + 1e-6)
+        return mel.dot(self._dct.T)
+
+    def compute(self, samples):
+        """Features of a whole recording, independent of any stream."""
+        return MfccExtractor(self.sample_rate).feed(samples)
+
+
+def dtw_distance(template, window):
+    """Length-normalized subsequence DTW distance of `template` in `window`.
+
+    The match may start and end anywhere in the window. Each template frame
+    advances the window by 0, 1 or 2 frames, so a rendition between about
+    half and twice the template's speed matches, and every step depends only
+    on the previous row.
+    """
+    if not len(window):
+        return np.inf
+    cost = np.sqrt(((template[:, None, :] - window[None, :, :]) ** 2).sum(-1))
+    total = cost[0].copy()
+    for row in cost[1:]:
+        best = total.copy()
+        best[1:] = np.minimum(best[1:], total[:-1])
+        best[2:] = np.minimum(best[2:], total[:-2])
+        total = row + best
+    return total.min() / len(template)
+
+
+def trim_silence(samples, sample_rate, margin_db=20):
+    """Cut the leading and trailing frames quieter than the loudest - margin."""
+    frame = int(sample_rate * HOP_MS / 1000)
+    energy = frame_energy_db(samples, frame)
+    if not len(energy):
+        return samples
+    loud = np.flatnonzero(energy >= energy.max() - margin_db)
+    return samples[loud[0] * frame:(loud[-1] + 1) * frame]
+
+
+class Templates(object):
+    """Enrolled keyword templates and the distance typical between them."""
+
+    def __init__(self, features, reference, sample_rate):
+        self.features = features
+        self.reference = reference
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def enroll(cls, recordings, sample_rate):
+        """Build templates from int16 recordings of the keyword (2 or more)."""
+        if len(recordings) < 2:
+            raise ValueError("Enroll at least two recordings of the keyword")
+        extractor = MfccExtractor(sample_rate)
+        features = [extractor.compute(trim_silence(np.asarray(r), sample_rate))
+                    for r in recordings]
+        distances = [dtw_distance(a, b) for i, a in enumerate(features)
+                     for b in features[i + 1:]]
+        return cls(features, float(np.mean(distances)), sample_rate)
+
+    def save(self, path):
+        arrays = dict(("template_%d" % i, f)
+                      for i, f in enumerate(self.features))
+        np.savez(path, reference=self.reference,
+                 sample_rate=self.sample_rate, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            names = sorted((name for name in data.files
+                            if name.startswith("template_")),
+                           key=lambda name: int(name.split("_")[1]))
+            return cls([data[name] for name in names],
+                       float(data["reference"]), int(data["sample_rate"]))
+
+
+class KeywordSpotter(object):
+    """Finds an enrolled keyword in a live stream of int16 samples.
+
+    ``sensitivity`` runs from 0 (strict) to 1 (lenient) and scales the
+    distance threshold around the one typical between the enrolled samples.
+    A detection is only confirmed once ``confirmations`` consecutive
+    evaluations (one per fed chunk) match, and windows without anything
+    louder than ``min_level_db`` aren't evaluated at all. ``cpu_seconds`` and
+    ``audio_seconds`` count the work done, for the CPU use per audio second.
+    """
+
+    def __init__(self, templates, sensitivity=0.5, confirmations=2,
+                 min_level_db=-50):
+        self.templates = templates
+        self.sample_rate = templates.sample_rate
+        self.threshold = templates.reference * (1 + 2 * sensitivity)
+        self.confirmations = confirmations
+        self.min_level_db = min_level_db
+
+        self._extractor = MfccExtractor(self.sample_rate)
+        longest = max(len(f) for f in templates.features)
+        self.window_frames = int(longest * 1.5)
+        self._window = np.zeros((0, CEPSTRA.stop - CEPSTRA.start), np.float32)
+        self._loud_frames = 0  # window frames since the last loud chunk
+        self._hits = 0
+        self.last_score = np.inf
+
+        self.cpu_seconds = 0.0
+        self.audio_seconds = 0.0
+
+    @property
+    def cpu_per_audio_second(self):
+        if not self.audio_seconds:
+            return 0.0
+        return self.cpu_seconds / self.audio_seconds
+
+    def feed(self, data):
+        """Add captured audio; return True on a confirmed detection."""
+        started = time.thread_time()
+        samples = np.frombuffer(data, dtype='<i2')
+        self.audio_seconds += len(samples) / float(self.sample_rate)
+        try:
+            return self._feed(samples)
+        finally:
+            self.cpu_seconds += time.thread_time() - started
+
+    def _feed(self, samples):
+        features = self._extractor.feed(samples)
+        self._window = np.concatenate((self._window, features))[
+            -self.window_frames:]
+
+        level = frame_energy_db(samples, len(samples)) if len(samples) else []
+        if len(level) and level[0] >= self.min_level_db:
+            self._loud_frames = 0
+        else:
+            self._loud_frames += len(features)
+        if self._loud_frames >= self.window_frames:
+            # Nothing but silence in the window.
+            self._hits = 0
+            return False
+
+        self.last_score = min(dtw_distance(template, self._window)
+                              for template in self.templates.features)
+        if self.last_score > self.threshold:
+            self._hits = 0
+            return False
+        self._hits += 1
+        if self._hits < self.confirmations:
+            return False
+        # Start over so the same utterance isn't reported twice.
+        self._hits = 0
+        self._window = self._window[:0]
+        return True
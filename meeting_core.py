@@ -0,0 +1,160 @@
+"""Runs meetings as asyncio tasks, so one process can serve several rooms.
+
+A meeting goes through four stages:
+
+* capture     the config's audio source, filling its ring buffer from the
+              PyAudio (or file player) thread, and optionally a recorder
+              fed from that buffer on a thread of its own
+* recognizer  consecutive streaming calls of at most `streaming_limit`
+              seconds, replaying from the last final result as in
+              SpeechToText.short_stream_meet
+* sink        every response shown by the meeting's renderer and added to
+              its transcript, in order, on the event loop
+* analysis    an optional callable given the finished transcript, run on
+              the loop's executor
+
+google-cloud-speech 1.x has no asyncio client, so each streaming call
+iterates its (blocking) responses on a thread of its own and hands them to
+the loop. Everything else a meeting keeps belongs to its own SpeechToText;
+meetings only share the process-wide clients and metrics, and one failing
+doesn't stop the others:
+
+    meetings = [meeting_core.Meeting(config, name=room) for room in rooms]
+    results = asyncio.run(meeting_core.run_meetings(meetings))
+"""
+import asyncio
+import threading
+
+import speech_to_text
+
+# Put on a session's response queue when its streaming call has ended.
+_END = object()
+
+
+def _open(config):
+    source = config.open_audio_source()
+    return source, source.__enter__()
+
+
+class Meeting(object):
+    def __init__(self, config, name=None, renderer=None, word_counter=None,
+                 analyze=None, recorder=None):
+        self.name = name
+        self.stt = speech_to_text.SpeechToText(config, renderer=renderer,
+                                               word_counter=word_counter)
+        # analyze(transcript) is called once the meeting has ended.
+        self.analyze = analyze
+        # Optional audio_codec recorder the whole capture is written to.
+        self.recorder = recorder
+        self.transcript = None
+        self.analysis = None
+
+    async def run(self):
+        """Transcribe until the exit command is heard or the source ends.
+
+        Returns the transcript; the analysis result is kept in
+        ``analysis``.
+        """
+        loop = asyncio.get_running_loop()
+        config = self.stt.config
+        failures = 0
+        # Opening and closing a device can block, so neither is done on
+        # the loop.
+        source, stream = await loop.run_in_executor(None, _open, config)
+        record_thread = None
+        try:
+            self.stt.start_meeting(stream)
+            if self.recorder is not None:
+                record_thread = threading.Thread(
+                    target=speech_to_text.record_stream,
+                    args=(stream.reader(0), self.recorder),
+                    name="dolly-record-%s" % (self.name,))
+                record_thread.daemon = True
+                record_thread.start()
+            resume_position = 0
+            try:
+                while not self.stt.exit_heard:
+                    if stream.closed and resume_position >= stream.captured_bytes:
+                        # The source ended and everything in it was recognized.
+                        break
+                    reader, requests = self.stt.start_session(resume_position)
+                    try:
+                        await self._session(loop, requests)
+                        failures = 0
+                    except speech_to_text.RECONNECT_ERRORS:
+                        speech_to_text.RECONNECTS.inc()
+                        failures += 1
+                        if failures > config.max_reconnects:
+                            raise
+                        resume_position = self.stt.end_session(reader, clean=False)
+                        await asyncio.sleep(min(0.5 * 2 ** failures, 10))
+                    else:
+                        resume_position = self.stt.end_session(reader, clean=True)
+            finally:
+                self.stt.end_meeting()
+        finally:
+            await loop.run_in_executor(None, source.__exit__, None, None, None)
+            if record_thread is not None:
+                # Ends once it has written everything the source captured.
+                await loop.run_in_executor(None, record_thread.join)
+
+        self.transcript = self.stt.transcript
+        if self.analyze is not None:
+            self.analysis = await loop.run_in_executor(None, self.analyze,
+                                                       self.transcript)
+        return self.transcript
+
+    async def _session(self, loop, requests):
+        """Run one streaming call, handling its responses on the loop."""
+        config = self.stt.config
+        responses = asyncio.Queue()
+        stopped = threading.Event()
+        call = []
+
+        def deliver(item):
+            if not stopped.is_set():
+                loop.call_soon_threadsafe(responses.put_nowait, item)
+
+        def recognize():
+            try:
+                call.append(config.client.streaming_recognize(
+                    config.streaming_config, requests))
+                for response in call[0]:
+                    if stopped.is_set():
+                        break
+                    deliver(response)
+            except Exception as e:
+                deliver(e)
+            else:
+                deliver(_END)
+
+        thread = threading.Thread(target=recognize,
+                                  name="dolly-recognize-%s" % (self.name,))
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                response = await responses.get()
+                if response is _END:
+                    return
+                if isinstance(response, Exception):
+                    raise response
+                if self.stt.handle_response(response):
+                    return
+        finally:
+            stopped.set()
+            # Hang up a call that is still going; its thread then ends once
+            # the gRPC iterator notices.
+            cancel = getattr(call[0], "cancel", None) if call else None
+            if cancel is not None:
+                cancel()
+
+
+async def run_meetings(meetings):
+    """Run `meetings` side by side on the current loop.
+
+    Returns, in order, each meeting's transcript or the exception it failed
+    with.
+    """
+    return await asyncio.gather(*(meeting.run() for meeting in meetings),
+                                return_exceptions=True)
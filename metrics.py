@@ -0,0 +1,190 @@
+"""Process-wide counters and latency histograms for the pipeline stages.
+
+Metrics are created once, at import time of the module that updates them:
+
+    CHUNKS = metrics.counter("dolly_chunks_captured_total", "Audio chunks")
+    LAG = metrics.histogram("dolly_interim_to_final_seconds", "...")
+    LAG.observe(seconds)
+
+Updating one is a bisect and two additions under a lock, cheap enough for
+the audio callback. ``render()`` gives the Prometheus text format, which
+``write(path)`` saves to a file and ``serve(port)`` exposes on
+http://127.0.0.1:<port>/metrics.
+"""
+import bisect
+import contextlib
+import http.server
+import os
+import threading
+import time
+
+# Seconds, from 100 us to about 2 minutes.
+LATENCY_BUCKETS = tuple(round(0.0001 * 2 ** i, 6) for i in range(21))
+
+_lock = threading.Lock()
+_metrics = []
+_by_key = {}
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('%s="%s"' % item for item in sorted(labels.items())) + "}"
+
+
+class Counter(object):
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        with _lock:
+            self.value += amount
+
+    def render(self):
+        return ["%s%s %s" % (self.name, _label_text(self.labels), self.value)]
+
+
+class Gauge(Counter):
+    def set(self, value):
+        with _lock:
+            self.value = value
+
+
+class Histogram(object):
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextlib.contextmanager
+    def time(self):
+        """Observe how long the with block takes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            labels = dict(self.labels, le=str(bound))
+            lines.append("%s_bucket%s %d" % (self.name, _label_text(labels),
+                                             cumulative))
+        labels = _label_text(self.labels)
+        lines.append("%s_sum%s %.6f" % (self.name, labels, self.sum))
+        lines.append("%s_count%s %d" % (self.name, labels, self.count))
+        return lines
+
+
+def _get(kind, name, help, labels, **kwargs):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        metric = _by_key.get(key)
+        if metric is None:
+            metric = kind(name, help, labels, **kwargs)
+            _by_key[key] = metric
+            _metrics.append(metric)
+    return metric
+
+
+def counter(name, help, **labels):
+    """Return the counter `name` with `labels`, creating it on first use."""
+    return _get(Counter, name, help, labels)
+
+
+def gauge(name, help, **labels):
+    """Return the gauge `name` with `labels`, creating it on first use."""
+    return _get(Gauge, name, help, labels)
+
+
+def histogram(name, help, buckets=LATENCY_BUCKETS, **labels):
+    """Return the histogram `name` with `labels`, creating it on first use."""
+    return _get(Histogram, name, help, labels, buckets=buckets)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        metrics = list(_metrics)
+    lines = []
+    described = set()
+    for metric in metrics:
+        if metric.name not in described:
+            described.add(metric.name)
+            if isinstance(metric, Gauge):
+                kind = "gauge"
+            elif isinstance(metric, Counter):
+                kind = "counter"
+            else:
+                kind = "histogram"
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, kind))
+        with _lock:
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write(path):
+    """Save the current metrics to `path`, replacing it atomically."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write(render())
+    os.replace(path + ".tmp", path)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics on a background thread; return the server."""
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever,
+                              name="dolly-metrics")
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def write_every(path, seconds):
+    """Rewrite the metrics file every `seconds` on a background thread."""
+    def loop():
+        while True:
+            time.sleep(seconds)
+            write(path)
+
+    thread = threading.Thread(target=loop, name="dolly-metrics-file")
+    thread.daemon = True
+    thread.start()
+    return thread
@@ -0,0 +1,341 @@
+"""Speech recognizers SpeechToText can run against.
+
+Anything with SpeechClient's ``streaming_recognize(config, requests)`` and
+``long_running_recognize(config, audio)`` will do; the Cloud SpeechClient
+from clients.speech_client() is the default. The stand-ins here answer
+locally, so the streaming loop, the long paths and the analysis can be run
+and timed without a network or an account:
+
+* ReplayRecognizer plays back responses captured by RecordingRecognizer.
+* SyntheticRecognizer makes up plausible results for whatever audio it gets.
+
+Both pace streaming responses by the audio actually sent, like the service:
+a result is only returned once the audio it ends with has arrived. Long
+running operations finish after the audio's duration divided by ``speed``
+(at once if ``speed`` is None).
+"""
+import abc
+import io
+import os
+import random
+import struct
+import threading
+import time
+import wave
+
+from google.cloud.speech_v1p1beta1 import enums
+from google.cloud.speech_v1p1beta1 import types
+from google.protobuf import duration_pb2
+
+SAMPLE_WIDTH = 2  # bytes per LINEAR16 sample
+
+_RECORD = struct.Struct('<cII')  # kind, session or operation index, length
+_STREAMING = b'S'
+_LONG_RUNNING = b'L'
+
+
+def _duration(seconds):
+    duration = duration_pb2.Duration()
+    duration.FromNanoseconds(int(round(seconds * 1e9)))
+    return duration
+
+
+def _seconds(duration):
+    return duration.seconds + duration.nanos * 1e-9
+
+
+def _end_time(response):
+    if not response.results:
+        return 0.0
+    return _seconds(response.results[0].result_end_time)
+
+
+def audio_seconds(config, audio):
+    """Duration of a RecognitionAudio, from its content or local file URI."""
+    if audio.content and config.encoding \
+            == enums.RecognitionConfig.AudioEncoding.LINEAR16:
+        return len(audio.content) / float(config.sample_rate_hertz
+                                           * SAMPLE_WIDTH)
+    if audio.content:
+        import soundfile
+        return soundfile.info(io.BytesIO(audio.content)).duration
+    path = audio.uri[len("file://"):] if audio.uri.startswith("file://") \
+        else None
+    if path is None or not os.path.exists(path):
+        return 0.0
+    if path.endswith(".wav"):
+        with wave.open(path, 'rb') as f:
+            return f.getnframes() / float(f.getframerate())
+    import soundfile
+    return soundfile.info(path).duration
+
+
+class RecognizerBackend(abc.ABC):
+    """The part of SpeechClient that SpeechToText uses."""
+
+    @abc.abstractmethod
+    def streaming_recognize(self, config, requests):
+        """Return an iterator of StreamingRecognizeResponse for `requests`."""
+
+    @abc.abstractmethod
+    def long_running_recognize(self, config, audio):
+        """Start recognizing `audio`; return an operation (done, result)."""
+
+
+class ReplayOperation(object):
+    """Long-running operation that completes at a set time."""
+
+    def __init__(self, response, ready_at):
+        self._response = response
+        self._ready_at = ready_at
+
+    def done(self):
+        return time.time() >= self._ready_at
+
+    def result(self, timeout=None):
+        wait = self._ready_at - time.time()
+        if wait > 0:
+            if timeout is not None and wait > timeout:
+                raise TimeoutError("operation not finished")
+            time.sleep(wait)
+        return self._response
+
+
+class _AudioClock(object):
+    """Consumes streaming requests on a thread and tracks the audio sent."""
+
+    def __init__(self, requests, sample_rate):
+        self.seconds = 0.0
+        self.finished = False
+        self.requests = 0
+        self._bytes_per_second = float(sample_rate * SAMPLE_WIDTH)
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._consume, args=(requests,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _consume(self, requests):
+        try:
+            for request in requests:
+                with self._cond:
+                    self.requests += 1
+                    self.seconds += len(request.audio_content) \
+                        / self._bytes_per_second
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def wait_for(self, seconds):
+        """Block until `seconds` of audio were sent; False if it never is."""
+        with self._cond:
+            while self.seconds < seconds and not self.finished:
+                self._cond.wait()
+            return self.seconds >= seconds
+
+
+class ReplayRecognizer(RecognizerBackend):
+    """Plays back recorded responses, one recorded session per call.
+
+    `long_running` maps the order an operation was started in to its
+    response (a list is numbered from 0); an operation with no recorded
+    response gets an empty one.
+    """
+
+    def __init__(self, sessions=(), long_running=(), speed=None):
+        self.sessions = list(sessions)
+        if not isinstance(long_running, dict):
+            long_running = dict(enumerate(long_running))
+        self.long_running = dict(long_running)
+        self.speed = speed
+        self._session = 0
+        self._long_running = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, speed=None):
+        """Load what a RecordingRecognizer saved to `path`."""
+        sessions = []
+        long_running = {}
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    break
+                kind, index, length = _RECORD.unpack(header)
+                data = f.read(length)
+                if kind == _STREAMING:
+                    while len(sessions) <= index:
+                        sessions.append([])
+                    sessions[index].append(
+                        types.StreamingRecognizeResponse.FromString(data))
+                else:
+                    # Indexed by start order: an operation whose result was
+                    # never collected has no record.
+                    long_running[index] = \
+                        types.LongRunningRecognizeResponse.FromString(data)
+        return cls(sessions, long_running, speed=speed)
+
+    def session_responses(self, config):
+        """The responses for the next streaming call, in end time order."""
+        with self._lock:
+            index = self._session
+            self._session += 1
+        if index < len(self.sessions):
+            return iter(self.sessions[index])
+        return iter(())
+
+    def long_running_response(self, config, audio):
+        with self._lock:
+            index = self._long_running
+            self._long_running += 1
+        response = self.long_running.get(index)
+        if response is None:
+            return types.LongRunningRecognizeResponse()
+        return response
+
+    def streaming_recognize(self, config, requests):
+        clock = _AudioClock(requests, config.config.sample_rate_hertz)
+        for response in self.session_responses(config):
+            if not clock.wait_for(_end_time(response)):
+                # The audio this result is about was never sent.
+                return
+            yield response
+        # Like the service, end the call when the requests end.
+        clock.wait_for(float('inf'))
+
+    def long_running_recognize(self, config, audio):
+        response = self.long_running_response(config, audio)
+        ready_at = time.time()
+        if self.speed:
+            ready_at += audio_seconds(config, audio) / self.speed
+        return ReplayOperation(response, ready_at)
+
+
+class SyntheticRecognizer(ReplayRecognizer):
+    """Makes up results for any amount of audio.
+
+    Every ``utterance_seconds`` of audio gives a final result of
+    ``words_per_second`` words from a small vocabulary, said by a random
+    speaker, with interim results every ``interim_seconds`` in between.
+    """
+
+    VOCABULARY = ("budget project meeting schedule design review customer "
+                  "release deadline team plan update question issue report "
+                  "market product launch data model test").split()
+
+    def __init__(self, utterance_seconds=5.0, interim_seconds=0.5,
+                 words_per_second=2.5, speed=None, seed=0):
+        super(SyntheticRecognizer, self).__init__(speed=speed)
+        self.utterance_seconds = utterance_seconds
+        self.interim_seconds = interim_seconds
+        self.words_per_second = words_per_second
+        self._random = random.Random(seed)
+
+    def _result(self, config, start, end, is_final):
+        count = max(1, int((end - start) * self.words_per_second))
+        step = (end - start) / count
+        speaker = self._random.randint(1, max(1, config.diarization_speaker_count))
+        words = [types.WordInfo(word=self._random.choice(self.VOCABULARY),
+                                start_time=_duration(start + i * step),
+                                end_time=_duration(start + (i + 1) * step),
+                                confidence=0.9, speaker_tag=speaker)
+                 for i in range(count)]
+        alternative = types.SpeechRecognitionAlternative(
+            transcript=" ".join(word.word for word in words),
+            confidence=0.9, words=words)
+        return types.StreamingRecognitionResult(
+            alternatives=[alternative], is_final=is_final,
+            result_end_time=_duration(end))
+
+    def session_responses(self, config):
+        config = config.config
+        start = 0.0
+        while True:
+            end = start + self.utterance_seconds
+            interim = start + self.interim_seconds
+            while interim < end:
+                yield types.StreamingRecognizeResponse(
+                    results=[self._result(config, start, interim, False)])
+                interim += self.interim_seconds
+            yield types.StreamingRecognizeResponse(
+                results=[self._result(config, start, end, True)])
+            start = end
+
+    def long_running_response(self, config, audio):
+        duration = audio_seconds(config, audio)
+        results = []
+        start = 0.0
+        while start < duration:
+            end = min(duration, start + self.utterance_seconds)
+            result = self._result(config, start, end, True)
+            results.append(types.SpeechRecognitionResult(
+                alternatives=result.alternatives))
+            start = end
+        return types.LongRunningRecognizeResponse(results=results)
+
+
+class _RecordedOperation(object):
+    def __init__(self, operation, on_result):
+        self._operation = operation
+        self._on_result = on_result
+
+    def done(self):
+        return self._operation.done()
+
+    def result(self, timeout=None):
+        response = self._operation.result(timeout)
+        self._on_result(response)
+        return response
+
+
+class RecordingRecognizer(RecognizerBackend):
+    """Passes calls through to `recognizer`, keeping the responses.
+
+    ``save`` writes them in the format ReplayRecognizer.load reads.
+    Long-running responses are kept in the order the operations were
+    started, which is the order they are replayed in.
+    """
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self.sessions = []
+        self.long_running = {}
+        self._started = 0
+        self._lock = threading.Lock()
+
+    def streaming_recognize(self, config, requests):
+        responses = []
+        with self._lock:
+            self.sessions.append(responses)
+        for response in self.recognizer.streaming_recognize(config, requests):
+            responses.append(response)
+            yield response
+
+    def long_running_recognize(self, config, audio):
+        with self._lock:
+            index = self._started
+            self._started += 1
+
+        def keep(response):
+            with self._lock:
+                self.long_running[index] = response
+
+        return _RecordedOperation(
+            self.recognizer.long_running_recognize(config, audio), keep)
+
+    def save(self, path):
+        buffer = io.BytesIO()
+        with self._lock:
+            for index, responses in enumerate(self.sessions):
+                for response in responses:
+                    data = response.SerializeToString()
+                    buffer.write(_RECORD.pack(_STREAMING, index, len(data)))
+                    buffer.write(data)
+            for index in sorted(self.long_running):
+                data = self.long_running[index].SerializeToString()
+                buffer.write(_RECORD.pack(_LONG_RUNNING, index, len(data)))
+                buffer.write(data)
+        with open(path, 'wb') as f:
+            f.write(buffer.getvalue())
@@ -0,0 +1,95 @@
+import sys
+import threading
+import time
+
+
+class TerminalRenderer(object):
+    """Shows live results without reprinting the whole transcript.
+
+    Final lines are written once, as they arrive. The interim line is redrawn
+    in place at most ``max_fps`` times per second; updates in between only
+    replace the pending text, and the newest one is drawn on the next frame
+    by a timer, even if no further update arrives. With ``quiet=True``
+    nothing is written at all, for headless runs.
+    """
+
+    def __init__(self, stream=None, max_fps=10, quiet=False):
+        self.stream = stream if stream is not None else sys.stdout
+        self.min_interval = 1.0 / max_fps if max_fps else 0
+        self.quiet = quiet
+
+        self._pending = None
+        self._last_draw = 0
+        self._drawn_width = 0
+        # The timer draws from its own thread.
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def interim(self, text):
+        if self.quiet:
+            return
+        with self._lock:
+            self._pending = text
+            wait = self._last_draw + self.min_interval - time.time()
+            if wait <= 0:
+                self._draw_interim()
+            elif self._timer is None:
+                self._timer = threading.Timer(wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def final(self, line):
+        if self.quiet:
+            return
+        with self._lock:
+            self._pending = None
+            self._cancel_timer()
+            self._clear_interim()
+            if not line.endswith("\n"):
+                line += "\n"
+            self.stream.write(line)
+            self.stream.flush()
+
+    def flush(self):
+        """Draw the interim text held back by the frame rate, if any."""
+        if self.quiet:
+            return
+        with self._lock:
+            self._cancel_timer()
+            if self._pending is not None:
+                self._draw_interim()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _draw_interim(self):
+        text = self._pending
+        self._pending = None
+        self._last_draw = time.time()
+        # Pad with spaces to overwrite the rest of a longer previous line.
+        padding = ' ' * max(0, self._drawn_width - len(text))
+        self.stream.write(text + padding + '\r')
+        self.stream.flush()
+        self._drawn_width = len(text)
+
+    def _clear_interim(self):
+        if self._drawn_width:
+            self.stream.write(' ' * self._drawn_width + '\r')
+            self._drawn_width = 0
+
+
+class LogRenderer(TerminalRenderer):
+    """Writes only final lines, each tagged with the meeting's `name`, so
+    several meetings can share one output."""
+
+    def __init__(self, name, stream=None):
+        super(LogRenderer, self).__init__(stream=stream, max_fps=0)
+        self.name = name
+
+    def interim(self, text):
+        pass
+
+    def final(self, line):
+        super(LogRenderer, self).final("[%s] %s" % (self.name, line))
@@ -0,0 +1,148 @@
+import threading
+
+
+class RingBuffer(object):
+    """Fixed-capacity byte ring shared by one writer and many readers.
+
+    The storage is allocated once. The writer copies each chunk into it and
+    every reader keeps its own cursor, so the same audio can be consumed by
+    several readers without being copied again.
+
+    Positions are absolute byte counts since the buffer was created. A reader
+    that falls more than ``capacity`` bytes behind the writer has lost data;
+    it is moved forward to the oldest byte still held and the loss is counted
+    as an overrun. A read whose timeout passes (or a non-blocking read made)
+    before ``min_bytes`` are available is counted as an underrun.
+    """
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._write_pos = 0
+        self._cond = threading.Condition()
+        self.closed = False
+
+        self.overruns = 0
+        self.underruns = 0
+        self.bytes_written = 0
+
+    @property
+    def write_position(self):
+        return self._write_pos
+
+    def write(self, data):
+        """Copy ``data`` (any bytes-like object) into the ring."""
+        data = memoryview(data).cast('B')
+        size = len(data)
+        if size == 0:
+            return
+        if size > self.capacity:
+            # Only the newest `capacity` bytes can ever be read back.
+            data = data[size - self.capacity:]
+            skipped = size - self.capacity
+        else:
+            skipped = 0
+
+        with self._cond:
+            start = (self._write_pos + skipped) % self.capacity
+            first = min(len(data), self.capacity - start)
+            self._view[start:start + first] = data[:first]
+            if first < len(data):
+                self._view[:len(data) - first] = data[first:]
+            self._write_pos += size
+            self.bytes_written += size
+            self._cond.notify_all()
+
+    def close(self):
+        """Wake up all blocked readers; they drain what is left and stop."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def reader(self, position=None):
+        """Return a new reader starting at ``position`` (default: now)."""
+        if position is None:
+            position = self._write_pos
+        return RingReader(self, position)
+
+    def segments(self, start, end):
+        """Return memoryview slices covering absolute range [start, end)."""
+        size = end - start
+        if size <= 0:
+            return []
+        offset = start % self.capacity
+        first = min(size, self.capacity - offset)
+        views = [self._view[offset:offset + first]]
+        if first < size:
+            views.append(self._view[:size - first])
+        return views
+
+
+class RingReader(object):
+    """Independent cursor into a :class:`RingBuffer`.
+
+    ``read`` returns a list of at most two memoryview slices into the shared
+    storage. The slices are only valid until the writer wraps around onto
+    them, so consumers should use (or copy) them before requesting more data.
+    """
+
+    def __init__(self, ring, position):
+        self._ring = ring
+        self.position = position
+        self.overruns = 0
+        self.underruns = 0
+        self.bytes_dropped = 0
+
+    @property
+    def available(self):
+        return self._ring.write_position - self.position
+
+    def seek(self, position):
+        """Move the cursor to an absolute position still held by the ring."""
+        ring = self._ring
+        with ring._cond:
+            oldest = max(0, ring.write_position - ring.capacity)
+            self.position = min(max(position, oldest), ring.write_position)
+
+    def _catch_up(self):
+        ring = self._ring
+        lag = ring.write_position - self.position
+        if lag > ring.capacity:
+            dropped = lag - ring.capacity
+            self.position += dropped
+            self.bytes_dropped += dropped
+            self.overruns += 1
+            ring.overruns += 1
+
+    def read(self, max_bytes=None, min_bytes=1, block=True, timeout=None):
+        """Return memoryview segments with up to ``max_bytes`` of new data.
+
+        Blocks until at least ``min_bytes`` are available (or the ring is
+        closed, or ``timeout`` expires). Returns ``None`` once the ring is
+        closed and this reader has consumed everything.
+        """
+        ring = self._ring
+        with ring._cond:
+            self._catch_up()
+            if block and self.available < min_bytes and not ring.closed:
+                ring._cond.wait_for(
+                    lambda: ring.closed or self.available >= min_bytes,
+                    timeout)
+                self._catch_up()
+            if self.available < min_bytes and not ring.closed:
+                # Waiting for new audio is normal; only a read that had to
+                # give up before enough of it arrived is an underrun.
+                self.underruns += 1
+                ring.underruns += 1
+
+            available = self.available
+            if available == 0:
+                return None if ring.closed else []
+            if max_bytes is not None:
+                available = min(available, max_bytes)
+            start = self.position
+            self.position += available
+            return ring.segments(start, start + available)
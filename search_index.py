@@ -0,0 +1,263 @@
+"""Positional inverted index over exported meeting transcripts.
+
+Usage: python search_index.py [--directory output] [--speaker NAME] QUERY
+       python search_index.py "what did Alice say about budget"
+
+Every token of every transcript line is stored with its meeting, line
+number, speaker and position in the line, so phrase queries and speaker
+filters are answered from the index without reading the transcripts.
+
+The index lives in ``<directory>/search_index`` as a list of immutable
+segments. Each segment is a sorted term list plus two ``.npy`` arrays,
+term offsets and fixed-width postings, which are memory-mapped on open.
+Adding a meeting writes one small segment; once there are more than
+``MAX_SEGMENTS`` they are merged into one.
+"""
+import argparse
+import bisect
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+from tokenizer import tokenize
+import transcript
+
+INDEX_DIRECTORY = "search_index"
+MAX_SEGMENTS = 16
+
+POSTING = np.dtype([('meeting', '<u4'), ('line', '<u4'),
+                    ('speaker', '<u2'), ('position', '<u2')])
+
+QUESTION_PATTERN = re.compile(r"^\s*what did (.+?) say about (.+?)\??\s*$",
+                              re.I)
+
+
+def _posting_keys(postings):
+    """One sortable uint64 per posting: meeting, line, position."""
+    return ((postings['meeting'].astype(np.uint64) << np.uint64(40))
+            | (postings['line'].astype(np.uint64) << np.uint64(16))
+            | postings['position'].astype(np.uint64))
+
+
+class Segment(object):
+    def __init__(self, path):
+        self.path = path
+        with open(path + ".terms", encoding="utf-8") as f:
+            text = f.read()
+        self.terms = text.split("\n") if text else []
+        self.offsets = np.load(path + ".offsets.npy", mmap_mode='r')
+        self.postings = np.load(path + ".postings.npy", mmap_mode='r')
+
+    def lookup(self, term):
+        i = bisect.bisect_left(self.terms, term)
+        if i == len(self.terms) or self.terms[i] != term:
+            return self.postings[:0]
+        return self.postings[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    @staticmethod
+    def write(path, terms, term_ids, postings):
+        """Write postings (with parallel term_ids into `terms`) as a segment."""
+        order = np.lexsort((postings['position'], postings['line'],
+                            postings['meeting'], term_ids))
+        postings = postings[order]
+        term_ids = term_ids[order]
+        offsets = np.searchsorted(term_ids, np.arange(len(terms) + 1))
+        np.save(path + ".postings.npy", postings)
+        np.save(path + ".offsets.npy", offsets.astype(np.uint64))
+        with open(path + ".terms", "w", encoding="utf-8") as f:
+            f.write("\n".join(terms))
+
+    @staticmethod
+    def remove(path):
+        for suffix in (".terms", ".offsets.npy", ".postings.npy"):
+            os.remove(path + suffix)
+
+
+class SearchIndex(object):
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_DIRECTORY)
+        self.meetings = []
+        self.speakers = []
+        self.next_segment = 0
+        self.segments = []
+
+        meta = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta):
+            with open(meta, encoding="utf-8") as f:
+                data = json.load(f)
+            self.meetings = data["meetings"]
+            self.speakers = data["speakers"]
+            self.next_segment = data["next_segment"]
+            self.segments = [Segment(os.path.join(self.path, name))
+                             for name in data["segments"]]
+
+    @classmethod
+    def open(cls, directory):
+        """Open the index of `directory`, indexing any new exports first."""
+        index = cls(directory)
+        index.update()
+        return index
+
+    def _save_meta(self):
+        data = {
+            "meetings": self.meetings,
+            "speakers": self.speakers,
+            "next_segment": self.next_segment,
+            "segments": [os.path.basename(segment.path)
+                         for segment in self.segments],
+        }
+        meta = os.path.join(self.path, "meta.json")
+        with open(meta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(meta + ".tmp", meta)
+
+    def _speaker_id(self, name):
+        if name not in self.speakers:
+            self.speakers.append(name)
+        return self.speakers.index(name)
+
+    def update(self):
+        """Index every exported transcript not in the index yet."""
+        known = set(self.meetings)
+        added = [path for path in
+                 sorted(glob.glob(os.path.join(self.directory, "*.txt")))
+                 if os.path.basename(path) not in known]
+        if added:
+            self.add_meetings(added)
+        return len(added)
+
+    def add_meeting(self, path):
+        self.add_meetings([path])
+
+    def add_meetings(self, paths):
+        """Index exported transcripts as one new segment."""
+        os.makedirs(self.path, exist_ok=True)
+        term_ids = {}
+        columns = [[], [], [], [], []]  # term, meeting, line, speaker, position
+        for path in paths:
+            meeting = len(self.meetings)
+            self.meetings.append(os.path.basename(path))
+            text = transcript.load_export_text(path)
+            for line_number, line in enumerate(text.splitlines(), 1):
+                name, separator, said = line.partition(": ")
+                if not separator:
+                    name, said = "", line
+                speaker = self._speaker_id(name)
+                for position, term in enumerate(tokenize(said)[:0xffff]):
+                    term_id = term_ids.setdefault(term, len(term_ids))
+                    for column, value in zip(columns, (term_id, meeting,
+                                                       line_number, speaker,
+                                                       position)):
+                        column.append(value)
+
+        # Renumber terms in sorted order so segments can be binary searched.
+        terms = sorted(term_ids)
+        rank = np.empty(len(terms), dtype=np.int64)
+        for i, term in enumerate(terms):
+            rank[term_ids[term]] = i
+        postings = np.empty(len(columns[0]), dtype=POSTING)
+        postings['meeting'] = columns[1]
+        postings['line'] = columns[2]
+        postings['speaker'] = columns[3]
+        postings['position'] = columns[4]
+        segment_ids = rank[np.array(columns[0], dtype=np.int64)]
+
+        self._add_segment(terms, segment_ids, postings)
+        if len(self.segments) > MAX_SEGMENTS:
+            self.compact()
+        self._save_meta()
+
+    def _add_segment(self, terms, term_ids, postings):
+        path = os.path.join(self.path, "%06d" % self.next_segment)
+        self.next_segment += 1
+        Segment.write(path, terms, term_ids, postings)
+        self.segments.append(Segment(path))
+
+    def compact(self):
+        """Merge all segments into one."""
+        old = self.segments
+        terms = sorted(set(term for segment in old for term in segment.terms))
+        parts = []
+        ids = []
+        for segment in old:
+            rank = np.searchsorted(terms, segment.terms) if segment.terms \
+                else np.zeros(0, dtype=np.int64)
+            counts = np.diff(np.asarray(segment.offsets, dtype=np.int64))
+            ids.append(np.repeat(rank, counts))
+            parts.append(np.asarray(segment.postings))
+        self.segments = []
+        self._add_segment(terms, np.concatenate(ids), np.concatenate(parts))
+        self._save_meta()
+        for segment in old:
+            Segment.remove(segment.path)
+
+    def postings(self, term):
+        parts = [segment.lookup(term) for segment in self.segments]
+        if not parts:
+            return np.zeros(0, dtype=POSTING)
+        return np.concatenate(parts)
+
+    def speaker_ids(self, name):
+        name = name.strip(": ").lower()
+        return [i for i, speaker in enumerate(self.speakers)
+                if speaker.strip(": ").lower() == name]
+
+    def search(self, query, speaker=None):
+        """Return (meeting file, line number, speaker) of lines with `query`.
+
+        Multi-word queries match the words as a consecutive phrase.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        first = self.postings(terms[0])
+        if speaker is not None:
+            first = first[np.isin(first['speaker'], self.speaker_ids(speaker))]
+        keys = _posting_keys(first)
+        for offset, term in enumerate(terms[1:], 1):
+            if not len(keys):
+                break
+            following = _posting_keys(self.postings(term)) - np.uint64(offset)
+            keys = keys[np.isin(keys, following)]
+        matched = first[np.isin(_posting_keys(first), keys)]
+
+        # One hit per line, in meeting and line order.
+        lines = (matched['meeting'].astype(np.uint64) << np.uint64(32)) \
+            | matched['line'].astype(np.uint64)
+        _, unique = np.unique(lines, return_index=True)
+        matched = matched[unique]
+        return [(self.meetings[meeting], int(line), self.speakers[speaker])
+                for meeting, line, speaker in zip(matched['meeting'].tolist(),
+                                                  matched['line'].tolist(),
+                                                  matched['speaker'].tolist())]
+
+    def line_text(self, meeting, line_number):
+        text = transcript.load_export_text(os.path.join(self.directory,
+                                                        meeting))
+        return text.splitlines()[line_number - 1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("query")
+    parser.add_argument("--directory", default="output")
+    parser.add_argument("--speaker", default=None)
+    options = parser.parse_args(argv)
+
+    query, speaker = options.query, options.speaker
+    question = QUESTION_PATTERN.match(query)
+    if question and speaker is None:
+        speaker, query = question.group(1), question.group(2)
+
+    index = SearchIndex.open(options.directory)
+    for meeting, line_number, _ in index.search(query, speaker):
+        print("%s:%d: %s" % (meeting, line_number,
+                             index.line_text(meeting, line_number)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+from concurrent import futures
+import threading
+
+import audio_codec
+
+
+class SegmentedRecorder(object):
+    """Splits a recording into audio files of about `segment_seconds` in `codec`.
+
+    Once a segment is `segment_seconds` long it is closed at the first pause
+    (see silence_split), so no word is cut in two, or at
+    `max_segment_seconds` if nobody stops talking. ``segment_starts`` holds
+    where each segment starts, in seconds of the recording.
+
+    ``on_segment(path, index)`` is called from the writing thread as soon as
+    each segment file is closed, so it can be handed off for upload while the
+    meeting keeps going.
+    """
+
+    def __init__(self, prefix, sample_rate, segment_seconds, on_segment,
+                 channels=1, sample_width=2, codec=audio_codec.LINEAR16,
+                 max_segment_seconds=None, frame_ms=30,
+                 silence_threshold_db=-40, min_silence_ms=300):
+        self.prefix = prefix
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.on_segment = on_segment
+        bytes_per_second = sample_rate * channels * sample_width
+        self.segment_bytes = int(segment_seconds * sample_rate) \
+            * channels * sample_width
+        if max_segment_seconds is None:
+            max_segment_seconds = segment_seconds * 1.2
+        self.max_segment_bytes = max(self.segment_bytes, int(
+            max_segment_seconds * sample_rate) * channels * sample_width)
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) \
+            * channels * sample_width
+        self.min_silence_frames = max(1, int(min_silence_ms / frame_ms))
+        self.silence_threshold_db = silence_threshold_db
+        self._bytes_per_second = float(bytes_per_second)
+        self.index = 0
+        self.segment_starts = []
+        self._written = 0
+        self._current = None
+        self._frame = bytearray()
+        self._quiet_frames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def segment_path(self, index):
+        return "%s_%03d%s" % (self.prefix, index,
+                              audio_codec.extension(self.codec))
+
+    def _open(self):
+        self._current = audio_codec.recorder(
+            self.codec, self.segment_path(self.index), self.sample_rate,
+            channels=self.channels, sample_width=self.sample_width)
+        self.segment_starts.append(self._written / self._bytes_per_second)
+        self._frame = bytearray()
+        self._quiet_frames = 0
+
+    def _finish(self):
+        self._current.close()
+        path = self._current.filename
+        self._current = None
+        self.on_segment(path, self.index)
+        self.index += 1
+
+    def _write(self, data):
+        self._current.write(data)
+        self._written += len(data)
+
+    def _pause_ended_frame(self, data):
+        """Measure the audio past the nominal length, a frame at a time;
+        return True once it has been quiet for long enough to cut."""
+        import numpy as np
+        import silence_split
+
+        self._frame += data
+        if len(self._frame) < self.frame_bytes:
+            return False
+        samples = np.frombuffer(bytes(self._frame), dtype='<i2')
+        self._frame = bytearray()
+        level = silence_split.frame_energy_db(samples, len(samples))[0]
+        if level < self.silence_threshold_db:
+            self._quiet_frames += 1
+        else:
+            self._quiet_frames = 0
+        return self._quiet_frames >= self.min_silence_frames
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        while len(data):
+            if self._current is None:
+                self._open()
+            size = self._current.data_size
+            if size < self.segment_bytes:
+                room = self.segment_bytes - size
+                self._write(data[:room])
+                data = data[room:]
+                continue
+            # Past the nominal length: go on a frame at a time until a pause.
+            take = min(len(data), self.frame_bytes - len(self._frame),
+                       self.max_segment_bytes - size)
+            self._write(data[:take])
+            quiet = self._pause_ended_frame(data[:take])
+            data = data[take:]
+            if quiet or self._current.data_size >= self.max_segment_bytes:
+                self._finish()
+
+    def close(self):
+        if self._current is not None and self._current.data_size:
+            self._finish()
+        elif self._current is not None:
+            self._current.close()
+            self._current = None
+            self.segment_starts.pop()
+
+
+class SegmentUploader(object):
+    """Uploads finished segments in the background on a bounded pool."""
+
+    def __init__(self, backend, max_workers=2):
+        self.backend = backend
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._futures = []
+
+    def submit(self, local_path, name=None):
+        future = self._executor.submit(self.backend.upload, local_path,
+                                       name or local_path)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def wait(self):
+        """Block until every submitted upload is done; return URIs in order."""
+        with self._lock:
+            pending = list(self._futures)
+        uris = [future.result() for future in pending]
+        self._executor.shutdown()
+        return uris
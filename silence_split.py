@@ -0,0 +1,239 @@
+import numpy as np
+
+SAMPLE_WIDTH = 2  # bytes per LINEAR16 sample
+
+
+def frame_energy_db(samples, frame_samples):
+    """RMS level in dBFS of each complete frame of int16 ``samples``."""
+    frame_count = len(samples) // frame_samples
+    frames = samples[:frame_count * frame_samples].reshape(
+        frame_count, frame_samples).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+    return 20 * np.log10(rms + 1e-10)
+
+
+def silence_runs(silent):
+    """Return (start, end) frame index pairs of each run of True values."""
+    padded = np.concatenate(([False], silent, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges.reshape(-1, 2)
+
+
+class AudioChunk(object):
+    __slots__ = ('index', 'start', 'pcm')
+
+    def __init__(self, index, start, pcm):
+        self.index = index
+        self.start = start  # seconds from the beginning of the recording
+        self.pcm = pcm
+
+
+class SilenceSplitter(object):
+    """Cuts a PCM stream into chunks at silence boundaries, online.
+
+    Feed it audio as it is captured; it returns every chunk that became
+    complete. A chunk is cut in the middle of the first pause of at least
+    ``min_silence_ms`` once it is ``min_chunk_seconds`` long, or at its
+    quietest frame if no pause shows up before ``max_chunk_seconds``. Only
+    newly arrived frames are measured on each call, so the cost per second of
+    audio is constant.
+    """
+
+    def __init__(self, sample_rate, min_chunk_seconds=20, max_chunk_seconds=240,
+                 frame_ms=30, silence_threshold_db=-40, min_silence_ms=300):
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.frame_bytes = self.frame_samples * SAMPLE_WIDTH
+        self.min_frames = int(min_chunk_seconds * 1000 / frame_ms)
+        self.max_frames = int(max_chunk_seconds * 1000 / frame_ms)
+        self.min_silence_frames = max(1, int(min_silence_ms / frame_ms))
+        self.silence_threshold_db = silence_threshold_db
+
+        self._pending = bytearray()
+        self._energy = np.empty(0, dtype=np.float32)
+        self._start_sample = 0
+        self._index = 0
+
+    def feed(self, data):
+        """Add captured audio; return the list of chunks completed by it."""
+        self._pending += data
+        measured = len(self._energy) * self.frame_bytes
+        complete = len(self._pending) // self.frame_bytes * self.frame_bytes
+        if complete > measured:
+            samples = np.frombuffer(self._pending, dtype=np.int16,
+                                    count=complete // SAMPLE_WIDTH)
+            new = frame_energy_db(samples[measured // SAMPLE_WIDTH:],
+                                  self.frame_samples)
+            # Release the view so the pending buffer can be resized.
+            del samples
+            self._energy = np.concatenate((self._energy, new))
+
+        chunks = []
+        cut = self._find_cut()
+        while cut is not None:
+            chunks.append(self._emit(cut))
+            cut = self._find_cut()
+        return chunks
+
+    def flush(self):
+        """Return whatever audio is left as a final chunk (or None)."""
+        if not self._pending:
+            return None
+        return self._emit(len(self._pending) // self.frame_bytes, everything=True)
+
+    def _find_cut(self):
+        frame_count = len(self._energy)
+        if frame_count < self.min_frames:
+            return None
+
+        window = self._energy[:self.max_frames]
+        runs = silence_runs(window < self.silence_threshold_db)
+        for start, end in runs:
+            middle = (start + end) // 2
+            if end - start < self.min_silence_frames or middle < self.min_frames:
+                continue
+            if end == len(window) and frame_count < self.max_frames:
+                # The pause is still going on; wait to see where it ends.
+                return None
+            return int(middle)
+
+        if frame_count >= self.max_frames:
+            return self.min_frames + int(np.argmin(
+                self._energy[self.min_frames:self.max_frames]))
+        return None
+
+    def _emit(self, frames, everything=False):
+        size = len(self._pending) if everything else frames * self.frame_bytes
+        chunk = AudioChunk(self._index,
+                           self._start_sample / float(self.sample_rate),
+                           bytes(self._pending[:size]))
+        del self._pending[:size]
+        self._energy = self._energy[frames:]
+        self._start_sample += size // SAMPLE_WIDTH
+        self._index += 1
+        return chunk
+
+
+def _seconds(duration):
+    return duration.seconds + duration.nanos * 1e-9
+
+
+def voice_signature(pcm, sample_rate, spans, bands=24, frame_samples=512):
+    """Average log band spectrum of the audio inside ``spans``.
+
+    ``spans`` are (start, end) pairs in seconds relative to ``pcm``. Returns
+    a mean-normalised vector, or None when the spans hold no audio.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    pieces = []
+    for start, end in spans:
+        piece = samples[int(start * sample_rate):int(end * sample_rate)]
+        usable = len(piece) // frame_samples * frame_samples
+        if usable:
+            pieces.append(piece[:usable].reshape(-1, frame_samples))
+    if not pieces:
+        return None
+
+    frames = np.concatenate(pieces).astype(np.float32) * np.hanning(frame_samples)
+    spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    # Speech band only: 100 Hz - 4 kHz, split into log-spaced bands.
+    freqs = np.fft.rfftfreq(frame_samples, 1.0 / sample_rate)
+    edges = np.geomspace(100, min(4000, sample_rate / 2), bands + 1)
+    band_index = np.digitize(freqs, edges) - 1
+    in_band = (band_index >= 0) & (band_index < bands)
+    energy = np.zeros((len(frames), bands), dtype=np.float32)
+    for band in range(bands):
+        columns = in_band & (band_index == band)
+        if columns.any():
+            energy[:, band] = spectrum[:, columns].sum(axis=1)
+    signature = np.log(energy + 1e-6).mean(axis=0)
+    return signature - signature.mean()
+
+
+class SpeakerReconciler(object):
+    """Maps per-chunk diarization tags onto meeting-wide speaker numbers.
+
+    Each chunk is diarized on its own, so its tags start again at 1. Chunks
+    must be added in time order; every local speaker is matched to the known
+    speaker with the most similar voice signature, and becomes a new speaker
+    while fewer than ``speaker_count`` have been seen and nothing is similar
+    enough.
+    """
+
+    def __init__(self, speaker_count, sample_rate, match_threshold=0.6):
+        self.speaker_count = speaker_count
+        self.sample_rate = sample_rate
+        self.match_threshold = match_threshold
+        self._signatures = []  # running mean per global speaker
+        self._weights = []
+
+    def reconcile(self, pcm, results):
+        """Return {local tag: global tag} for one chunk's recognize results."""
+        spans = {}
+        for result in results:
+            words = result.alternatives[0].words
+            if not words:
+                continue
+            spans.setdefault(words[0].speaker_tag, []).append(
+                (_seconds(words[0].start_time), _seconds(words[-1].end_time)))
+
+        local = []
+        for tag, tag_spans in sorted(spans.items()):
+            signature = voice_signature(pcm, self.sample_rate, tag_spans)
+            duration = sum(end - start for start, end in tag_spans)
+            local.append((tag, signature, duration))
+
+        pairs = []
+        for i, (tag, signature, _) in enumerate(local):
+            if signature is None:
+                continue
+            for j, known in enumerate(self._signatures):
+                pairs.append((_cosine(signature, known), i, j))
+        pairs.sort(reverse=True)
+
+        mapping = {}
+        taken = set()
+        for similarity, i, j in pairs:
+            tag = local[i][0]
+            if tag in mapping or j in taken:
+                continue
+            if similarity < self.match_threshold \
+                    and len(self._signatures) < self.speaker_count:
+                continue
+            mapping[tag] = j
+            taken.add(j)
+
+        for tag, signature, duration in local:
+            if tag not in mapping:
+                if len(self._signatures) < self.speaker_count or not self._signatures:
+                    self._signatures.append(signature if signature is not None
+                                            else np.zeros(1))
+                    self._weights.append(0.0)
+                    mapping[tag] = len(self._signatures) - 1
+                else:
+                    free = [j for j in range(len(self._signatures)) if j not in taken]
+                    mapping[tag] = free[0] if free else 0
+            self._update(mapping[tag], signature, duration)
+
+        return dict((tag, j + 1) for tag, j in mapping.items())
+
+    def _update(self, j, signature, duration):
+        if signature is None or duration <= 0:
+            return
+        if self._weights[j] == 0 or self._signatures[j].shape != signature.shape:
+            self._signatures[j] = signature
+            self._weights[j] = duration
+            return
+        total = self._weights[j] + duration
+        self._signatures[j] = (self._signatures[j] * self._weights[j]
+                               + signature * duration) / total
+        self._weights[j] = total
+
+
+def _cosine(a, b):
+    if a.shape != b.shape:
+        return -1.0
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    if norm == 0:
+        return -1.0
+    return float(np.dot(a, b) / norm)
@@ -1,31 +1,105 @@
+import bisect
 import datetime
-import pyaudio
-from six.moves import queue
-import wave
+import os
+import tempfile
+import threading
 
 import re
-import sys
+import time
+import wave
 
-from google.cloud import speech_v1p1beta1 as speech
+from google.api_core import exceptions
 from google.cloud.speech_v1p1beta1 import enums
 from google.cloud.speech_v1p1beta1 import types
-from google.cloud import storage
-import speech_recognition as sr
+
+import audio_codec
+import clients
+import framing
+from job_manager import RecognitionJobManager
+import metrics
+from renderer import TerminalRenderer
+import ring_buffer
+import segment_uploader
+import silence_split
+from storage_backend import GCSStorageBackend
+from transcript import Transcript, Word
+import vad
+import wake_word
+
+SAMPLE_WIDTH = 2  # bytes per LINEAR16 sample
+# A streaming_recognize call is cut off by the API after about 5 minutes.
+STREAMING_LIMIT = 290  # seconds
+# Audio kept beyond a session's worth, so a session that ends on a
+# reconnect backoff can still be replayed from its last final result.
+REPLAY_SLACK = 30  # seconds
+
+CHUNKS_CAPTURED = metrics.counter(
+    "dolly_chunks_captured_total", "Audio chunks written by the capture")
+BYTES_CAPTURED = metrics.counter(
+    "dolly_bytes_captured_total", "Audio bytes written by the capture")
+CALLBACK_DELAY = metrics.histogram(
+    "dolly_capture_callback_delay_seconds",
+    "From the ADC capturing a chunk to the PyAudio callback receiving it")
+QUEUE_WAIT = metrics.histogram(
+    "dolly_queue_wait_seconds",
+    "How long captured audio waited in the ring buffer before being read")
+REQUEST_BUILD = metrics.histogram(
+    "dolly_request_build_seconds", "Building one StreamingRecognizeRequest")
+REQUESTS_SENT = metrics.counter(
+    "dolly_requests_sent_total", "Streaming requests handed to gRPC")
+BYTES_SENT = metrics.counter(
+    "dolly_bytes_sent_total", "Audio bytes in streaming requests")
+SESSIONS = metrics.counter(
+    "dolly_streaming_sessions_total", "Streaming calls started")
+RECONNECTS = metrics.counter(
+    "dolly_streaming_reconnects_total", "Streaming calls retried after an error")
+RESPONSES = dict((kind, metrics.counter(
+    "dolly_responses_total", "Streaming results received", kind=kind))
+    for kind in ("interim", "final"))
+RESULT_LATENCY = dict((kind, metrics.histogram(
+    "dolly_result_latency_seconds",
+    "From sending the audio a result ends with to receiving the result",
+    kind=kind)) for kind in ("interim", "final"))
+INTERIM_TO_FINAL = metrics.histogram(
+    "dolly_interim_to_final_seconds",
+    "From the first interim result of an utterance to its final result")
+SPEECH_TO_LINE = metrics.histogram(
+    "dolly_speech_to_line_seconds",
+    "From capturing the end of an utterance to showing its line")
+
+RECONNECT_ERRORS = (exceptions.ServiceUnavailable,
+                    exceptions.DeadlineExceeded,
+                    exceptions.InternalServerError,
+                    exceptions.Aborted,
+                    exceptions.OutOfRange)
 
 
 class MicrophoneStream(object):
     """Opens a recording stream as a generator yielding the audio chunks."""
 
-    def __init__(self, rate, chunk):
+    def __init__(self, rate, chunk, buffer_seconds=STREAMING_LIMIT + REPLAY_SLACK):
         self._rate = rate
         self._chunk = chunk
 
-        # Create a thread-safe buffer of audio data
-        self._buff = queue.Queue()
+        # Preallocated ring buffer the PortAudio callback writes into. Every
+        # consumer (recognizer feed, recorder, level meter...) gets its own
+        # reader so the audio is shared instead of copied per consumer.
+        self._buff = ring_buffer.RingBuffer(rate * SAMPLE_WIDTH * buffer_seconds)
         self.closed = True
+        self.input_overflows = 0
+
+        # When each chunk-sized piece of the buffer was written, to measure
+        # how long audio waits before it is sent and shown.
+        self._chunk_bytes = chunk * SAMPLE_WIDTH
+        self._capture_times = [0.0] * (self._buff.capacity // self._chunk_bytes + 2)
 
     def __enter__(self):
-        self._audio_interface = pyaudio.PyAudio()
+        # Imported here so file sources run without PortAudio installed.
+        import pyaudio
+        self._overflow_flag = pyaudio.paInputOverflow
+        self._continue = pyaudio.paContinue
+
+        self._audio_interface = clients.audio_interface()
         self._audio_stream = self._audio_interface.open(
             format=pyaudio.paInt16,
             # TODO: Chennels
@@ -49,38 +123,215 @@ class MicrophoneStream(object):
         self.closed = True
         # Signal the generator to terminate so that the client's
         # streaming_recognize method will not block the process termination.
-        self._buff.put(None)
-        self._audio_interface.terminate()
+        self._buff.close()
 
     def _fill_buffer(self, in_data, frame_count, time_info, status_flags):
         """Continuously collect data from the audio stream, into the buffer."""
-        self._buff.put(in_data)
-        return None, pyaudio.paContinue
-
-    def generator(self):
-        while not self.closed:
-            # Use a blocking get() to ensure there's at least one chunk of
-            # data, and stop iteration if the chunk is None (end of the stream)
-            chunk = self._buff.get()
-            if chunk is None:
+        if status_flags & self._overflow_flag:
+            self.input_overflows += 1
+        if time_info.get('input_buffer_adc_time'):
+            CALLBACK_DELAY.observe(time_info['current_time'] - time_info['input_buffer_adc_time'])
+        self._write(in_data)
+        return None, self._continue
+
+    def _write(self, data):
+        self._buff.write(data)
+        end = self._buff.write_position
+        now = time.time()
+        for index in range((end - len(data)) // self._chunk_bytes,
+                           (end - 1) // self._chunk_bytes + 1):
+            self._capture_times[index % len(self._capture_times)] = now
+        CHUNKS_CAPTURED.inc()
+        BYTES_CAPTURED.inc(len(data))
+
+    def capture_time(self, position):
+        """time.time() when the byte at `position` was captured, if still known."""
+        if not 0 <= position < self._buff.write_position \
+                or position < self._buff.write_position - self._buff.capacity:
+            return None
+        return self._capture_times[position // self._chunk_bytes % len(self._capture_times)]
+
+    @property
+    def overruns(self):
+        """Number of times a reader fell a full buffer behind the capture."""
+        return self._buff.overruns
+
+    @property
+    def underruns(self):
+        """Number of reads that gave up before enough audio arrived."""
+        return self._buff.underruns
+
+    @property
+    def captured_bytes(self):
+        return self._buff.write_position
+
+    def reader(self, position=None):
+        """Return an independent reader over the captured audio.
+
+        Reads yield memoryview slices into the shared buffer, see
+        :class:`ring_buffer.RingReader`.
+        """
+        return self._buff.reader(position)
+
+    def generator(self, reader=None, deadline=None, gate=None, policy=None):
+        """Yield request-sized audio from `reader` until the stream closes.
+
+        By default reading starts at the beginning of the capture so nothing
+        recorded before the first request is lost. With a `deadline` (a
+        time.time() value) the generator also stops once it has passed. With
+        a vad.VoiceGate only the audio it lets through is yielded.
+
+        Requests are sized by `policy`, a framing.FramingPolicy for the
+        stream's rate by default. `reader` may also be a framing.SpillReader;
+        audio lost because the reader fell behind is counted and skipped in
+        the gate, so later results keep their capture times.
+        """
+        if reader is None:
+            reader = self._buff.reader(0)
+        if policy is None:
+            policy = framing.FramingPolicy(self._rate)
+        dropped = reader.bytes_dropped
+        expected = reader.position
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    return
+            # Block until a frame of audio is buffered, then take up to the
+            # largest request. None means the stream was closed.
+            data = reader.read(max_bytes=policy.max_bytes,
+                               min_bytes=policy.frame_bytes, timeout=timeout)
+            if data is None:
                 return
-            data = [chunk]
+            if reader.bytes_dropped != dropped:
+                framing.DROPPED_BYTES.inc(reader.bytes_dropped - dropped)
+                dropped = reader.bytes_dropped
+            if not data:
+                continue
+            policy.update(reader.available)
+            start = reader.position - sum(len(d) for d in data)
+            if gate is not None and start > expected:
+                gate.skip(start - expected)
+            expected = reader.position
+            # Time since the oldest of it was captured.
+            captured = self.capture_time(start)
+            if captured is not None:
+                QUEUE_WAIT.observe(time.time() - captured)
+
+            # The request protobuf needs its own bytes object; this is the
+            # only copy made between the callback and the network.
+            data = b''.join(data)
+            framing.REQUEST_BYTES.observe(len(data))
+            if gate is not None:
+                data = gate.feed(data)
+                if not data:
+                    continue
+            yield data
+
+
+class AudioFileStream(MicrophoneStream):
+    """Plays a WAV or FLAC file into the stream as if it were a microphone.
+
+    The file is fed in `chunk`-sized pieces at `speed` times real time (as
+    fast as possible if `speed` is None) and played in a loop until
+    `duration` seconds have been fed, if given. The stream closes itself at
+    the end, which ends sessions the way leaving the meeting would.
+    """
+
+    def __init__(self, rate, chunk, path, speed=1.0, duration=None,
+                 buffer_seconds=STREAMING_LIMIT + REPLAY_SLACK):
+        super(AudioFileStream, self).__init__(rate, chunk, buffer_seconds)
+        self.path = path
+        self.speed = speed
+        self.duration = duration
+        self._stop = threading.Event()
+        self._thread = None
 
-            # Now consume whatever other data's still buffered.
-            while True:
-                try:
-                    chunk = self._buff.get(block=False)
-                    if chunk is None:
+    def __enter__(self):
+        self.closed = False
+        self._thread = threading.Thread(target=self._play, name="dolly-audio-file")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+    def _chunks(self):
+        """Yield the file's frames, `chunk` at a time, once."""
+        if self.path.endswith(".wav"):
+            with wave.open(self.path, 'rb') as f:
+                if f.getframerate() != self._rate or f.getnchannels() != 1 \
+                        or f.getsampwidth() != SAMPLE_WIDTH:
+                    raise ValueError("%s is not %d Hz 16-bit mono" % (self.path, self._rate))
+                while True:
+                    data = f.readframes(self._chunk)
+                    if not data:
+                        return
+                    yield data
+        else:
+            import soundfile
+            with soundfile.SoundFile(self.path) as f:
+                if f.samplerate != self._rate or f.channels != 1:
+                    raise ValueError("%s is not %d Hz mono" % (self.path, self._rate))
+                for block in f.blocks(self._chunk, dtype='int16'):
+                    yield block.tobytes()
+
+    def _play(self):
+        limit = None
+        if self.duration is not None:
+            limit = int(self.duration * self._rate) * SAMPLE_WIDTH
+        bytes_per_second = float(self._rate * SAMPLE_WIDTH)
+        started = time.time()
+        fed = 0
+        try:
+            while limit is None or fed < limit:
+                for data in self._chunks():
+                    if limit is not None:
+                        data = data[:limit - fed]
+                    if self.speed:
+                        wait = started + fed / bytes_per_second / self.speed - time.time()
+                        if self._stop.wait(max(0, wait)):
+                            return
+                    elif self._stop.is_set():
                         return
-                    data.append(chunk)
-                except queue.Empty:
+                    self._write(data)
+                    fed += len(data)
+                    if limit is not None and fed >= limit:
+                        break
+                if limit is None or not fed:
                     break
+        finally:
+            self.closed = True
+            self._buff.close()
+
+
+def _seconds(duration):
+    return duration.seconds + duration.nanos * 1e-9
 
-            yield b''.join(data)
+
+def record_stream(reader, recorder):
+    """Drain a ring buffer reader into a recorder until the stream closes."""
+    while True:
+        data = reader.read()
+        if data is None:
+            break
+        for segment in data:
+            recorder.write(segment)
+    recorder.close()
 
 
 class SpeechToTextConfig:
-    def __init__(self, speakers, speaker_count, sample_rate, chunk, language_code, exit_command):
+    def __init__(self, speakers, speaker_count, sample_rate, chunk, language_code, exit_command,
+                 storage_backend=None, segment_seconds=300, upload_workers=2,
+                 job_manager=None, max_concurrent_jobs=4,
+                 streaming_limit=STREAMING_LIMIT, max_reconnects=5,
+                 codec=audio_codec.FLAC, voice_gating=True,
+                 recognizer=None, audio_source=None,
+                 min_request_ms=100, max_request_ms=500,
+                 backpressure=framing.DROP, spill_seconds=3600):
         self.speakers = speakers
         self.speaker_count = speaker_count
         self.sample_rate = sample_rate
@@ -88,13 +339,59 @@ class SpeechToTextConfig:
         self.language_code = language_code
         self.exit_command = exit_command
 
-        self.client = speech.SpeechClient()
-        self.recognition_config = types.RecognitionConfig(
-            encoding=enums.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=self.sample_rate,
-            language_code=self.language_code,
-            enable_speaker_diarization=True,
-            diarization_speaker_count=self.speaker_count)
+        # Long meetings are recorded in `segment_seconds` pieces and uploaded
+        # by `upload_workers` background threads.
+        if storage_backend is None:
+            storage_backend = GCSStorageBackend("dolly-long-audio")
+        self.storage_backend = storage_backend
+        self.segment_seconds = segment_seconds
+        self.upload_workers = upload_workers
+        # Recordings are compressed with this codec (see audio_codec.CODECS)
+        # as they are captured.
+        self.codec = codec
+        # Drop silence (see vad.VoiceGate) from the live stream and from
+        # uploaded recordings; result times are mapped back to capture time.
+        self.voice_gating = voice_gating
+
+        # Live sessions roll over to a new streaming call every
+        # `streaming_limit` seconds and retry transient errors. The capture
+        # buffer holds `buffer_seconds`, enough to replay a whole session.
+        self.streaming_limit = streaming_limit
+        self.buffer_seconds = int(streaming_limit + REPLAY_SLACK)
+        self.max_reconnects = max_reconnects
+        # Streaming requests carry between `min_request_ms` and
+        # `max_request_ms` of audio each, see framing.FramingPolicy. When the
+        # upstream falls behind, audio is dropped once the ring buffer is full
+        # (framing.DROP) or up to `spill_seconds` of it kept on disk
+        # (framing.SPILL).
+        self.min_request_ms = min_request_ms
+        self.max_request_ms = max_request_ms
+        if backpressure not in (framing.DROP, framing.SPILL):
+            raise ValueError("Unknown backpressure strategy: %r" % (backpressure,))
+        self.backpressure = backpressure
+        self.spill_seconds = spill_seconds
+
+        # Any recognizer_backend.RecognizerBackend; the Cloud client by default.
+        if recognizer is None:
+            recognizer = clients.speech_client()
+        self.client = recognizer
+        # audio_source(sample_rate, chunk, buffer_seconds=...) opens the
+        # capture stream, e.g. an AudioFileStream to run a recorded meeting.
+        # See open_audio_source.
+        if audio_source is None:
+            audio_source = MicrophoneStream
+        self.audio_source = audio_source
+
+        # Long-running recognitions are polled in the background; pass a
+        # shared manager to cap concurrency across several meetings.
+        if job_manager is None:
+            job_manager = RecognitionJobManager(self.client, max_concurrent=max_concurrent_jobs)
+        self.job_manager = job_manager
+        # Raw microphone frames: the live stream and in-memory chunks.
+        self.recognition_config = self._recognition_config("LINEAR16")
+        # Recorded files, encoded with the recording codec.
+        self.file_recognition_config = self._recognition_config(
+            audio_codec.recognition_encoding(codec))
         self.streaming_config = types.StreamingRecognitionConfig(
             config=self.recognition_config,
             interim_results=True)
@@ -103,21 +400,264 @@ class SpeechToTextConfig:
         # Interim results will be noted within responses through the setting of
         # is_final to false
 
+    def open_audio_source(self):
+        return self.audio_source(self.sample_rate, self.chunk,
+                                 buffer_seconds=self.buffer_seconds)
 
-class SpeechToText:
-    def __init__(self, config=None):
-        self.config = config
+    def _recognition_config(self, encoding):
+        return types.RecognitionConfig(
+            encoding=getattr(enums.RecognitionConfig.AudioEncoding, encoding),
+            sample_rate_hertz=self.sample_rate,
+            language_code=self.language_code,
+            enable_word_time_offsets=True,
+            enable_word_confidence=True,
+            enable_speaker_diarization=True,
+            diarization_speaker_count=self.speaker_count)
 
-    def short_stream_meet(self):
-        with MicrophoneStream(self.config.sample_rate, self.config.chunk) as stream:
-            audio_generator = stream.generator()
-            requests = (types.StreamingRecognizeRequest(audio_content=content)
-                        for content in audio_generator)
 
-            responses = self.config.client.streaming_recognize(self.config.streaming_config, requests)
+class ChunkStitcher(object):
+    """Joins chunk transcriptions in time order as their jobs finish.
+
+    Chunks are numbered by ``add`` and stitched by ``done`` as soon as every
+    earlier chunk has been, so speakers are reconciled while the meeting
+    goes on. Their audio is only needed for matching voices, so it waits in
+    a temporary file instead of memory.
+    """
+
+    def __init__(self, stt):
+        self.stt = stt
+        self.transcript = Transcript(stt.config.speakers)
+        self._reconciler = silence_split.SpeakerReconciler(stt.config.speaker_count,
+                                                           stt.config.sample_rate)
+        self._audio = tempfile.TemporaryFile()
+        self._audio_lock = threading.Lock()
+        self._chunks = []  # (start, time map, offset in _audio, length)
+        self._finished = {}  # index -> future of a chunk waiting its turn
+        self._next = 0
+        self._error = None
+        self._cond = threading.Condition()
+
+    def add(self, chunk, time_map=None):
+        """Keep `chunk`'s audio for stitching and return its index.
+
+        ``chunk.pcm`` is dropped. If it was gated, `time_map` (a vad.TimeMap
+        starting at the chunk) gives its times on the meeting's clock.
+        """
+        with self._audio_lock:
+            self._audio.seek(0, os.SEEK_END)
+            self._chunks.append((chunk.start, time_map, self._audio.tell(),
+                                 len(chunk.pcm)))
+            self._audio.write(chunk.pcm)
+        chunk.pcm = None
+        return len(self._chunks) - 1
+
+    def _read(self, offset, length):
+        with self._audio_lock:
+            self._audio.seek(offset)
+            return self._audio.read(length)
+
+    def done(self, index, future):
+        """Job callback: chunk `index` has been recognized (or failed)."""
+        with self._cond:
+            self._finished[index] = future
+            while self._error is None and self._next in self._finished:
+                future = self._finished.pop(self._next)
+                try:
+                    self._stitch(self._chunks[self._next], future.result())
+                except Exception as e:
+                    self._error = e
+                self._next += 1
+            self._cond.notify_all()
+
+    def _stitch(self, chunk, response):
+        start, time_map, offset, length = chunk
+        if time_map is not None:
+            # The map already starts at the chunk.
+            start = 0
+        results = [result for result in response.results
+                   if result.alternatives and result.alternatives[0].words]
+        tags = self._reconciler.reconcile(self._read(offset, length), results)
+        for result in results:
+            self.stt.add_result(self.transcript, result, offset=start,
+                                speaker_num=tags[result.alternatives[0].words[0].speaker_tag],
+                                time_map=time_map)
+
+    def finish(self):
+        """Wait for every chunk added and return the transcript."""
+        with self._cond:
+            while self._error is None and self._next < len(self._chunks):
+                self._cond.wait()
+        self._audio.close()
+        if self._error is not None:
+            raise self._error
+        return self.transcript
+
 
-            # Now, put the transcription responses to use.
-            return self.listen_print_loop(responses)
+class SpeechToText:
+    def __init__(self, config=None, renderer=None, word_counter=None):
+        self.config = config
+        if renderer is None:
+            renderer = TerminalRenderer()
+        self.renderer = renderer
+        # Optional analyze_text.WordCounter updated with every final result
+        self.word_counter = word_counter
+
+        # The live meeting, see start_meeting and start_session.
+        self.transcript = None
+        self.exit_heard = False
+        self.stream = None
+        self.policy = None
+        self.spill_queue = None
+        self.session_start = 0
+        self.session_offset = 0
+        self.session_time_map = None
+        self.last_final_end = 0
+        self.first_interim = None
+        self.sent_audio = []
+        self.sent_times = []
+
+    def short_stream_meet(self, recorder=None):
+        """Transcribe live until the exit command is heard.
+
+        The API caps a single streaming call at about 5 minutes, so the audio
+        is sent in consecutive sessions of at most `streaming_limit` seconds.
+        Every new session starts where the last final result ended, replaying
+        the audio still held in the microphone's ring buffer, so no words are
+        lost or repeated across the boundary. Transient errors reconnect the
+        same way.
+        """
+        failures = 0
+        with self.config.open_audio_source() as stream:
+            self.start_meeting(stream)
+            if recorder is not None:
+                record_thread = threading.Thread(
+                    target=record_stream, args=(stream.reader(0), recorder))
+                record_thread.daemon = True
+                record_thread.start()
+
+            resume_position = 0
+            try:
+                while not self.exit_heard:
+                    if stream.closed and resume_position >= stream.captured_bytes:
+                        # The source ended and everything in it was recognized.
+                        break
+                    reader, requests = self.start_session(resume_position)
+                    try:
+                        responses = self.config.client.streaming_recognize(self.config.streaming_config, requests)
+
+                        # Now, put the transcription responses to use.
+                        self.listen_print_loop(responses)
+                        failures = 0
+                    except RECONNECT_ERRORS:
+                        RECONNECTS.inc()
+                        failures += 1
+                        if failures > self.config.max_reconnects:
+                            raise
+                        resume_position = self.end_session(reader, clean=False)
+                        time.sleep(min(0.5 * 2 ** failures, 10))
+                    else:
+                        resume_position = self.end_session(reader, clean=True)
+            finally:
+                self.end_meeting()
+
+        if recorder is not None:
+            record_thread.join()
+        return self.transcript
+
+    def start_meeting(self, stream):
+        """Start a new transcript of the audio captured by `stream`."""
+        self.transcript = Transcript(self.config.speakers)
+        self.exit_heard = False
+        self.stream = stream
+        self.policy = framing.FramingPolicy(self.config.sample_rate,
+                                            self.config.min_request_ms,
+                                            self.config.max_request_ms)
+        self.spill_queue = None
+        if self.config.backpressure == framing.SPILL:
+            # Shared by the meeting's sessions, so each can replay what the
+            # last one read.
+            self.spill_queue = framing.SpillQueue(
+                stream.reader(0), self.config.sample_rate,
+                spill_seconds=self.config.spill_seconds)
+
+    def end_meeting(self):
+        """Let go of what the meeting's sessions shared."""
+        # Draw any interim text still held back now, not after the meeting.
+        self.renderer.flush()
+        if self.spill_queue is not None:
+            self.spill_queue.close()
+            self.spill_queue = None
+
+    def start_session(self, resume_position):
+        """Begin a streaming call replaying the capture from `resume_position`.
+
+        Returns the reader the session's audio comes from and the requests
+        to send; the call ends by itself after `streaming_limit` seconds.
+        """
+        # Start from the oldest audio still held if the replay point was
+        # overwritten, so the session's times match what is sent.
+        if self.spill_queue is not None:
+            self.spill_queue.release(resume_position)
+            reader = self.spill_queue.reader(resume_position)
+        else:
+            reader = self.stream.reader()
+            reader.seek(resume_position)
+        if reader.position > resume_position:
+            framing.DROPPED_BYTES.inc(reader.position - resume_position)
+        self.session_start = reader.position
+        self.session_offset = self.session_start / float(self.config.sample_rate * SAMPLE_WIDTH)
+        self.last_final_end = 0
+        self.first_interim = None
+        deadline = time.time() + self.config.streaming_limit
+
+        gate = None
+        self.session_time_map = None
+        if self.config.voice_gating:
+            gate = vad.VoiceGate(self.config.sample_rate,
+                                 start_seconds=self.session_offset)
+            self.session_time_map = gate.time_map
+        audio_generator = self.stream.generator(reader, deadline, gate, self.policy)
+        SESSIONS.inc()
+        return reader, self.requests(audio_generator)
+
+    def end_session(self, reader, clean):
+        """Close a session's reader; return where the next session starts.
+
+        That is where the last final result ended (the session's start if
+        there was none, so speech only heard as interim results is sent
+        again), or where a `clean` session with no results at all stopped
+        reading, as there is nothing to replay.
+        """
+        if isinstance(reader, framing.SpillReader):
+            reader.close()
+        if clean and not self.last_final_end and self.first_interim is None:
+            return reader.position
+        return self.session_start \
+            + int(self.last_final_end * self.config.sample_rate) * SAMPLE_WIDTH
+
+    def requests(self, audio_generator):
+        """Wrap audio in requests, noting when each second of it was sent."""
+        # Parallel lists: audio seconds sent in this session, and when.
+        self.sent_audio = []
+        self.sent_times = []
+        bytes_per_second = float(self.config.sample_rate * SAMPLE_WIDTH)
+        sent = 0
+        for content in audio_generator:
+            with REQUEST_BUILD.time():
+                request = types.StreamingRecognizeRequest(audio_content=content)
+            sent += len(content)
+            self.sent_audio.append(sent / bytes_per_second)
+            self.sent_times.append(time.time())
+            REQUESTS_SENT.inc()
+            BYTES_SENT.inc(len(content))
+            yield request
+
+    def _observe_result(self, result, kind):
+        RESPONSES[kind].inc()
+        # The request holding the audio the result ends with.
+        i = bisect.bisect_left(self.sent_audio, _seconds(result.result_end_time))
+        if i < len(self.sent_times):
+            RESULT_LATENCY[kind].observe(time.time() - self.sent_times[i])
 
     def listen_print_loop(self, responses):
         """
@@ -128,118 +668,260 @@ class SpeechToText:
         multiple alternatives; for details, see https://goo.gl/tjCPAU.  Here we
         print only the transcription for the top alternative of the top result.
         """
-        num_chars_printed = 0
-        output = ""
+        self.first_interim = None
         for response in responses:
-            if not response.results:
-                continue
-
-            # The `results` list is consecutive. For streaming, we only care about
-            # the first result being considered, since once it's `is_final`, it
-            # moves on to considering the next utterance.
-            result = response.results[0]
-            if not result.alternatives:
-                continue
-
-            # Display the transcription of the top alternative.
-            transcript = result.alternatives[0].transcript
-
-            # Display interim results, but with a carriage return at the end of the
-            # line, so subsequent lines will overwrite them.
-            # If the previous result was longer than this one, we need to print
-            # some extra spaces to overwrite the previous result
-            overwrite_chars = ' ' * (num_chars_printed - len(transcript))
-
-            if not result.is_final:
-                sys.stdout.write(transcript + overwrite_chars + '\r')
-                sys.stdout.flush()
-
-                num_chars_printed = len(transcript)
-
+            if self.handle_response(response):
+                break
+        return self.transcript
+
+    def handle_response(self, response):
+        """Show one streaming response, adding a final result to the
+        transcript. Returns True once the exit command has been heard."""
+        if not response.results:
+            return False
+
+        # The `results` list is consecutive. For streaming, we only care about
+        # the first result being considered, since once it's `is_final`, it
+        # moves on to considering the next utterance.
+        result = response.results[0]
+        if not result.alternatives:
+            return False
+
+        # Display the transcription of the top alternative.
+        transcript = result.alternatives[0].transcript
+
+        # Interim results are redrawn in place at a capped frame rate;
+        # final results print only the new line.
+        if not result.is_final:
+            self._observe_result(result, "interim")
+            if self.first_interim is None:
+                self.first_interim = time.time()
+            self.renderer.interim(transcript)
+
+        else:
+            self._observe_result(result, "final")
+            if self.first_interim is not None:
+                INTERIM_TO_FINAL.observe(time.time() - self.first_interim)
+                self.first_interim = None
+            if self.session_time_map is not None:
+                segment = self.add_result(self.transcript, result,
+                                          time_map=self.session_time_map)
+                self.last_final_end = self.session_time_map.to_source(
+                    _seconds(result.result_end_time)) - self.session_offset
             else:
-                speaker_num = result.alternatives[0].words[0].speaker_tag
-                speaker = self.config.speakers[speaker_num - 1]
+                segment = self.add_result(self.transcript, result, offset=self.session_offset)
+                self.last_final_end = _seconds(result.result_end_time)
+            self.renderer.final(self.transcript.line(segment))
+            captured = self.stream.capture_time(
+                int((self.session_offset + self.last_final_end) * self.config.sample_rate) * SAMPLE_WIDTH)
+            if captured is not None:
+                SPEECH_TO_LINE.observe(time.time() - captured)
+
+            # Exit recognition
+            if re.search(self.config.exit_command, transcript, re.I):
+                self.exit_heard = True
+        return self.exit_heard
 
-                output += speaker + transcript + overwrite_chars + "\n"
-                print(output)
+    def short_response(self, choices):
+        return wake_word.listen_for(choices, self.config.language_code)
+
+    def capture(self, seconds):
+        """Yield audio from the config's source until `seconds` of it came in."""
+        remaining = int(seconds * self.config.sample_rate) * SAMPLE_WIDTH
+        with self.config.open_audio_source() as stream:
+            for data in stream.generator():
+                data = data[:remaining]
+                remaining -= len(data)
+                yield data
+                if remaining <= 0:
+                    break
 
-                # Exit recognition
-                if re.search(self.config.exit_command, transcript, re.I):
-                    return output
+    def long_asynchronous_meet(self, seconds):
+        now = datetime.datetime.now()
+        now = now.strftime("%Y-%m-%d_%H:%M")
+        return self.long_audio_transcript(self.capture(seconds),
+                                          "output/audio_long_meeting/" + now)
 
-                num_chars_printed = 0
+    def long_audio_transcript(self, audio, prefix, record=True):
+        """Transcribe the LINEAR16 chunks from `audio` with long-running
+        recognitions, recording its segments under `prefix`.
 
-    def short_response(self, choices):
-        r = sr.Recognizer()
+        With voice gating only speech goes into the segments, which are
+        named ``<prefix>_speech_<n>``; unless `record` is False the whole of
+        `audio` is also recorded to `prefix` plus the codec's extension.
+        """
+        # Finished segments are uploaded in the background while the meeting
+        # is still being recorded.
+        uploader = segment_uploader.SegmentUploader(self.config.storage_backend,
+                                                    max_workers=self.config.upload_workers)
+
+        gate = None
+        if self.config.voice_gating:
+            gate = vad.VoiceGate(self.config.sample_rate)
+
+        # Frames go straight to disk as they are read, so memory use stays
+        # constant no matter how long the meeting is.
+        paths = []
+
+        def on_segment(path, index):
+            paths.append(path)
+            uploader.submit(path)
+
+        recording = None
+        segment_prefix = prefix
+        if gate is not None:
+            segment_prefix = prefix + "_speech"
+            if record:
+                recording = audio_codec.recorder(
+                    self.config.codec, prefix + audio_codec.extension(self.config.codec),
+                    self.config.sample_rate, sample_width=SAMPLE_WIDTH)
+        try:
+            with segment_uploader.SegmentedRecorder(segment_prefix, self.config.sample_rate,
+                                                    self.config.segment_seconds,
+                                                    on_segment=on_segment,
+                                                    sample_width=SAMPLE_WIDTH,
+                                                    codec=self.config.codec) as recorder:
+                for data in audio:
+                    if recording is not None:
+                        recording.write(data)
+                    if gate is not None:
+                        # Only speech is uploaded and billed.
+                        data = gate.feed(data)
+                    recorder.write(data)
+        finally:
+            if recording is not None:
+                recording.close()
+
+        print("Finishing upload...")
+        uris = uploader.wait()
 
-        while True:
-            with sr.Microphone() as source:
-                audio = r.listen(source)
-            try:
-                answer = r.recognize_google(audio).lower()
-                print(answer)
-                if str(answer).lower() in choices:
-                    return answer
-            except:
-                pass
-
-    def long_asynchronous_meet(self, seconds, sample_format=pyaudio.paInt16, channels=1):
-        p = pyaudio.PyAudio()
-
-        stream = p.open(format=sample_format,
-                        channels=channels,
-                        rate=self.config.sample_rate,
-                        frames_per_buffer=self.config.chunk,
-                        input=True)
-
-        frames = []
-
-        for i in range(0, int(self.config.sample_rate / self.config.chunk * seconds)):
-            data = stream.read(self.config.chunk)
-            frames.append(data)
-
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-
-        # Save the recorded data as a WAV file
-        print("Exporting...")
+        print("Transcribing... (This may take a while)")
+        jobs = [self.submit_long_transcription(uri) for uri in uris]
+        # Every segment is diarized on its own; its speakers are matched to
+        # the meeting's by voice, one segment's audio at a time.
+        reconciler = silence_split.SpeakerReconciler(self.config.speaker_count,
+                                                     self.config.sample_rate)
+        meeting = Transcript(self.config.speakers)
+        for path, start, job in zip(paths, recorder.segment_starts, jobs):
+            results = [result for result in job.result().results
+                       if result.alternatives and result.alternatives[0].words]
+            tags = reconciler.reconcile(audio_codec.read_pcm(path), results)
+            for result in results:
+                self.add_result(meeting, result, offset=start,
+                                speaker_num=tags[result.alternatives[0].words[0].speaker_tag],
+                                time_map=gate.time_map if gate is not None else None)
+        return meeting
+
+    def long_split_meet(self, seconds):
+        """Record a long meeting, transcribing it in chunks while it goes on.
+
+        The audio is cut at pauses as it is captured and every chunk is sent
+        for recognition right away, so most of the work is done by the time
+        the meeting ends. With voice gating, only the speech in a chunk is
+        sent; the local recording keeps everything.
+        """
         now = datetime.datetime.now()
         now = now.strftime("%Y-%m-%d_%H:%M")
-        filename = "output/audio_long_meeting/" + now + ".wav"
-        wf = wave.open(filename, 'wb')
-        wf.setnchannels(channels)
-        wf.setsampwidth(p.get_sample_size(sample_format))
-        wf.setframerate(self.config.sample_rate)
-        wf.writeframes(b''.join(frames))
-        wf.close()
-
-        print("Uploading to Google Cloud...")
-        storage_client = storage.Client.from_service_account_json('Dolly-secret.json')
-        bucket = storage_client.get_bucket("dolly-long-audio")
-        blob = bucket.blob(filename)
-        blob.upload_from_filename(filename)
-
-        return self.long_transcribe_gcs(gcs_uri="gs://" + "dolly-long-audio" + "/" + filename)
+        filename = "output/audio_long_meeting/" + now + audio_codec.extension(self.config.codec)
+
+        splitter = silence_split.SilenceSplitter(self.config.sample_rate)
+        stitcher = ChunkStitcher(self)
+        # One detector for the meeting, so its noise floor carries over
+        # from chunk to chunk.
+        detector = None
+        if self.config.voice_gating:
+            detector = vad.VoiceActivityDetector(self.config.sample_rate)
+
+        def submit(chunk):
+            time_map = None
+            if detector is not None:
+                # Silence inside the chunk isn't sent, as in the live stream.
+                gate = vad.VoiceGate(self.config.sample_rate, detector=detector,
+                                     keepalive_seconds=None,
+                                     start_seconds=chunk.start)
+                chunk.pcm = gate.feed(chunk.pcm)
+                if not chunk.pcm:
+                    return
+                time_map = gate.time_map
+            audio = types.RecognitionAudio(content=chunk.pcm)
+            index = stitcher.add(chunk, time_map)
+            self.config.job_manager.submit(
+                self.config.recognition_config, audio,
+                callback=lambda future: stitcher.done(index, future))
+
+        # Compressed on a worker thread, so reads keep up with the microphone.
+        with audio_codec.recorder(self.config.codec, filename, self.config.sample_rate,
+                                  sample_width=SAMPLE_WIDTH) as recorder:
+            for data in self.capture(seconds):
+                recorder.write(data)
+                for chunk in splitter.feed(data):
+                    submit(chunk)
+
+        last = splitter.flush()
+        if last is not None:
+            submit(last)
 
-    def long_transcribe_gcs(self, gcs_uri):
         print("Transcribing... (This may take a while)")
-        audio = types.RecognitionAudio(uri=gcs_uri)
+        return stitcher.finish()
 
-        operation = self.config.client.long_running_recognize(self.config.recognition_config, audio)
+    def long_transcribe_gcs(self, gcs_uri):
+        print("Transcribing... (This may take a while)")
+        response = self.submit_long_transcription(gcs_uri).result()
+        return self.long_response_transcript(response)
 
-        response = operation.result(timeout=90)
+    def submit_long_transcription(self, gcs_uri, callback=None):
+        """Start transcribing `gcs_uri` and return a future for the response.
 
+        The operation is polled by the config's job manager, so any number of
+        meetings can be submitted and collected concurrently.
+        """
+        if gcs_uri.startswith("file://"):
+            # Uploaded by a LocalStorageBackend: the API can only read
+            # gs:// URIs, so the file is sent inline.
+            with open(gcs_uri[len("file://"):], 'rb') as f:
+                audio = types.RecognitionAudio(content=f.read())
+        else:
+            audio = types.RecognitionAudio(uri=gcs_uri)
+        return self.config.job_manager.submit(self.config.file_recognition_config, audio,
+                                              callback=callback)
+
+    def long_response_transcript(self, response, meeting=None, offset=0, time_map=None):
+        if meeting is None:
+            meeting = Transcript(self.config.speakers)
         # Each result is for a consecutive portion of the audio. Iterate through
         # them to get the transcripts for the entire audio file.
-        text = ""
         for result in response.results:
-            speaker_num = result.alternatives[0].words[0].speaker_tag
-            speaker = self.config.speakers[speaker_num - 1]
+            self.add_result(meeting, result, offset=offset, time_map=time_map)
 
-            text += speaker + result.alternatives[0].transcript + '\n'
-            # The first alternative is the most likely one for this portion.
-            # print(u'Transcript: {}'.format(result.alternatives[0].transcript))
-            # print('Confidence: {}'.format(result.alternatives[0].confidence))
+        return meeting
 
-        return text
+    def add_result(self, meeting, result, offset=0, speaker_num=None, time_map=None):
+        """Append the top alternative of `result` to the `meeting` transcript.
+
+        Word times are shifted by `offset` seconds so they are relative to the
+        start of the meeting rather than of the session or chunk. If the audio
+        was gated, `time_map` (a vad.TimeMap) then maps the shifted times from
+        the gated audio back to the capture.
+        """
+        def meeting_time(duration):
+            seconds = offset + _seconds(duration)
+            if time_map is not None:
+                seconds = time_map.to_source(seconds)
+            return seconds
+
+        # The first alternative is the most likely one for this portion.
+        alternative = result.alternatives[0]
+        if speaker_num is None:
+            speaker_num = alternative.words[0].speaker_tag
+
+        words = [Word(word.word,
+                      meeting_time(word.start_time),
+                      meeting_time(word.end_time),
+                      word.confidence)
+                 for word in alternative.words]
+        if self.word_counter is not None:
+            self.word_counter.add(speaker_num - 1, alternative.transcript)
+        return meeting.append(speaker_num - 1, alternative.transcript,
+                              start=words[0].start if words else offset,
+                              end=words[-1].end if words else offset,
+                              words=words)
@@ -0,0 +1,51 @@
+import abc
+import os
+import shutil
+
+import clients
+
+
+class StorageBackend(abc.ABC):
+    """Where recorded audio is uploaded before long transcription."""
+
+    @abc.abstractmethod
+    def upload(self, local_path, name):
+        """Store ``local_path`` under ``name`` and return its URI."""
+
+
+class LocalStorageBackend(StorageBackend):
+    """Copies files into a directory; used for offline runs and benchmarks.
+
+    Its file:// URIs can't be read by the API, so
+    SpeechToText.submit_long_transcription sends such files inline.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def upload(self, local_path, name):
+        destination = os.path.join(self.root, name.lstrip("/"))
+        directory = os.path.dirname(destination)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        shutil.copyfile(local_path, destination)
+        return "file://" + os.path.abspath(destination)
+
+
+class GCSStorageBackend(StorageBackend):
+    """Uploads to a Google Cloud Storage bucket."""
+
+    def __init__(self, bucket_name,
+                 credentials_file=clients.DEFAULT_CREDENTIALS_FILE):
+        self.bucket_name = bucket_name
+        self.credentials_file = credentials_file
+
+    @property
+    def bucket(self):
+        # Shared by every backend and meeting in the process.
+        return clients.storage_bucket(self.bucket_name, self.credentials_file)
+
+    def upload(self, local_path, name):
+        blob = self.bucket.blob(name)
+        blob.upload_from_filename(local_path)
+        return "gs://" + self.bucket_name + "/" + name
@@ -0,0 +1,85 @@
+import analyze_text
+import idf_index
+
+SPEAKERS = ["Alice: ", "Bob: "]
+ARCHIVE = {
+    "a.txt": "Alice: budget review budget plan",
+    "b.txt": "Bob: design review release",
+    "c.txt": "Alice: release deadline customer",
+}
+
+
+def archive_index():
+    index = idf_index.IdfIndex()
+    for name, text in ARCHIVE.items():
+        index.add_document(name, text)
+    return index
+
+
+def analyzer(index):
+    # Korean stopwords are built in, so English text needs no NLTK data.
+    return analyze_text.AnalyzeText(SPEAKERS, 2, 3, idf_index=index,
+                                    language_code="ko-KR")
+
+
+def test_archived_meeting_is_not_counted_twice():
+    index = archive_index()
+    text = ARCHIVE["a.txt"]
+    terms, scores = index.scores(text, name="a.txt")
+    # Scored with the archive's own document frequencies, as refitting on
+    # the archive would, not with an extra copy of the meeting.
+    assert dict(zip(terms, scores)) == dict(
+        (term, count * index.idf()[index.term_ids[term]])
+        for term, count in [("alice", 1), ("budget", 2), ("plan", 1),
+                            ("review", 1)])
+    new_terms, new_scores = index.scores(text, name=None)
+    assert new_terms == terms
+    assert list(new_scores) != list(scores)
+
+
+class RecordingIndex(idf_index.IdfIndex):
+    def __init__(self):
+        super(RecordingIndex, self).__init__()
+        self.names = []
+
+    def scores(self, text, stop_words=(), *, name):
+        self.names.append(name)
+        return super(RecordingIndex, self).scores(text, stop_words, name=name)
+
+
+def test_analyze_scores_an_archived_meeting_by_its_name():
+    index = RecordingIndex()
+    for name, text in ARCHIVE.items():
+        index.add_document(name, text)
+    _, _, keywords = analyzer(index).analyze(ARCHIVE["a.txt"], name="a.txt")
+    assert index.names == ["a.txt"]
+    assert keywords[0] == "budget"
+
+
+def test_word_counter_matches_counting_the_rendered_transcript():
+    from transcript import Transcript
+
+    speakers = list(SPEAKERS)
+    counter_analyzer = analyze_text.AnalyzeText(speakers, 2, 3,
+                                                language_code="ko-KR")
+    counter = counter_analyzer.word_counter()
+    meeting = Transcript(speakers)
+    lines = [(0, "the budget review is today"),
+             (1, "review the budget again please"),
+             (-1, "an undiarized remark about the plan"),
+             (0, "budget plan done, Bob"),
+             (1, "Carol will own the release plan")]
+    for speaker, text in lines:
+        meeting.append(speaker, text)
+        counter.add(speaker, text)
+
+    def same():
+        expected = counter_analyzer.word_count(meeting.render())
+        assert list(counter.counts().items()) == list(expected.items())
+
+    same()
+    # Renaming a speaker changes both the name words and the stopwords.
+    speakers[1] = "Carol Smith: "
+    meeting.rename(1, "Carol Smith: ")
+    same()
+    assert "bob" in counter.counts() and "carol" not in counter.counts()
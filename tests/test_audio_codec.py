@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import audio_codec
+
+RATE = 16000
+
+
+def tone(seconds):
+    t = np.arange(int(seconds * RATE)) / float(RATE)
+    return (8000 * np.sin(2 * np.pi * 440 * t)).astype('<i2').tobytes()
+
+
+def test_flac_round_trip(tmp_path):
+    path = str(tmp_path / "a.flac")
+    audio = tone(1.0)
+    with audio_codec.recorder(audio_codec.FLAC, path, RATE) as recorder:
+        for start in range(0, len(audio), 3201):  # not frame aligned
+            recorder.write(audio[start:start + 3201])
+    assert recorder.duration == 1.0
+    assert audio_codec.read_pcm(path) == audio
+
+
+def test_write_blocks_once_the_queue_is_full(tmp_path):
+    recorder = audio_codec.EncodingRecorder(
+        audio_codec.FLAC, str(tmp_path / "a.flac"), RATE, max_queued=2)
+    encoding = threading.Event()
+    resume = threading.Event()
+    buffer_write = recorder._file.buffer_write
+
+    def slow_write(*args, **kwargs):
+        encoding.set()
+        resume.wait()
+        return buffer_write(*args, **kwargs)
+
+    recorder._file.buffer_write = slow_write
+    recorder.write(tone(0.1))  # taken by the encoder, which then stalls
+    assert encoding.wait(5)
+    recorder.write(tone(0.1))
+    recorder.write(tone(0.1))
+    writer = threading.Thread(target=recorder.write, args=(tone(0.1),))
+    writer.start()
+    writer.join(0.2)
+    assert writer.is_alive()
+    resume.set()
+    writer.join(5)
+    assert not writer.is_alive()
+    recorder.close()
+    assert len(audio_codec.read_pcm(recorder.filename)) == len(tone(0.4))
+
+
+def test_long_recordings_are_flushed_while_recording(tmp_path):
+    recorder = audio_codec.EncodingRecorder(
+        audio_codec.FLAC, str(tmp_path / "a.flac"), RATE, flush_seconds=0)
+    flushed = threading.Event()
+    flush = recorder._file.flush
+
+    def counting_flush():
+        flush()
+        flushed.set()
+
+    recorder._file.flush = counting_flush
+    recorder.write(tone(0.5))
+    assert flushed.wait(5)
+    recorder.close()
+
+
+def test_unsupported_subtype_is_refused_clearly(tmp_path, monkeypatch):
+    import soundfile
+
+    monkeypatch.setattr(soundfile, "available_subtypes",
+                        lambda format=None: {"VORBIS": "Vorbis"})
+    with pytest.raises(ValueError, match="SoundFile 0.11"):
+        audio_codec.recorder(audio_codec.OGG_OPUS, str(tmp_path / "a.opus"),
+                             RATE)
+
+
+def test_encoder_errors_stay_raised(tmp_path):
+    recorder = audio_codec.EncodingRecorder(audio_codec.FLAC,
+                                            str(tmp_path / "a.flac"), RATE)
+    failed = threading.Event()
+
+    def broken_write(*args, **kwargs):
+        failed.set()
+        raise IOError("disk full")
+
+    recorder._file.buffer_write = broken_write
+    recorder.write(tone(0.1))
+    assert failed.wait(5)
+    deadline = time.time() + 5
+    while recorder._error is None and time.time() < deadline:
+        time.sleep(0.01)
+    for _ in range(3):
+        with pytest.raises(IOError, match="disk full"):
+            recorder.write(tone(0.1))
+    with pytest.raises(IOError):
+        recorder.close()
+    with pytest.raises(IOError):
+        recorder.close()
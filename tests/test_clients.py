@@ -0,0 +1,70 @@
+from google.api_core import exceptions
+from google.api_core import grpc_helpers
+import grpc
+import pytest
+
+import clients
+import wake_word
+
+
+def test_speech_channel_gets_keepalive_options(monkeypatch):
+    created = []
+
+    def create_channel(target, **kwargs):
+        created.append((target, kwargs))
+        return grpc.insecure_channel("localhost:1")
+
+    monkeypatch.setattr(grpc_helpers, "create_channel", create_channel)
+    monkeypatch.setattr(clients, "_speech_client", None)
+    monkeypatch.setattr(clients, "_speech_channel", None)
+    client = clients.speech_client()
+    assert clients.speech_client() is client
+    [(target, kwargs)] = created
+    assert target == clients.SPEECH_ADDRESS
+    assert kwargs["options"] == clients.KEEPALIVE_OPTIONS
+    assert kwargs["scopes"]
+
+
+class FakeStream(object):
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeClient(object):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def recognize(self, config, audio):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        from google.cloud.speech_v1p1beta1 import types
+
+        return types.RecognizeResponse(results=[types.SpeechRecognitionResult(
+            alternatives=[types.SpeechRecognitionAlternative(
+                transcript=" Yes")])])
+
+
+def listen(monkeypatch, client):
+    monkeypatch.setattr(clients, "speech_client", lambda: client)
+    monkeypatch.setattr(wake_word, "_open_stream", FakeStream)
+    monkeypatch.setattr(wake_word, "record_utterance", lambda stream: b"\0\0")
+    return wake_word.listen_for(("yes", "no"))
+
+
+def test_listen_for_retries_transient_errors(monkeypatch):
+    client = FakeClient([exceptions.ServiceUnavailable("down"),
+                         exceptions.DeadlineExceeded("slow")])
+    assert listen(monkeypatch, client) == "yes"
+    assert client.calls == 3
+
+
+def test_listen_for_raises_other_errors(monkeypatch):
+    client = FakeClient([exceptions.PermissionDenied("bad credentials")])
+    with pytest.raises(exceptions.PermissionDenied):
+        listen(monkeypatch, client)
+    assert client.calls == 1
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from framing import FramingPolicy, SpillQueue
+from ring_buffer import RingBuffer
+
+# 1000 bytes of LINEAR16 audio per second keeps the limits small.
+RATE = 500
+AUDIO = bytes(bytearray(range(200)))
+
+
+def read_all(reader, **kwargs):
+    data = reader.read(timeout=1, **kwargs)
+    return None if data is None else b''.join(data)
+
+
+def filled_queue(memory_seconds=10, spill_seconds=3600, writes=20):
+    """A SpillQueue that has taken all of AUDIO from a closed ring."""
+    ring = RingBuffer(len(AUDIO))
+    queue = SpillQueue(ring.reader(0), RATE, memory_seconds=memory_seconds,
+                       spill_seconds=spill_seconds)
+    step = len(AUDIO) // writes
+    for i in range(0, len(AUDIO), step):
+        ring.write(AUDIO[i:i + step])
+        # One run per write, as when audio arrives in real time.
+        while queue._end < i + step:
+            time.sleep(0.001)
+    ring.close()
+    queue._thread.join()
+    return queue
+
+
+def test_requests_grow_while_behind_and_shrink_back():
+    policy = FramingPolicy(16000, min_ms=100, max_ms=500)
+    assert (policy.min_bytes, policy.max_bytes) == (3200, 16000)
+    for _ in range(5):
+        policy.update(backlog=10 ** 6)
+    assert policy.frame_bytes == 16000
+    for _ in range(5):
+        policy.update(backlog=0)
+    assert policy.frame_bytes == 3200
+
+
+def test_frames_are_whole_samples():
+    policy = FramingPolicy(11025, min_ms=10, max_ms=15)
+    assert policy.min_bytes % 2 == 0 and policy.max_bytes % 2 == 0
+    policy.update(backlog=10 ** 6)
+    assert policy.frame_bytes == policy.max_bytes
+
+
+def test_audio_past_the_memory_limit_is_spilled_and_read_in_order():
+    queue = filled_queue(memory_seconds=0.05)
+    assert queue.bytes_spilled >= len(AUDIO) - 50
+    reader = queue.reader(0)
+    assert read_all(reader, max_bytes=30) == AUDIO[:30]
+    assert read_all(reader) == AUDIO[30:]
+    assert read_all(reader) is None
+    queue.close()
+
+
+def test_next_session_replays_what_the_last_one_read():
+    queue = filled_queue(memory_seconds=0.05)
+    first = queue.reader(0)
+    assert read_all(first) == AUDIO
+    first.close()
+
+    queue.release(120)
+    second = queue.reader(120)
+    assert second.position == 120
+    assert read_all(second) == AUDIO[120:]
+    # Released audio is gone; a reader starts at the oldest kept.
+    assert queue.reader(0).position == 120
+    queue.close()
+
+
+def test_audio_past_the_spill_limit_is_dropped_at_a_gap():
+    queue = filled_queue(memory_seconds=0.05, spill_seconds=0.05)
+    assert queue.bytes_dropped > 0
+    reader = queue.reader(0)
+    kept = read_all(reader)
+    assert kept == AUDIO[:len(kept)]
+    rest = read_all(reader)
+    assert reader.position == len(AUDIO)
+    assert len(kept) + len(rest) + queue.bytes_dropped == len(AUDIO)
+    assert rest == AUDIO[-len(rest):]
+    queue.close()
+
+
+def test_closing_a_reader_ends_its_waiting_read():
+    ring = RingBuffer(100)
+    queue = SpillQueue(ring.reader(0), RATE)
+    reader = queue.reader(0)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(
+        reader.read(min_bytes=10, timeout=5)))
+    thread.start()
+    reader.close()
+    thread.join(1)
+    assert result == [None]
+    ring.close()
+    queue.close()
@@ -0,0 +1,68 @@
+import threading
+
+import numpy as np
+import pytest
+
+from idf_index import IdfIndex
+
+
+def test_saved_index_loads_the_same(tmpdir):
+    index = IdfIndex()
+    index.add_document("a.txt", "budget review")
+    index.add_document("b.txt", "会議の予定 review")
+    path = str(tmpdir.join("idf.npz"))
+    index.save(path)
+
+    loaded = IdfIndex.load(path)
+    assert loaded.terms == index.terms
+    assert loaded.documents == {"a.txt", "b.txt"}
+    assert list(loaded.df) == list(index.df)
+
+
+def test_documents_are_counted_once():
+    index = IdfIndex()
+    assert index.add_document("a.txt", "review review budget")
+    assert not index.add_document("a.txt", "review")
+    assert index.df[index.term_ids["review"]] == 1
+    assert index.doc_count == 1
+
+
+def test_scoring_while_meetings_are_added():
+    index = IdfIndex()
+    errors = []
+    done = threading.Event()
+
+    def add():
+        for i in range(200):
+            # Many new terms each, so the vocabulary grows ahead of df.
+            text = " ".join("w%dx%d" % (i, j) for j in range(300))
+            index.add_document("%d.txt" % i, text + " shared")
+        done.set()
+
+    def score():
+        try:
+            while not done.is_set():
+                terms, scores = index.scores("shared w5x1 w150x1 new words",
+                                             name=None)
+                assert len(terms) == len(scores)
+                assert np.all(np.isfinite(scores))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add)] \
+        + [threading.Thread(target=score) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_scores_needs_the_meeting_name():
+    index = IdfIndex()
+    index.add_document("a.txt", "budget review")
+    with pytest.raises(TypeError):
+        index.scores("budget review")
+    archived, _ = index.scores("budget review", name="a.txt")
+    new, _ = index.scores("budget review", name=None)
+    assert archived == new == ["budget", "review"]
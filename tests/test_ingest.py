@@ -0,0 +1,58 @@
+import json
+import os
+
+import ingest
+import recognizer_backend
+
+
+def test_ledger_remembers_across_instances(tmpdir):
+    path = str(tmpdir.join("state", "ingested.json"))
+    ledger = ingest.Ledger(path)
+    assert "abc" not in ledger
+    ledger.add("abc", "incoming/a.wav", "output/a.txt")
+
+    assert "abc" in ingest.Ledger(path)
+    with open(path) as f:
+        entry = json.load(f)["abc"]
+    assert entry["source"] == "incoming/a.wav"
+    assert entry["export"] == "output/a.txt"
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_file_hash_is_by_content(tmpdir):
+    first, second = tmpdir.join("a.wav"), tmpdir.join("b.wav")
+    first.write_binary(b"RIFF" * 1000)
+    second.write_binary(b"RIFF" * 1000)
+    assert ingest.file_hash(str(first)) == ingest.file_hash(str(second))
+
+
+class QueueingService(ingest.IngestService):
+    """Notes the recordings queued instead of transcribing them."""
+
+    def __init__(self, *args, **kwargs):
+        super(QueueingService, self).__init__(*args, **kwargs)
+        self.queued_paths = []
+
+    def _process(self, path):
+        self.queued_paths.append(path)
+
+
+def test_scan_queues_finished_files_once_and_forgets_removed_ones(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    incoming = tmpdir.mkdir("incoming")
+    service = QueueingService(str(incoming), workers=1,
+                              ledger=ingest.Ledger(str(tmpdir.join("ledger.json"))),
+                              recognizer=recognizer_backend.SyntheticRecognizer())
+    recording = incoming.join("a.wav")
+    recording.write_binary(b"audio")
+    incoming.join("notes.txt").write("not audio")
+
+    service.scan()  # first sight: may still be growing
+    service.scan()
+    service.scan()
+    service.executor.shutdown(wait=True)
+    assert service.queued_paths == [str(recording)]
+
+    recording.remove()
+    service.scan()
+    assert service._stat == {} and service._submitted == {}
@@ -0,0 +1,154 @@
+import threading
+import time
+
+from google.api_core import exceptions
+import pytest
+
+from job_manager import RecognitionJobManager
+
+
+class FakeOperation(object):
+    def __init__(self, client, audio):
+        self.client = client
+        self.audio = audio
+        self.polls = []
+
+    def done(self):
+        self.polls.append(time.time())
+        with self.client.lock:
+            if self.client.poll_errors:
+                raise self.client.poll_errors.pop(0)
+        return self.client.finished.is_set() or \
+            len(self.polls) > self.client.polls_needed
+
+    def result(self, timeout=None):
+        with self.client.lock:
+            self.client.in_flight -= 1
+        if isinstance(self.audio, Exception):
+            raise self.audio
+        return "text of %s" % self.audio
+
+
+class FakeClient(object):
+    def __init__(self, polls_needed=0, submit_errors=(), poll_errors=()):
+        self.polls_needed = polls_needed
+        self.submit_errors = list(submit_errors)
+        self.poll_errors = list(poll_errors)
+        self.finished = threading.Event()
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.submits = 0
+        self.operations = []
+
+    def long_running_recognize(self, config, audio):
+        with self.lock:
+            self.submits += 1
+            if self.submit_errors:
+                raise self.submit_errors.pop(0)
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        operation = FakeOperation(self, audio)
+        self.operations.append(operation)
+        return operation
+
+
+def manager(client, **kwargs):
+    kwargs.setdefault("min_interval", 0.01)
+    kwargs.setdefault("max_interval", 0.04)
+    kwargs.setdefault("backoff", 2)
+    return RecognitionJobManager(client, **kwargs)
+
+
+def test_at_most_max_concurrent_operations_run():
+    client = FakeClient(polls_needed=3)
+    jobs = manager(client, max_concurrent=2)
+    results = [jobs.submit(None, i) for i in range(6)]
+    assert [f.result(5) for f in results] == \
+        ["text of %d" % i for i in range(6)]
+    assert client.most_in_flight == 2
+    jobs.shutdown()
+
+
+def test_poll_interval_backs_off_up_to_the_maximum():
+    client = FakeClient(polls_needed=6)
+    jobs = manager(client)
+    jobs.submit(None, "a").result(5)
+    jobs.shutdown()
+    polls = client.operations[0].polls
+    gaps = [b - a for a, b in zip(polls, polls[1:])]
+    # 0.02, 0.04, then capped at 0.04 (plus scheduling slack).
+    assert gaps[0] < gaps[1]
+    assert all(0.035 <= gap < 0.1 for gap in gaps[1:])
+
+
+def test_callbacks_get_the_result_or_the_error():
+    client = FakeClient()
+    jobs = manager(client)
+    done = []
+    event = threading.Event()
+
+    def callback(future):
+        done.append(future)
+        if len(done) == 2:
+            event.set()
+
+    jobs.submit(None, "ok", callback=callback)
+    jobs.submit(None, exceptions.InvalidArgument("bad audio"),
+                callback=callback)
+    assert event.wait(5)
+    jobs.shutdown()
+    outcomes = sorted(repr(f.exception()) if f.exception() else f.result()
+                      for f in done)
+    assert outcomes[1] == "text of ok"
+    assert "bad audio" in outcomes[0]
+
+
+def test_transient_errors_are_retried():
+    client = FakeClient(submit_errors=[exceptions.ServiceUnavailable("a"),
+                                       exceptions.DeadlineExceeded("b")],
+                        poll_errors=[exceptions.ServiceUnavailable("c")])
+    jobs = manager(client)
+    assert jobs.submit(None, "x").result(5) == "text of x"
+    assert client.submits == 3
+    jobs.shutdown()
+
+
+def test_permanent_or_repeated_errors_fail_the_job():
+    client = FakeClient(submit_errors=[exceptions.PermissionDenied("no")])
+    jobs = manager(client)
+    with pytest.raises(exceptions.PermissionDenied):
+        jobs.submit(None, "x").result(5)
+    assert client.submits == 1
+
+    client = FakeClient(poll_errors=[exceptions.ServiceUnavailable("down")]
+                        * 3)
+    jobs = manager(client, max_retries=2)
+    with pytest.raises(exceptions.ServiceUnavailable):
+        jobs.submit(None, "x").result(5)
+    jobs.shutdown()
+
+
+def test_a_slow_start_does_not_block_submit():
+    client = FakeClient()
+    started = threading.Event()
+    release = threading.Event()
+    recognize = client.long_running_recognize
+
+    def slow_recognize(config, audio):
+        started.set()
+        release.wait(5)
+        return recognize(config, audio)
+
+    client.long_running_recognize = slow_recognize
+    jobs = manager(client)
+    first = jobs.submit(None, "slow")
+    assert started.wait(5)
+    began = time.time()
+    second = jobs.submit(None, "next")
+    assert jobs.pending_count + jobs.running_count == 2
+    assert time.time() - began < 0.5
+    release.set()
+    assert first.result(5) == "text of slow"
+    assert second.result(5) == "text of next"
+    jobs.shutdown()
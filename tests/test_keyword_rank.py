@@ -0,0 +1,40 @@
+import numpy as np
+
+import keyword_rank
+
+
+def test_top_k_is_largest_first():
+    values = np.array([0.1, 0.9, 0.4, 0.7, 0.2])
+    assert keyword_rank.top_k(values, 3).tolist() == [1, 3, 2]
+
+
+def test_top_k_breaks_ties_by_position_or_tie_keys():
+    values = np.array([1.0, 2.0, 1.0, 2.0, 1.0])
+    assert keyword_rank.top_k(values, 3).tolist() == [1, 3, 0]
+    tie_keys = np.array([5, 9, 4, 8, 3])
+    assert keyword_rank.top_k(values, 3, tie_keys=tie_keys).tolist() == \
+        [3, 1, 4]
+
+
+def test_top_k_edge_cases():
+    values = np.array([3.0, 1.0, 2.0])
+    assert keyword_rank.top_k(values, 10).tolist() == [0, 2, 1]
+    assert keyword_rank.top_k(values, 0).tolist() == []
+    assert keyword_rank.top_k(np.zeros(0), 5).tolist() == []
+
+
+def test_top_k_matches_a_full_sort():
+    rng = np.random.RandomState(0)
+    values = rng.randint(0, 20, size=1000).astype(np.float64)
+    expected = sorted(range(len(values)), key=lambda i: (-values[i], i))
+    for k in (1, 7, 50, 999):
+        assert keyword_rank.top_k(values, k).tolist() == expected[:k]
+
+
+def test_top_keywords_of_a_sparse_row():
+    feature_names = ["alpha", "beta", "gamma", "delta"]
+    # Columns out of order, as in a CSR row; beta and delta tie.
+    data = [0.5, 0.9, 0.5, 0.1]
+    indices = [3, 2, 1, 0]
+    assert keyword_rank.top_keywords(data, indices, feature_names, 3) == \
+        ["gamma", "beta", "delta"]
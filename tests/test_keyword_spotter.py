@@ -0,0 +1,96 @@
+import numpy as np
+
+import keyword_spotter
+from keyword_spotter import KeywordSpotter, MfccExtractor, Templates
+
+RATE = 16000
+
+
+def glides(pieces, stretch=1.0, pitch=1.0, seed=0):
+    """A made-up "word": harmonic tones gliding between frequencies."""
+    rng = np.random.RandomState(seed)
+    parts = []
+    for start_hz, end_hz, seconds in pieces:
+        hz = np.linspace(start_hz, end_hz, int(seconds * stretch * RATE)) * pitch
+        phase = 2 * np.pi * np.cumsum(hz) / RATE
+        parts.append(np.sin(phase) + 0.5 * np.sin(2 * phase))
+    audio = np.concatenate(parts) * 6000
+    return (audio + rng.normal(0, 100, len(audio))).astype('<i2')
+
+
+KEYWORD = [(300, 900, 0.2), (900, 500, 0.15), (1200, 2400, 0.25),
+           (600, 300, 0.2)]
+OTHER_WORD = [(2000, 1000, 0.3), (400, 400, 0.3), (1500, 700, 0.2)]
+
+
+def templates():
+    return Templates.enroll([glides(KEYWORD, 1.0, 1.0, seed=0),
+                             glides(KEYWORD, 1.05, 1.03, seed=1),
+                             glides(KEYWORD, 0.95, 0.98, seed=2)], RATE)
+
+
+def in_quiet(samples, seed=5):
+    rng = np.random.RandomState(seed)
+
+    def quiet(seconds):
+        return rng.normal(0, 50, int(seconds * RATE)).astype('<i2')
+
+    return np.concatenate((quiet(0.5), samples, quiet(1.0)))
+
+
+def detections(spotter, samples):
+    data = samples.tobytes()
+    chunk = RATE // 10 * 2
+    return [i for i in range(0, len(data), chunk)
+            if spotter.feed(data[i:i + chunk])]
+
+
+def test_streamed_features_match_the_whole_recording():
+    samples = glides(KEYWORD)
+    streaming = MfccExtractor(RATE)
+    pieces = [streaming.feed(samples[i:i + 777])
+              for i in range(0, len(samples), 777)]
+    whole = MfccExtractor(RATE).compute(samples)
+    assert whole.shape == (78, 12)
+    assert np.allclose(np.concatenate(pieces), whole, atol=1e-3)
+
+
+def test_dtw_matches_a_time_stretched_copy():
+    features = MfccExtractor(RATE).compute(glides(KEYWORD))
+    slower = MfccExtractor(RATE).compute(glides(KEYWORD, stretch=1.4))
+    other = MfccExtractor(RATE).compute(glides(OTHER_WORD))
+    assert keyword_spotter.dtw_distance(features, features) == 0
+    assert keyword_spotter.dtw_distance(features, slower) * 2 < \
+        keyword_spotter.dtw_distance(features, other)
+    assert keyword_spotter.dtw_distance(features, other[:0]) == np.inf
+
+
+def test_spotter_finds_slower_and_faster_renditions_once():
+    enrolled = templates()
+    for stretch in (0.8, 1.3):
+        spotter = KeywordSpotter(enrolled)
+        found = detections(spotter, in_quiet(glides(KEYWORD, stretch, seed=7)))
+        assert len(found) == 1
+        assert spotter.audio_seconds > 1.5
+        assert spotter.cpu_per_audio_second > 0
+
+
+def test_spotter_rejects_noise_and_other_words():
+    enrolled = templates()
+    noise = np.random.RandomState(3).normal(0, 3000, 3 * RATE).astype('<i2')
+    for samples in (noise, in_quiet(glides(OTHER_WORD))):
+        spotter = KeywordSpotter(enrolled)
+        assert detections(spotter, samples) == []
+        assert spotter.last_score > spotter.threshold
+
+
+def test_templates_save_and_load(tmpdir):
+    enrolled = templates()
+    path = str(tmpdir.join("wake_word.npz"))
+    enrolled.save(path)
+    loaded = Templates.load(path)
+    assert loaded.sample_rate == RATE
+    assert loaded.reference == enrolled.reference
+    assert len(loaded.features) == 3
+    assert all(np.array_equal(a, b)
+               for a, b in zip(loaded.features, enrolled.features))
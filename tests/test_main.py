@@ -0,0 +1,10 @@
+import main
+
+
+def test_export_names_are_distinct():
+    assert main.export_names(["a/x.wav", "b/y.flac"], "p_") == ["p_x", "p_y"]
+    # The numbered name is itself a recording's name.
+    assert main.export_names(["x.wav", "x_2.wav", "d/x.wav", "e/x.wav"], "") \
+        == ["x", "x_2", "x_3", "x_4"]
+    assert main.export_names(["x.wav", "d/x.wav", "x_2.wav"], "") \
+        == ["x", "x_2", "x_2_2"]
@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+
+import audio_codec
+import meeting_core
+import recognizer_backend
+import speech_to_text
+from storage_backend import LocalStorageBackend
+import wav_recorder
+
+RATE = 16000
+SPEAKERS = ["A: ", "B: "]
+
+
+def meeting(tmpdir, source, name):
+    recognizer = recognizer_backend.SyntheticRecognizer()
+    config = speech_to_text.SpeechToTextConfig(
+        SPEAKERS, 2, RATE, RATE // 10, "en-US", r'\bexit\b',
+        storage_backend=LocalStorageBackend(str(tmpdir)), recognizer=recognizer,
+        voice_gating=False,
+        audio_source=lambda rate, chunk, **kwargs: speech_to_text.AudioFileStream(
+            rate, chunk, source, speed=None, duration=30, **kwargs))
+    return meeting_core.Meeting(config, name=name)
+
+
+def test_meetings_run_side_by_side(tmpdir):
+    source = str(tmpdir.join("speech.wav"))
+    rng = np.random.RandomState(0)
+    with wav_recorder.WavRecorder(source, RATE) as recorder:
+        recorder.write(rng.randint(-3000, 3000, RATE * 10).astype('<i2').tobytes())
+
+    meetings = [meeting(tmpdir, source, name) for name in ("one", "two")]
+    results = asyncio.run(meeting_core.run_meetings(meetings))
+    for item, result in zip(meetings, results):
+        assert result is item.transcript
+        # Five-second utterances over 30 seconds of audio.
+        assert len(result.segments) == 6
+        assert result.segments[-1].end == 30
+
+
+def test_meeting_records_the_whole_capture(tmpdir):
+    source = str(tmpdir.join("speech.wav"))
+    audio = np.random.RandomState(1).randint(-3000, 3000, RATE * 10) \
+        .astype('<i2').tobytes()
+    with wav_recorder.WavRecorder(source, RATE) as recorder:
+        recorder.write(audio)
+
+    copy = str(tmpdir.join("copy.wav"))
+    item = meeting(tmpdir, source, "recorded")
+    item.recorder = wav_recorder.WavRecorder(copy, RATE)
+    asyncio.run(item.run())
+    assert item.recorder.closed
+    # The player stops after 30 s, looping the 10 s recording.
+    assert len(audio_codec.read_pcm(copy)) == 3 * len(audio)
@@ -0,0 +1,75 @@
+import urllib.request
+
+import metrics
+
+
+def lines_of(text, names):
+    """The lines of `text` about the metrics `names`, in order."""
+    return [line for line in text.splitlines()
+            if line.replace("# HELP ", "").replace("# TYPE ", "")
+            .startswith(tuple(names))]
+
+
+def test_exposition_text():
+    done = metrics.counter("test_jobs_total", "Jobs handled", status="done")
+    failed = metrics.counter("test_jobs_total", "Jobs handled",
+                             status="failed")
+    queued = metrics.gauge("test_queued", "Jobs waiting")
+    latency = metrics.histogram("test_latency_seconds", "Job latency",
+                                buckets=(0.1, 1.0), stage="upload")
+    # Same name and labels: the same metric.
+    assert metrics.counter("test_jobs_total", "Jobs handled",
+                           status="done") is done
+
+    done.inc()
+    done.inc(2)
+    failed.inc()
+    queued.set(4)
+    queued.set(2)
+    for seconds in (0.05, 0.1, 0.5, 3.0):  # 0.1 falls in le="0.1"
+        latency.observe(seconds)
+
+    text = metrics.render()
+    assert lines_of(text, ["test_jobs_total", "test_queued",
+                          "test_latency_seconds"]) == [
+        '# HELP test_jobs_total Jobs handled',
+        '# TYPE test_jobs_total counter',
+        'test_jobs_total{status="done"} 3',
+        'test_jobs_total{status="failed"} 1',
+        '# HELP test_queued Jobs waiting',
+        '# TYPE test_queued gauge',
+        'test_queued 2',
+        '# HELP test_latency_seconds Job latency',
+        '# TYPE test_latency_seconds histogram',
+        'test_latency_seconds_bucket{le="0.1",stage="upload"} 2',
+        'test_latency_seconds_bucket{le="1.0",stage="upload"} 3',
+        'test_latency_seconds_bucket{le="+Inf",stage="upload"} 4',
+        'test_latency_seconds_sum{stage="upload"} 3.650000',
+        'test_latency_seconds_count{stage="upload"} 4',
+    ]
+    assert text.endswith("\n")
+
+
+def test_timer_observes_the_block():
+    timer = metrics.histogram("test_block_seconds", "Block time")
+    with timer.time():
+        pass
+    assert timer.count == 1
+    assert 0 <= timer.sum < 0.1
+
+
+def test_write_and_serve(tmpdir):
+    metrics.counter("test_served_total", "Served").inc()
+    path = str(tmpdir.join("out", "metrics.prom"))
+    metrics.write(path)
+    with open(path) as f:
+        written = f.read()
+    assert "test_served_total 1\n" in written
+
+    server = metrics.serve(0)
+    try:
+        url = "http://127.0.0.1:%d/metrics" % server.server_address[1]
+        with urllib.request.urlopen(url) as response:
+            assert "test_served_total 1\n" in response.read().decode()
+    finally:
+        server.shutdown()
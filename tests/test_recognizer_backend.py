@@ -0,0 +1,87 @@
+from google.cloud.speech_v1p1beta1 import types
+import pytest
+
+import recognizer_backend
+from recognizer_backend import (RecognizerBackend, RecordingRecognizer,
+                                ReplayRecognizer, SyntheticRecognizer)
+
+RATE = 16000
+
+
+def test_backends_must_implement_both_calls():
+    with pytest.raises(TypeError):
+        RecognizerBackend()
+
+    class StreamingOnly(RecognizerBackend):
+        def streaming_recognize(self, config, requests):
+            return iter(())
+
+    with pytest.raises(TypeError):
+        StreamingOnly()
+
+
+def streaming_config():
+    return types.StreamingRecognitionConfig(
+        config=types.RecognitionConfig(sample_rate_hertz=RATE,
+                                       diarization_speaker_count=2),
+        interim_results=True)
+
+
+def requests(seconds):
+    chunk = b"\0\0" * (RATE // 10)
+    return (types.StreamingRecognizeRequest(audio_content=chunk)
+            for _ in range(int(seconds * 10)))
+
+
+def test_recorded_sessions_replay_the_same(tmp_path):
+    recorder = RecordingRecognizer(SyntheticRecognizer(utterance_seconds=2))
+    recorded = list(recorder.streaming_recognize(streaming_config(),
+                                                 requests(5)))
+    # Results are only given for audio that was sent.
+    assert [r.results[0].is_final for r in recorded].count(True) == 2
+    path = str(tmp_path / "session.bin")
+    recorder.save(path)
+
+    replay = ReplayRecognizer.load(path)
+    replayed = list(replay.streaming_recognize(streaming_config(),
+                                               requests(5)))
+    assert replayed == recorded
+    # A call beyond the recorded ones gets no responses.
+    assert list(replay.streaming_recognize(streaming_config(),
+                                           requests(1))) == []
+
+
+def test_synthetic_long_running_covers_the_audio():
+    config = types.RecognitionConfig(
+        encoding=types.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=RATE, diarization_speaker_count=2)
+    audio = types.RecognitionAudio(content=b"\0\0" * RATE * 7)
+    assert recognizer_backend.audio_seconds(config, audio) == 7.0
+    operation = SyntheticRecognizer(utterance_seconds=3) \
+        .long_running_recognize(config, audio)
+    assert operation.done()
+    results = operation.result().results
+    assert len(results) == 3
+    assert results[-1].alternatives[0].words[-1].end_time.seconds == 7
+
+
+def test_uncollected_operations_keep_later_responses_in_place(tmp_path):
+    config = types.RecognitionConfig(
+        encoding=types.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=RATE, diarization_speaker_count=2)
+    recorder = RecordingRecognizer(SyntheticRecognizer(utterance_seconds=1))
+    operations = [recorder.long_running_recognize(
+        config, types.RecognitionAudio(content=b"\0\0" * RATE * seconds))
+        for seconds in (1, 2, 3)]
+    kept = [operations[0].result(), None, operations[2].result()]
+    path = str(tmp_path / "long.bin")
+    recorder.save(path)
+
+    replay = ReplayRecognizer.load(path)
+    replayed = [replay.long_running_recognize(config, None).result()
+                for _ in range(4)]
+    assert replayed[0] == kept[0]
+    assert replayed[1] == types.LongRunningRecognizeResponse()
+    assert replayed[2] == kept[2]
+    assert len(replayed[2].results) == 3
+    assert replayed[3] == types.LongRunningRecognizeResponse()
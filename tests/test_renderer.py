@@ -0,0 +1,51 @@
+import io
+import time
+
+from renderer import LogRenderer, TerminalRenderer
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_held_back_interim_is_drawn_without_another_update():
+    out = io.StringIO()
+    renderer = TerminalRenderer(out, max_fps=20)
+    renderer.interim("hel")
+    renderer.interim("hello")  # within the frame, so held back
+    assert out.getvalue() == "hel\r"
+    assert wait_for(lambda: out.getvalue().endswith("hello\r"))
+
+
+def test_final_cancels_the_pending_interim():
+    out = io.StringIO()
+    renderer = TerminalRenderer(out, max_fps=20)
+    renderer.interim("hel")
+    renderer.interim("hello")
+    renderer.final("Alice: hello")
+    time.sleep(0.1)
+    assert out.getvalue() == "hel\r   \rAlice: hello\n"
+
+
+def test_flush_draws_the_pending_interim_now():
+    out = io.StringIO()
+    renderer = TerminalRenderer(out, max_fps=1)
+    renderer.interim("a")
+    renderer.interim("ab")
+    renderer.flush()
+    assert out.getvalue() == "a\rab\r"
+
+
+def test_quiet_and_log_renderers():
+    out = io.StringIO()
+    quiet = TerminalRenderer(out, quiet=True)
+    quiet.interim("x")
+    quiet.final("x")
+    quiet.flush()
+    log = LogRenderer("room", out)
+    log.interim("y")
+    log.final("Bob: y")
+    assert out.getvalue() == "[room] Bob: y\n"
@@ -0,0 +1,78 @@
+import threading
+
+from ring_buffer import RingBuffer
+
+
+def read_bytes(reader, **kwargs):
+    data = reader.read(**kwargs)
+    return None if data is None else b''.join(bytes(d) for d in data)
+
+
+def test_readers_are_independent():
+    ring = RingBuffer(16)
+    first = ring.reader(0)
+    ring.write(b"abcdef")
+    second = ring.reader(0)
+    assert read_bytes(first, max_bytes=2) == b"ab"
+    assert read_bytes(second) == b"abcdef"
+    assert read_bytes(first) == b"cdef"
+
+
+def test_read_wraps_around():
+    ring = RingBuffer(8)
+    reader = ring.reader(0)
+    ring.write(b"123456")
+    assert read_bytes(reader) == b"123456"
+    ring.write(b"789ab")
+    data = reader.read()
+    assert len(data) == 2
+    assert b''.join(bytes(d) for d in data) == b"789ab"
+
+
+def test_overrun_skips_to_oldest_byte_and_counts_it():
+    ring = RingBuffer(8)
+    reader = ring.reader(0)
+    ring.write(b"0123456789ab")
+    assert read_bytes(reader) == b"456789ab"
+    assert reader.overruns == 1
+    assert reader.bytes_dropped == 4
+
+
+def test_seek_is_clamped_to_what_the_ring_holds():
+    ring = RingBuffer(8)
+    ring.write(b"0123456789")
+    reader = ring.reader()
+    reader.seek(0)
+    assert reader.position == 2
+    reader.seek(100)
+    assert reader.position == 10
+
+
+def test_closed_ring_drains_then_ends():
+    ring = RingBuffer(8)
+    reader = ring.reader(0)
+    ring.write(b"xy")
+    ring.close()
+    assert read_bytes(reader) == b"xy"
+    assert reader.read() is None
+
+
+def test_waiting_for_audio_is_not_an_underrun():
+    ring = RingBuffer(8)
+    reader = ring.reader(0)
+    timer = threading.Timer(0.05, ring.write, [b"abc"])
+    timer.start()
+    assert read_bytes(reader, timeout=5) == b"abc"
+    timer.join()
+    assert reader.underruns == 0
+    assert ring.underruns == 0
+
+
+def test_timed_out_read_is_an_underrun():
+    ring = RingBuffer(8)
+    reader = ring.reader(0)
+    ring.write(b"a")
+    assert read_bytes(reader, min_bytes=4, timeout=0.01) == b"a"
+    assert reader.underruns == 1
+    assert read_bytes(reader, block=False) == b""
+    assert reader.underruns == 2
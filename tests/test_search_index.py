@@ -0,0 +1,76 @@
+import os
+
+import search_index
+from search_index import SearchIndex
+from transcript import EXPORT_SEPARATOR
+
+
+def export(directory, name, lines):
+    path = os.path.join(str(directory), name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+        f.write(EXPORT_SEPARATOR + " Mentioned more than 30 times: budget\n")
+    return path
+
+
+def meetings(directory):
+    export(directory, "a.txt", ["Alice: the budget review is today",
+                                "Bob: review the budget again",
+                                "Alice: budget review done"])
+    export(directory, "b.txt", [u"Carol: 会議の予定 budget review"])
+
+
+def test_phrase_search_in_meeting_and_line_order(tmpdir):
+    meetings(tmpdir)
+    index = SearchIndex.open(str(tmpdir))
+    assert index.search("budget review") == [
+        ("a.txt", 1, "Alice"), ("a.txt", 3, "Alice"), ("b.txt", 1, "Carol")]
+    assert index.search("review budget") == []
+    assert index.search("the budget") == [("a.txt", 1, "Alice"),
+                                          ("a.txt", 2, "Bob")]
+    assert index.search(u"会議") == [("b.txt", 1, "Carol")]
+    # The analysis after the transcript is not indexed.
+    assert index.search("mentioned") == []
+    assert index.search("") == []
+
+
+def test_speaker_filter(tmpdir):
+    meetings(tmpdir)
+    index = SearchIndex.open(str(tmpdir))
+    assert index.search("budget", speaker="bob") == [("a.txt", 2, "Bob")]
+    assert index.search("budget", speaker="Alice: ") == [
+        ("a.txt", 1, "Alice"), ("a.txt", 3, "Alice")]
+    assert index.search("budget", speaker="Dave") == []
+
+
+def test_reopened_index_only_adds_new_exports(tmpdir):
+    meetings(tmpdir)
+    assert SearchIndex(str(tmpdir)).update() == 2
+    export(tmpdir, "c.txt", ["Bob: budget review tomorrow"])
+    index = SearchIndex(str(tmpdir))
+    assert index.update() == 1
+    assert index.update() == 0
+    assert len(index.segments) == 2
+    assert index.search("budget review", speaker="Bob") == [
+        ("c.txt", 1, "Bob")]
+
+
+def test_compaction_keeps_every_posting(tmpdir, monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_SEGMENTS", 2)
+    index = SearchIndex(str(tmpdir))
+    for i in range(5):
+        index.add_meeting(export(tmpdir, "%d.txt" % i,
+                                 ["Alice: item %d of the budget" % i]))
+    assert len(index.segments) <= 2
+    assert len(os.listdir(index.path)) == 3 * len(index.segments) + 1
+    reopened = SearchIndex(str(tmpdir))
+    assert [hit[0] for hit in reopened.search("the budget")] == \
+        ["%d.txt" % i for i in range(5)]
+
+
+def test_main_answers_questions(tmpdir, capsys):
+    meetings(tmpdir)
+    search_index.main(["--directory", str(tmpdir),
+                       "What did Bob say about budget?"])
+    assert capsys.readouterr().out == \
+        "a.txt:2: Bob: review the budget again\n"
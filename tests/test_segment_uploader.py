@@ -0,0 +1,47 @@
+import wave
+
+import numpy as np
+
+from segment_uploader import SegmentedRecorder
+
+RATE = 16000
+
+
+def noise(seconds, level=8000, seed=0):
+    rng = np.random.RandomState(seed)
+    return (rng.uniform(-level, level, int(seconds * RATE))).astype('<i2').tobytes()
+
+
+def silence(seconds):
+    return bytes(int(seconds * RATE) * 2)
+
+
+def record(tmpdir, audio, **kwargs):
+    segments = []
+    with SegmentedRecorder(str(tmpdir.join("meeting")), RATE,
+                           on_segment=lambda path, index: segments.append(path),
+                           **kwargs) as recorder:
+        for i in range(0, len(audio), 3200):
+            recorder.write(audio[i:i + 3200])
+    lengths = []
+    for path in segments:
+        with wave.open(path, 'rb') as f:
+            lengths.append(f.getnframes() / float(RATE))
+    return recorder, lengths
+
+
+def test_segment_is_cut_in_the_first_pause_after_its_length(tmpdir):
+    audio = noise(1.2) + silence(0.6) + noise(1.0, seed=1)
+    recorder, lengths = record(tmpdir, audio, segment_seconds=1,
+                               max_segment_seconds=2)
+    assert len(lengths) == 2
+    # Inside the pause: after the speech, before the next speech.
+    assert 1.2 < lengths[0] < 1.8
+    assert abs(sum(lengths) - 2.8) < 1e-6
+    assert recorder.segment_starts == [0, lengths[0]]
+
+
+def test_segment_without_a_pause_is_cut_at_the_maximum(tmpdir):
+    _, lengths = record(tmpdir, noise(3.0), segment_seconds=1,
+                        max_segment_seconds=1.5)
+    assert lengths == [1.5, 1.5]
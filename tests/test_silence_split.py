@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from silence_split import SilenceSplitter, SpeakerReconciler
+
+RATE = 16000
+
+
+def noise(seconds, level=8000, seed=0):
+    rng = np.random.RandomState(seed)
+    return (rng.uniform(-level, level, int(seconds * RATE))).astype('<i2').tobytes()
+
+
+def silence(seconds):
+    return bytes(int(seconds * RATE) * 2)
+
+
+def tone(seconds, frequency):
+    t = np.arange(int(seconds * RATE)) / float(RATE)
+    return (8000 * np.sin(2 * np.pi * frequency * t)).astype('<i2').tobytes()
+
+
+def split(splitter, audio):
+    chunks = []
+    for i in range(0, len(audio), 3200):
+        chunks.extend(splitter.feed(audio[i:i + 3200]))
+    last = splitter.flush()
+    if last is not None:
+        chunks.append(last)
+    return chunks
+
+
+def test_chunks_are_cut_in_the_middle_of_a_pause():
+    audio = noise(1.5) + silence(0.6) + noise(1.0, seed=1)
+    chunks = split(SilenceSplitter(RATE, min_chunk_seconds=1, max_chunk_seconds=4),
+                   audio)
+    assert len(chunks) == 2
+    assert 1.6 < chunks[1].start < 2.0
+    assert b''.join(chunk.pcm for chunk in chunks) == audio
+    assert [chunk.index for chunk in chunks] == [0, 1]
+
+
+def test_chunk_without_a_pause_is_cut_before_the_maximum():
+    chunks = split(SilenceSplitter(RATE, min_chunk_seconds=1, max_chunk_seconds=2),
+                   noise(5.0))
+    assert all(1 <= len(chunk.pcm) / 2.0 / RATE <= 2 for chunk in chunks[:-1])
+    starts = [chunk.start for chunk in chunks]
+    assert starts == sorted(starts) and starts[0] == 0
+
+
+def test_short_audio_is_one_chunk():
+    chunks = split(SilenceSplitter(RATE), noise(0.5))
+    assert len(chunks) == 1 and chunks[0].start == 0
+
+
+def duration(seconds):
+    return SimpleNamespace(seconds=int(seconds),
+                           nanos=int(round((seconds - int(seconds)) * 1e9)))
+
+
+def result(tag, start, end):
+    word = SimpleNamespace(speaker_tag=tag, start_time=duration(start),
+                           end_time=duration(end))
+    return SimpleNamespace(alternatives=[SimpleNamespace(words=[word])])
+
+
+def test_speakers_keep_their_numbers_across_chunks():
+    reconciler = SpeakerReconciler(2, RATE)
+    low, high = tone(1, 200), tone(1, 2000)
+    first = reconciler.reconcile(low + high, [result(1, 0, 1), result(2, 1, 2)])
+    # The next chunk's diarization numbers the same voices the other way.
+    second = reconciler.reconcile(high + low, [result(1, 0, 1), result(2, 1, 2)])
+    assert first == {1: 1, 2: 2}
+    assert second == {1: 2, 2: 1}
@@ -0,0 +1,215 @@
+from concurrent import futures
+import time
+from types import SimpleNamespace
+
+from google.cloud.speech_v1p1beta1 import types
+
+from silence_split import AudioChunk
+import speech_to_text
+
+RATE = 16000
+
+
+def response(tag, text, start, end):
+    word = types.WordInfo(word=text, speaker_tag=tag)
+    word.start_time.seconds = start
+    word.end_time.seconds = end
+    alternative = types.SpeechRecognitionAlternative(transcript=text, words=[word])
+    return types.LongRunningRecognizeResponse(
+        results=[types.SpeechRecognitionResult(alternatives=[alternative])])
+
+
+def done(value):
+    future = futures.Future()
+    if isinstance(value, Exception):
+        future.set_exception(value)
+    else:
+        future.set_result(value)
+    return future
+
+
+def stitcher():
+    config = SimpleNamespace(speakers=["A: ", "B: "], speaker_count=2,
+                             sample_rate=RATE)
+    return speech_to_text.ChunkStitcher(speech_to_text.SpeechToText(config))
+
+
+def test_chunks_are_stitched_in_order_as_they_finish():
+    chunks = [AudioChunk(i, i * 2.0, bytes(2 * RATE * 2)) for i in range(3)]
+    joiner = stitcher()
+    indexes = [joiner.add(chunk) for chunk in chunks]
+    assert indexes == [0, 1, 2]
+    assert all(chunk.pcm is None for chunk in chunks)
+
+    joiner.done(2, done(response(1, "three", 0, 1)))
+    joiner.done(1, done(response(1, "two", 0, 1)))
+    assert joiner.transcript.segments == []
+    joiner.done(0, done(response(1, "one", 0, 1)))
+
+    transcript = joiner.finish()
+    assert [segment.text for segment in transcript.segments] \
+        == ["one", "two", "three"]
+    assert [segment.start for segment in transcript.segments] == [0, 2, 4]
+
+
+def test_a_failed_chunk_is_raised_by_finish():
+    joiner = stitcher()
+    joiner.add(AudioChunk(0, 0, bytes(RATE * 2)))
+    joiner.done(0, done(RuntimeError("recognize failed")))
+    try:
+        joiner.finish()
+    except RuntimeError as e:
+        assert str(e) == "recognize failed"
+    else:
+        assert False, "finish() should raise"
+
+
+def live_config(**kwargs):
+    options = dict(sample_rate=RATE, backpressure="drop", streaming_limit=290,
+                   voice_gating=False, min_request_ms=100, max_request_ms=500,
+                   speakers=["A: ", "B: "])
+    options.update(kwargs)
+    return SimpleNamespace(**options)
+
+
+def test_capture_buffer_holds_a_whole_session(tmpdir):
+    from storage_backend import LocalStorageBackend
+
+    config = speech_to_text.SpeechToTextConfig(
+        ["A: ", "B: "], 2, RATE, RATE // 10, "en-US", "exit",
+        storage_backend=LocalStorageBackend(str(tmpdir)), recognizer=object(),
+        streaming_limit=60)
+    assert config.buffer_seconds >= config.streaming_limit
+    stream = config.open_audio_source()
+    assert stream._buff.capacity >= 60 * RATE * 2
+
+
+def test_replay_older_than_the_buffer_starts_at_the_oldest_audio():
+    stream = speech_to_text.MicrophoneStream(RATE, RATE // 10, buffer_seconds=1)
+    for _ in range(30):
+        stream._write(bytes(RATE // 10 * 2))
+    stt = speech_to_text.SpeechToText(live_config())
+    stt.start_meeting(stream)
+
+    reader, _ = stt.start_session(0)
+    # Two of the three seconds were overwritten; results are timed from
+    # the audio actually sent.
+    assert reader.position == 2 * RATE * 2
+    assert stt.session_offset == 2.0
+    assert stt.end_session(reader, clean=True) == 2 * RATE * 2
+
+
+def interim(text, end):
+    result = types.StreamingRecognitionResult(
+        alternatives=[types.SpeechRecognitionAlternative(transcript=text)],
+        is_final=False)
+    result.result_end_time.seconds = end
+    return types.StreamingRecognizeResponse(results=[result])
+
+
+def test_speech_only_heard_as_interim_is_sent_again():
+    from renderer import TerminalRenderer
+
+    stream = speech_to_text.MicrophoneStream(RATE, RATE // 10, buffer_seconds=10)
+    for _ in range(30):
+        stream._write(bytes(RATE // 10 * 2))
+    stt = speech_to_text.SpeechToText(live_config(),
+                                      renderer=TerminalRenderer(quiet=True))
+    stt.start_meeting(stream)
+
+    # A silent session: nothing to replay, carry on from what was read.
+    reader, _ = stt.start_session(0)
+    reader.read()
+    assert stt.end_session(reader, clean=True) == reader.position == 3 * RATE * 2
+
+    # Speech that never became final before the rollover is replayed.
+    stream._write(bytes(RATE * 2))
+    reader, _ = stt.start_session(3 * RATE * 2)
+    reader.read()
+    stt.handle_response(interim("hello", 1))
+    assert stt.end_session(reader, clean=True) == 3 * RATE * 2
+
+
+def test_spilled_meeting_replays_audio_older_than_the_buffer():
+    stream = speech_to_text.MicrophoneStream(RATE, RATE // 10, buffer_seconds=1)
+    stt = speech_to_text.SpeechToText(live_config(backpressure="spill",
+                                                  spill_seconds=60))
+    stt.start_meeting(stream)
+    try:
+        for i in range(30):
+            stream._write(bytes(RATE // 10 * 2))
+            while stt.spill_queue._end < (i + 1) * RATE // 10 * 2:
+                time.sleep(0.001)
+
+        reader, _ = stt.start_session(0)
+        assert reader.position == 0
+        stt.last_final_end = 1.5
+        resume = stt.end_session(reader, clean=True)
+        reader, _ = stt.start_session(resume)
+        assert reader.position == int(1.5 * RATE) * 2
+        assert stt.session_offset == 1.5
+        stt.end_session(reader, clean=True)
+    finally:
+        stt.end_meeting()
+
+
+def test_long_audio_is_recorded_whole_and_uploaded_gated(tmpdir):
+    import wave
+
+    import numpy as np
+
+    from job_manager import RecognitionJobManager
+    import recognizer_backend
+    from storage_backend import LocalStorageBackend
+
+    recognizer = recognizer_backend.SyntheticRecognizer()
+    config = speech_to_text.SpeechToTextConfig(
+        ["A: ", "B: "], 2, RATE, RATE // 10, "en-US", None,
+        storage_backend=LocalStorageBackend(str(tmpdir.join("uploads"))),
+        job_manager=RecognitionJobManager(recognizer, min_interval=0.01),
+        recognizer=recognizer, codec="linear16")
+    t = np.arange(4 * RATE) / float(RATE)
+    speech = (8000 * np.sin(2 * np.pi * 440 * t)).astype('<i2').tobytes()
+    audio = bytes(6 * RATE * 2) + speech
+    prefix = str(tmpdir.join("meeting"))
+
+    transcript = speech_to_text.SpeechToText(config).long_audio_transcript(
+        (audio[i:i + 3200] for i in range(0, len(audio), 3200)), prefix)
+
+    with wave.open(prefix + ".wav", 'rb') as f:
+        assert f.getnframes() == 10 * RATE
+    with wave.open(prefix + "_speech_000.wav", 'rb') as f:
+        assert f.getnframes() < 5 * RATE
+    # Results are timed on the capture: the speech ends at ten seconds.
+    assert 9.5 < transcript.segments[-1].end < 10.05
+
+
+def test_split_chunks_are_voice_gated_before_they_are_sent(tmpdir, monkeypatch):
+    import numpy as np
+
+    t = np.arange(2 * RATE) / float(RATE)
+    speech = (8000 * np.sin(2 * np.pi * 440 * t)).astype('<i2').tobytes()
+    audio = bytes(3 * RATE * 2) + speech + bytes(RATE * 2)
+    sent = []
+
+    def submit(recognition_config, audio, callback=None):
+        sent.append(audio.content)
+        future = done(response(1, "hello", 0, 1))
+        callback(future)
+        return future
+
+    config = SimpleNamespace(speakers=["A: ", "B: "], speaker_count=2,
+                             sample_rate=RATE, codec="linear16",
+                             voice_gating=True, recognition_config=None,
+                             job_manager=SimpleNamespace(submit=submit))
+    stt = speech_to_text.SpeechToText(config)
+    monkeypatch.setattr(stt, "capture", lambda seconds: (
+        audio[i:i + 3200] for i in range(0, len(audio), 3200)))
+    monkeypatch.chdir(tmpdir)
+    tmpdir.mkdir("output").mkdir("audio_long_meeting")
+
+    transcript = stt.long_split_meet(6)
+
+    assert 0 < sum(len(pcm) for pcm in sent) < 3 * RATE * 2
+    # Timed on the capture: the speech (less the preroll) starts at 3s.
+    assert 2.7 < transcript.segments[0].start < 3.05
@@ -0,0 +1,39 @@
+import pytest
+
+import tokenizer
+
+
+@pytest.mark.parametrize("language, words", [
+    ("ko-KR", tokenizer.KOREAN_STOPWORDS),
+    ("ja-JP", tokenizer.JAPANESE_STOPWORDS),
+    ("zh", tokenizer.CHINESE_STOPWORDS),
+])
+def test_every_stopword_is_a_token(language, words):
+    tokenize = tokenizer.tokenizer_for(language)
+    assert len(set(words)) == len(words)
+    assert [word for word in words if tokenize(word) != [word]] == []
+    assert tokenizer.stopwords_for(language) == frozenset(words)
+
+
+def test_word_tokens_skip_single_characters():
+    assert tokenizer.tokenizer_for("en-US")("I like Dolly's A/B tests") == \
+        ["like", "dolly", "tests"]
+    assert tokenizer.tokenizer_for("ko-KR")(u"좀 더 회의 시작") == \
+        [u"회의", u"시작"]
+
+
+def test_cjk_tokens():
+    tokenize = tokenizer.tokenizer_for("ja-JP")
+    # Katakana runs stay whole, kanji and hiragana become bigrams, and the
+    # prolonged sound mark continues a hiragana run.
+    assert tokenize(u"えー、コーヒーを飲む") == \
+        [u"えー", u"コーヒー", u"を飲", u"飲む"]
+    assert tokenize(u"会 Dolly 2020") == [u"会", "dolly", "2020"]
+    assert tokenizer.tokenize(u"会議 meeting") == [u"会議", "meeting"]
+
+
+def test_detect_language():
+    assert tokenizer.detect_language(u"회의를 시작합니다") == "ko-KR"
+    assert tokenizer.detect_language(u"会議を始めます") == "ja-JP"
+    assert tokenizer.detect_language(u"我们开会") == "zh"
+    assert tokenizer.detect_language("hello") == "en-US"
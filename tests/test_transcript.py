@@ -0,0 +1,53 @@
+import transcript
+from transcript import Transcript, Word
+
+
+def meeting():
+    meeting = Transcript(["Alice: ", "Bob: "])
+    meeting.append(0, "hello everyone", start=0.0, end=1.5,
+                   words=[Word("hello", 0.0, 0.5, 0.9),
+                          Word("everyone", 0.5, 1.5, 0.8)])
+    meeting.append(1, "hi Alice", start=2.0, end=3.0)
+    meeting.append(0, "let's start", start=3.5, end=4.0)
+    return meeting
+
+
+def test_segments_keep_speaker_times_and_words():
+    m = meeting()
+    assert len(m) == 3
+    first = next(iter(m))
+    assert (first.speaker, first.start, first.end, first.text) == \
+        (0, 0.0, 1.5, "hello everyone")
+    assert [w.text for w in first.words] == ["hello", "everyone"]
+    assert m.segments[1].words is None
+    m.extend([transcript.Segment(1, 5.0, 6.0, "bye")])
+    assert m.line(m.segments[-1]) == "Bob: bye\n"
+
+
+def test_rename_changes_every_line_of_that_speaker():
+    m = meeting()
+    assert str(m) == "Alice: hello everyone\nBob: hi Alice\nAlice: let's start\n"
+    m.rename(0, "Carol: ")
+    assert m.render() == \
+        "Carol: hello everyone\nBob: hi Alice\nCarol: let's start\n"
+    # Only the name table changed.
+    assert m.segments[0].text == "hello everyone"
+
+
+def test_speakers_without_a_name_are_unknown():
+    m = Transcript(["Alice: "])
+    m.append(-1, "undiarized")
+    m.append(3, "out of range")
+    assert m.render() == "Unknown: undiarized\nUnknown: out of range\n"
+    assert transcript.speaker_name(["Alice: "], 0) == "Alice: "
+
+
+def test_export_text_round_trip(tmpdir):
+    m = meeting()
+    path = str(tmpdir.join("meeting.txt"))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(m.render() + transcript.EXPORT_SEPARATOR
+                + " Mentioned more than 30 times: []" + transcript.EXPORT_SEPARATOR)
+    text = transcript.load_export_text(path)
+    assert text == m.render()
+    assert transcript.export_speakers(text) == ["Alice: ", "Bob: "]
@@ -0,0 +1,47 @@
+import pytest
+
+import transcript_file
+from transcript import Transcript, Word
+
+
+def meeting():
+    meeting = Transcript(["Alice: ", "Bob: "])
+    meeting.append(0, "hello there", start=0.5, end=1.25,
+                   words=[Word("hello", 0.5, 0.8, 0.9),
+                          Word("there", 0.8, 1.25, 0.75)])
+    meeting.append(1, "hi", start=2.0, end=2.5,
+                   words=[Word("hi", 2.0, 2.5, 0.5)])
+    # speaker_tag 0 (no diarization) is stored as speaker -1.
+    meeting.append(-1, "anyone", start=3.0, end=3.5)
+    return meeting
+
+
+def test_round_trip_keeps_speakers_times_and_words(tmp_path):
+    path = transcript_file.write(meeting(), str(tmp_path / "m.dolly"))
+    with transcript_file.TranscriptFile(path) as exported:
+        assert exported.segments['speaker'].tolist() == [0, 1, -1]
+        assert exported.render() == meeting().render()
+        copy = exported.to_transcript()
+    assert [s.speaker for s in copy.segments] == [0, 1, -1]
+    assert [(s.start, s.end) for s in copy.segments] == \
+        [(0.5, 1.25), (2.0, 2.5), (3.0, 3.5)]
+    words = copy.segments[0].words
+    assert [w.text for w in words] == ["hello", "there"]
+    assert words[1].start == 0.8
+    assert words[1].confidence == pytest.approx(0.75)
+
+
+def test_write_never_overwrites(tmp_path):
+    path = transcript_file.write(meeting(), str(tmp_path / "m.dolly"))
+    with pytest.raises(FileExistsError):
+        transcript_file.write(Transcript(["A: "]), path)
+    with transcript_file.TranscriptFile(path) as exported:
+        assert len(exported.segments) == 3
+
+
+def test_unknown_speakers_render_neutrally(tmp_path):
+    path = transcript_file.write(meeting(), str(tmp_path / "m.dolly"))
+    expected = "Alice: hello there\nBob: hi\nUnknown: anyone\n"
+    assert meeting().render() == expected
+    with transcript_file.TranscriptFile(path) as exported:
+        assert exported.render() == expected
@@ -0,0 +1,60 @@
+import numpy as np
+
+from vad import TimeMap, VoiceGate
+
+RATE = 16000
+
+
+def test_time_map_maps_gated_times_to_capture_times():
+    time_map = TimeMap(RATE)
+    time_map.keep(0, RATE)               # 0-1 s kept
+    time_map.keep(3 * RATE, RATE // 2)   # 3-3.5 s kept
+    time_map.keep(3 * RATE + RATE // 2, RATE // 2)  # continues the run
+    assert len(time_map) == 2
+    assert time_map.to_source(0.5) == 0.5
+    assert time_map.to_source(1.25) == 3.25
+    assert time_map.to_source(1.9) == 3.9
+
+
+def test_empty_time_map_counts_from_where_the_gate_started():
+    assert TimeMap(RATE).to_source(1.5) == 1.5
+    assert TimeMap(RATE, start_sample=10 * RATE).to_source(1.5) == 11.5
+    gate = VoiceGate(RATE, start_seconds=20)
+    assert gate.time_map.to_source(0.25) == 20.25
+
+
+def tone(seconds, frequency=440):
+    t = np.arange(int(seconds * RATE)) / float(RATE)
+    return (8000 * np.sin(2 * np.pi * frequency * t)).astype('<i2').tobytes()
+
+
+def silence(seconds):
+    return bytes(int(seconds * RATE) * 2)
+
+
+def gate_all(gate, audio):
+    return b''.join(gate.feed(audio[i:i + 3200])
+                    for i in range(0, len(audio), 3200))
+
+
+def test_gate_drops_long_silence_and_keeps_speech_times():
+    gate = VoiceGate(RATE, keepalive_seconds=None)
+    kept = gate_all(gate, silence(2) + tone(1) + silence(2) + tone(1))
+    seconds = len(kept) / 2.0 / RATE
+    assert 2 < seconds < 3.5
+    # The second tone starts at 5 s of capture.
+    second_onset = None
+    for gated in np.arange(0, seconds, 0.01):
+        if gate.time_map.to_source(gated) >= 4.9:
+            second_onset = gate.time_map.to_source(gated)
+            break
+    assert second_onset is not None and 4.9 <= second_onset <= 5.0
+
+
+def test_skipped_audio_keeps_later_times():
+    gate = VoiceGate(RATE, keepalive_seconds=None, preroll_ms=0)
+    gate_all(gate, tone(1))
+    gate.skip(2 * RATE * 2)
+    kept_before = gate.time_map.gated_samples
+    gate_all(gate, tone(1))
+    assert gate.time_map.to_source(kept_before / float(RATE)) == 3.0
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+import wave
+
+from wav_recorder import WavRecorder, repair_wav
+
+RATE = 16000
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def frames(path):
+    with wave.open(path, 'rb') as f:
+        return f.getnframes()
+
+
+def test_header_is_checkpointed_while_recording(tmpdir):
+    path = str(tmpdir.join("a.wav"))
+    recorder = WavRecorder(path, RATE, checkpoint_seconds=1)
+    for _ in range(25):
+        recorder.write(bytes(RATE // 10 * 2))
+    # Readable mid-recording, up to the last checkpoint.
+    assert frames(path) == 2 * RATE
+    recorder.close()
+    assert frames(path) == 2.5 * RATE
+    assert recorder.duration == 2.5
+
+
+def test_repair_recovers_a_recording_killed_mid_write(tmpdir):
+    path = str(tmpdir.join("killed.wav"))
+    script = """
+import os, sys
+sys.path.insert(0, %r)
+from wav_recorder import WavRecorder
+recorder = WavRecorder(%r, %d, checkpoint_seconds=1)
+for _ in range(13):
+    recorder.write(bytes(%d // 4 * 2))
+recorder.write(b'\\x01')  # half a frame
+recorder._file.flush()
+os._exit(1)  # no close, no header update
+""" % (REPO, path, RATE, RATE)
+    assert subprocess.call([sys.executable, "-c", script]) == 1
+
+    # The header still says 3 s, the last checkpoint.
+    assert frames(path) == 3 * RATE
+    assert repair_wav(path) == 13 * RATE // 4 * 2
+    assert frames(path) == 13 * RATE // 4
+    assert os.path.getsize(path) == 44 + 13 * RATE // 4 * 2
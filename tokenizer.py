@@ -0,0 +1,115 @@
+import functools
+import re
+
+# Space-delimited languages (English, Korean): runs of two or more word
+# characters, the same tokens sklearn's TfidfVectorizer produces.
+WORD_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# The prolonged sound mark (U+30FC) is katakana, but also lengthens
+# hiragana in speech ("えー", "すごーい"), so it continues either kind of run.
+_HAN_KANA = (u"\u3040-\u309f\u30fc\u3400-\u4dbf\u4e00-\u9fff"
+             u"\uf900-\ufaff")
+_KATAKANA = u"\u30a0-\u30ff\u31f0-\u31ff\uff66-\uff9f"
+
+# Japanese and Chinese have no spaces between words. Katakana runs are
+# mostly loanwords and kept whole; runs of kanji/hanzi and hiragana are cut
+# into overlapping character bigrams; anything else (Latin words, numbers,
+# Hangul) is tokenized as above. One pass of one compiled pattern.
+CJK_PATTERN = re.compile(u"([" + _KATAKANA + u"]+)"
+                         u"|([" + _HAN_KANA + u"]+)"
+                         u"|([^\\W" + _HAN_KANA + _KATAKANA + u"]{2,})")
+
+CJK_LANGUAGES = ("ja", "zh")
+
+# NLTK has no stopword lists for these, so keep short ones here: particles,
+# copulas and fillers that would otherwise top every count. Each entry must
+# be a token its language's tokenizer produces: Korean words of two or more
+# characters, and Japanese and Chinese bigrams.
+KOREAN_STOPWORDS = (
+    u"그리고 그런데 그래서 하지만 그러나 그냥 이제 이거 그거 저거 이것 그것 "
+    u"저것 여기 거기 저기 우리 저희 제가 내가 너무 정말 진짜 아니 네네 "
+    u"있는 있고 있어요 있습니다 없는 없어요 하는 하고 해서 했어요 합니다 "
+    u"입니다 이에요 예요 같은 같아요").split()
+JAPANESE_STOPWORDS = (
+    u"して した しま ます まし です でし ある あり いる いま ない "
+    u"なか これ それ あれ この その あの ここ そこ って った から "
+    u"まで より ので のは には では とか けど けれ でも また など "
+    u"こと もの よう ため さん とい いう ちょ えー えっ っと").split()
+CHINESE_STOPWORDS = (
+    u"我们 你们 他们 这个 那个 这些 那些 什么 怎么 因为 所以 但是 而且 "
+    u"然后 就是 还是 可以 没有 不是 一个 已经 如果 的话 现在 这样 那样 "
+    u"的是 是的 了一 我的 你的 他的 大家 自己 一下 一些").split()
+
+
+def _cjk_tokens(text):
+    tokens = []
+    for katakana, han_kana, other in CJK_PATTERN.findall(text.lower()):
+        if han_kana:
+            if len(han_kana) == 1:
+                tokens.append(han_kana)
+            else:
+                tokens.extend(han_kana[i:i + 2]
+                              for i in range(len(han_kana) - 1))
+        else:
+            tokens.append(katakana or other)
+    return tokens
+
+
+def _word_tokens(text):
+    return WORD_PATTERN.findall(text.lower())
+
+
+def _language(language_code):
+    return (language_code or "en").split("-")[0].lower()
+
+
+def tokenizer_for(language_code):
+    """Return the tokenize(text) function for a meeting language."""
+    if _language(language_code) in CJK_LANGUAGES:
+        return _cjk_tokens
+    return _word_tokens
+
+
+def tokenize(text):
+    """Tokenize text of any supported language.
+
+    Gives the same tokens as tokenizer_for(language) for every language, as
+    long as English and Korean text contains no CJK characters; used where
+    meetings in different languages are mixed, like the archive indexes.
+    """
+    return _cjk_tokens(text)
+
+
+@functools.lru_cache(maxsize=None)
+def stopwords_for(language_code):
+    """Return the frozen stopword set for a language, loaded once per process."""
+    language = _language(language_code)
+    if language == "ko":
+        return frozenset(KOREAN_STOPWORDS)
+    if language == "ja":
+        return frozenset(JAPANESE_STOPWORDS)
+    if language == "zh":
+        return frozenset(CHINESE_STOPWORDS)
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english'))
+
+
+def detect_language(text):
+    """Guess the language code of a transcript from the scripts it uses."""
+    counts = {"ko": 0, "ja": 0, "zh": 0}
+    for char in text:
+        code = ord(char)
+        if 0xac00 <= code <= 0xd7a3:
+            counts["ko"] += 1
+        elif 0x3040 <= code <= 0x30ff:
+            counts["ja"] += 1
+        elif 0x4e00 <= code <= 0x9fff:
+            counts["zh"] += 1
+    if counts["ko"] > counts["ja"] + counts["zh"]:
+        return "ko-KR"
+    if counts["ja"]:
+        # Japanese text mixes kana with kanji; Chinese has no kana.
+        return "ja-JP"
+    if counts["zh"]:
+        return "zh"
+    return "en-US"
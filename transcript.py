@@ -0,0 +1,98 @@
+class Word(object):
+    __slots__ = ('text', 'start', 'end', 'confidence')
+
+    def __init__(self, text, start, end, confidence=0.0):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.confidence = confidence
+
+
+class Segment(object):
+    """One final result: who said what, and when (seconds from the start)."""
+
+    __slots__ = ('speaker', 'start', 'end', 'text', 'words')
+
+    def __init__(self, speaker, start, end, text, words=None):
+        self.speaker = speaker
+        self.start = start
+        self.end = end
+        self.text = text
+        self.words = words
+
+
+# Shown for a speaker index with no name, like the -1 that speaker_tag 0
+# (no diarization) is stored as.
+UNKNOWN_SPEAKER = "Unknown: "
+
+
+def speaker_name(names, speaker):
+    """The name ("Name: ") of speaker index `speaker` in `names`."""
+    if 0 <= speaker < len(names):
+        return names[speaker]
+    return UNKNOWN_SPEAKER
+
+
+class Transcript(object):
+    """Append-only list of segments plus a speaker id -> name table.
+
+    Segments refer to speakers by index into ``names``, so renaming a speaker
+    is a single assignment and never touches the text. The ``speaker: text``
+    form is only built when the transcript is rendered.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.segments = []
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    def __str__(self):
+        return self.render()
+
+    def append(self, speaker, text, start=0.0, end=0.0, words=None):
+        segment = Segment(speaker, start, end, text, words)
+        self.segments.append(segment)
+        return segment
+
+    def extend(self, segments):
+        self.segments.extend(segments)
+
+    def rename(self, speaker, name):
+        self.names[speaker] = name
+
+    def line(self, segment):
+        return speaker_name(self.names, segment.speaker) + segment.text + "\n"
+
+    def lines(self):
+        for segment in self.segments:
+            yield self.line(segment)
+
+    def render(self):
+        return "".join(self.lines())
+
+
+# Exported .txt files hold the rendered transcript followed by the analysis,
+# which starts with this separator.
+EXPORT_SEPARATOR = "\n------\n"
+
+
+def load_export_text(path):
+    """Return the transcript part of an exported meeting file."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    return text.split(EXPORT_SEPARATOR, 1)[0]
+
+
+def export_speakers(text):
+    """Return the speaker names ("Name: ") used in an exported transcript."""
+    speakers = []
+    for line in text.splitlines():
+        name, separator, _ = line.partition(": ")
+        if separator and name + separator not in speakers:
+            speakers.append(name + separator)
+    return speakers
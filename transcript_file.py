@@ -0,0 +1,157 @@
+"""Compact binary transcript format (``.dolly``) with word timings.
+
+Layout, all little-endian, every section 8-byte aligned::
+
+    header    magic, version, counts and the byte offset of each section
+    offsets   uint32[string_count + 1]   start of each string in the blob
+    strings   UTF-8 blob: speaker names, segment texts and distinct words
+    names     uint32[name_count]         string id of each speaker name
+    segments  SEGMENT[segment_count]     one record per final result
+    words     WORD[word_count]           one record per recognized word
+
+Times are whole milliseconds from the start of the meeting. Opening a file
+maps it and wraps each section with ``numpy.frombuffer``, so a long meeting
+loads in constant time and only the strings actually used get decoded.
+"""
+import mmap
+import struct
+
+import numpy as np
+
+from transcript import Transcript, Word, speaker_name
+
+MAGIC = b"DOLLYTR1"
+VERSION = 1
+HEADER = struct.Struct('<8sIIIII5Q')
+
+# Speakers are signed: without diarization every word has speaker_tag 0, which
+# SpeechToText stores as speaker -1.
+SEGMENT = np.dtype([('speaker', '<i2'), ('start', '<u4'), ('end', '<u4'),
+                    ('text', '<u4'), ('first_word', '<u4'),
+                    ('word_count', '<u4')])
+WORD = np.dtype([('text', '<u4'), ('start', '<u4'), ('end', '<u4'),
+                 ('speaker', '<i2'), ('confidence', '<f4')])
+
+
+def _ms(seconds):
+    return int(round(seconds * 1000))
+
+
+def _align(f):
+    padding = -f.tell() % 8
+    f.write(b'\0' * padding)
+    return f.tell()
+
+
+def write(meeting, path):
+    """Write a transcript.Transcript to `path`, which must not exist yet.
+
+    An existing file may still be mapped by a TranscriptFile, so it is never
+    overwritten.
+    """
+    string_ids = {}
+    strings = []
+
+    def string_id(text):
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text.encode('utf-8'))
+        return string_ids[text]
+
+    names = np.array([string_id(name) for name in meeting.names],
+                     dtype='<u4')
+    segments = np.zeros(len(meeting.segments), dtype=SEGMENT)
+    word_rows = []
+    for i, segment in enumerate(meeting.segments):
+        words = segment.words or []
+        segments[i] = (segment.speaker, _ms(segment.start), _ms(segment.end),
+                       string_id(segment.text), len(word_rows), len(words))
+        for word in words:
+            word_rows.append((string_id(word.text), _ms(word.start),
+                              _ms(word.end), segment.speaker,
+                              word.confidence))
+    words = np.array(word_rows, dtype=WORD)
+
+    offsets = np.zeros(len(strings) + 1, dtype='<u4')
+    offsets[1:] = np.cumsum([len(s) for s in strings])
+
+    with open(path, 'xb') as f:
+        f.write(b'\0' * HEADER.size)
+        positions = []
+        for data in (offsets.tobytes(), b''.join(strings), names.tobytes(),
+                     segments.tobytes(), words.tobytes()):
+            positions.append(_align(f))
+            f.write(data)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(strings), len(names),
+                            len(segments), len(words), *positions))
+    return path
+
+
+class TranscriptFile(object):
+    """Read-only, memory-mapped view of a ``.dolly`` file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, string_count, name_count, segment_count, word_count,
+         offsets_at, strings_at, names_at, segments_at, words_at) = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + " is not a Dolly transcript file")
+
+        buffer = self._map
+        self.string_offsets = np.frombuffer(buffer, '<u4', string_count + 1,
+                                            offsets_at)
+        self._strings_at = strings_at
+        self.name_ids = np.frombuffer(buffer, '<u4', name_count, names_at)
+        self.segments = np.frombuffer(buffer, SEGMENT, segment_count,
+                                      segments_at)
+        self.words = np.frombuffer(buffer, WORD, word_count, words_at)
+
+    def close(self):
+        # Drop the array views first; the map can't close while exported.
+        self.string_offsets = self.name_ids = self.segments = self.words = None
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def string(self, string_id):
+        start = self._strings_at + int(self.string_offsets[string_id])
+        end = self._strings_at + int(self.string_offsets[string_id + 1])
+        return self._map[start:end].decode('utf-8')
+
+    @property
+    def names(self):
+        return [self.string(i) for i in self.name_ids]
+
+    def segment_words(self, index):
+        segment = self.segments[index]
+        first = int(segment['first_word'])
+        return self.words[first:first + int(segment['word_count'])]
+
+    def render(self):
+        """The ``speaker: text`` form written to the .txt export."""
+        names = self.names
+        return "".join(speaker_name(names, speaker) + self.string(text) + "\n"
+                       for speaker, text in zip(
+                           self.segments['speaker'].tolist(),
+                           self.segments['text'].tolist()))
+
+    def to_transcript(self):
+        """Decode everything back into a transcript.Transcript."""
+        meeting = Transcript(self.names)
+        for i, segment in enumerate(self.segments):
+            words = [Word(self.string(int(word['text'])),
+                          word['start'] / 1000.0, word['end'] / 1000.0,
+                          float(word['confidence']))
+                     for word in self.segment_words(i)]
+            meeting.append(int(segment['speaker']),
+                           self.string(int(segment['text'])),
+                           start=segment['start'] / 1000.0,
+                           end=segment['end'] / 1000.0, words=words)
+        return meeting
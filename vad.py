@@ -0,0 +1,205 @@
+"""Voice-activity gating of captured audio.
+
+A VoiceGate sits between the microphone and whatever sends the audio away
+(the streaming request generator, the segment uploader). It passes speech
+through and drops most of the silence, keeping a little before each onset
+and after each utterance so words aren't clipped. Every kept run is logged
+in a TimeMap, so times measured on the gated audio (word offsets in
+recognition results) can be mapped back to capture time.
+"""
+import bisect
+import collections
+
+import numpy as np
+
+from silence_split import SAMPLE_WIDTH, frame_energy_db
+
+
+class VoiceActivityDetector(object):
+    """Classifies fixed-size frames as speech or not.
+
+    A frame is speech when its level is ``threshold_db`` above the tracked
+    noise floor and its spectrum looks voiced: most energy in the speech band
+    and a low spectral flatness. Frames ``loud_db`` above the floor count as
+    speech regardless of their spectrum (plosives, fricatives). The noise
+    floor drops immediately to quieter frames and rises slowly, so it follows
+    the room rather than the talker.
+    """
+
+    def __init__(self, sample_rate, frame_ms=20, threshold_db=9, loud_db=20,
+                 max_flatness=0.45, min_band_ratio=0.5,
+                 initial_floor_db=-60, floor_rise_db=0.05, min_floor_db=-90):
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.loud_db = loud_db
+        self.max_flatness = max_flatness
+        self.min_band_ratio = min_band_ratio
+        self.floor_db = initial_floor_db
+        self.floor_rise_db = floor_rise_db
+        # Digital silence would otherwise pull the floor down to -200 dB.
+        self.min_floor_db = min_floor_db
+
+        frequencies = np.fft.rfftfreq(self.frame_samples, 1.0 / sample_rate)
+        self._band = (frequencies >= 300) & (frequencies <= 3400)
+        self._window = np.hanning(self.frame_samples).astype(np.float32)
+
+    def classify(self, samples):
+        """Return one bool per complete frame of int16 ``samples``."""
+        energy = frame_energy_db(samples, self.frame_samples)
+        if not len(energy):
+            return np.zeros(0, dtype=bool)
+        frames = samples[:len(energy) * self.frame_samples].reshape(
+            len(energy), self.frame_samples).astype(np.float32)
+        power = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2 + 1e-10
+        band = power[:, self._band]
+        band_ratio = band.sum(axis=1) / power.sum(axis=1)
+        flatness = np.exp(np.mean(np.log(band), axis=1)) / np.mean(band, axis=1)
+        voiced = (band_ratio >= self.min_band_ratio) \
+            & (flatness <= self.max_flatness)
+
+        # The floor depends on the previous frame; a few frames per chunk.
+        floors = np.empty(len(energy))
+        floor = self.floor_db
+        for i, level in enumerate(energy.tolist()):
+            floor = max(self.min_floor_db,
+                        min(level, floor + self.floor_rise_db))
+            floors[i] = floor
+        self.floor_db = floor
+
+        above = energy - floors
+        return ((above >= self.threshold_db) & voiced) \
+            | (above >= self.loud_db)
+
+
+class TimeMap(object):
+    """Maps offsets in gated audio back to offsets in the captured audio.
+
+    `start_sample` is where in the capture the gated audio began.
+    """
+
+    def __init__(self, sample_rate, start_sample=0):
+        self.sample_rate = sample_rate
+        self.start_sample = start_sample
+        # Parallel lists: where each kept run starts in the gated output and
+        # in the capture, in samples.
+        self._gated = []
+        self._source = []
+        self.gated_samples = 0
+
+    def keep(self, source_sample, count):
+        """Record that `count` samples from `source_sample` were kept."""
+        if not self._source or self._source[-1] + (
+                self.gated_samples - self._gated[-1]) != source_sample:
+            self._gated.append(self.gated_samples)
+            self._source.append(source_sample)
+        self.gated_samples += count
+
+    def __len__(self):
+        return len(self._gated)
+
+    def to_source(self, seconds):
+        """Capture time, in seconds, of `seconds` into the gated audio."""
+        sample = seconds * self.sample_rate
+        if not self._gated:
+            # Nothing was kept, so nothing can have been recognized; map
+            # from where the gate started rather than from the capture's
+            # start.
+            return (self.start_sample + sample) / float(self.sample_rate)
+        i = max(0, bisect.bisect_right(self._gated, sample) - 1)
+        return (self._source[i] + sample - self._gated[i]) \
+            / float(self.sample_rate)
+
+
+class VoiceGate(object):
+    """Passes speech through, drops silence beyond the padding around it.
+
+    ``preroll_ms`` of audio before each onset and ``hangover_ms`` after the
+    last speech frame are kept. So that a streaming call isn't closed for
+    lack of audio, one frame is let through after every ``keepalive_seconds``
+    of dropped silence (never if it is None). Speech frames are passed on as
+    soon as they arrive; only silence is held back, for the preroll.
+    """
+
+    def __init__(self, sample_rate, detector=None, preroll_ms=200,
+                 hangover_ms=300, keepalive_seconds=3, start_seconds=0):
+        if detector is None:
+            detector = VoiceActivityDetector(sample_rate)
+        self.detector = detector
+        self.sample_rate = sample_rate
+        self.frame_samples = detector.frame_samples
+        frame_ms = 1000.0 * self.frame_samples / sample_rate
+        self.hangover_frames = int(hangover_ms / frame_ms)
+        self.keepalive_frames = None
+        if keepalive_seconds:
+            self.keepalive_frames = int(keepalive_seconds * 1000 / frame_ms)
+        # Capture time of the first byte fed, so the time map gives times
+        # relative to the start of the capture rather than of this gate.
+        self._start_sample = int(round(start_seconds * sample_rate))
+        self.time_map = TimeMap(sample_rate, self._start_sample)
+
+        self._pending = bytearray()
+        self._preroll = collections.deque(maxlen=int(preroll_ms / frame_ms))
+        self._hangover = 0
+        self._dropped = 0  # frames dropped since the last one kept
+        self.frames = 0
+        self.kept_frames = 0
+
+    @property
+    def kept_ratio(self):
+        return self.kept_frames / float(self.frames) if self.frames else 1.0
+
+    def feed(self, data):
+        """Add captured audio; return the part of it that should be sent."""
+        self._pending += data
+        frame_bytes = self.frame_samples * SAMPLE_WIDTH
+        complete = len(self._pending) // frame_bytes
+        if not complete:
+            return b''
+        chunk = bytes(self._pending[:complete * frame_bytes])
+        del self._pending[:complete * frame_bytes]
+
+        speech = self.detector.classify(np.frombuffer(chunk, dtype='<i2'))
+        kept = []
+        for i, is_speech in enumerate(speech.tolist()):
+            frame = (self.frames, chunk[i * frame_bytes:(i + 1) * frame_bytes])
+            self.frames += 1
+            if is_speech:
+                while self._preroll:
+                    self._keep(kept, self._preroll.popleft())
+                self._keep(kept, frame)
+                self._hangover = self.hangover_frames
+            elif self._hangover:
+                self._keep(kept, frame)
+                self._hangover -= 1
+            else:
+                if len(self._preroll) == self._preroll.maxlen:
+                    oldest = self._preroll.popleft() if self._preroll.maxlen \
+                        else frame
+                    self._dropped += 1
+                    if self.keepalive_frames \
+                            and self._dropped >= self.keepalive_frames:
+                        self._keep(kept, oldest)
+                if self._preroll.maxlen:
+                    self._preroll.append(frame)
+        return b''.join(kept)
+
+    def skip(self, byte_count):
+        """Account for `byte_count` bytes of capture that were never fed.
+
+        Frames after the gap keep their capture times; the partial frame
+        held from before it, and any preroll, are discarded.
+        """
+        frame_bytes = self.frame_samples * SAMPLE_WIDTH
+        self.frames += (len(self._pending) + byte_count) // frame_bytes
+        del self._pending[:]
+        self._preroll.clear()
+        self._hangover = 0
+
+    def _keep(self, kept, frame):
+        index, data = frame
+        kept.append(data)
+        self.time_map.keep(self._start_sample + index * self.frame_samples,
+                           self.frame_samples)
+        self.kept_frames += 1
+        self._dropped = 0
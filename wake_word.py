@@ -0,0 +1,194 @@
+"""Waiting for "Hey Dolly" before a meeting starts.
+
+Usage: python wake_word.py enroll [--count 3]
+       python wake_word.py measure recording.wav
+
+The wake word is spotted locally (see keyword_spotter) against a few
+recordings of the user saying it, enrolled once and kept in
+``TEMPLATE_PATH``. Nothing is sent over the network until it is heard.
+"""
+import argparse
+import os
+import sys
+import time
+import wave
+
+import clients
+
+TEMPLATE_PATH = "output/wake_word.npz"
+SAMPLE_RATE = 16000
+CHUNK = SAMPLE_RATE // 10  # 100ms
+ENROLL_SECONDS = 2.5
+
+
+def record_utterance(stream, pause_seconds=0.8, max_seconds=10):
+    """Read from `stream` until someone has spoken and paused; return PCM.
+
+    Only the speech (with a little padding) is kept, see vad.VoiceGate.
+    """
+    import vad
+
+    gate = vad.VoiceGate(SAMPLE_RATE, keepalive_seconds=None)
+    speech = []
+    quiet = 0.0
+    for _ in range(int(max_seconds * SAMPLE_RATE / CHUNK)):
+        kept = gate.feed(stream.read(CHUNK, exception_on_overflow=False))
+        if kept:
+            speech.append(kept)
+            quiet = 0.0
+        elif speech:
+            quiet += CHUNK / float(SAMPLE_RATE)
+            if quiet >= pause_seconds:
+                break
+    return b''.join(speech)
+
+
+def listen_for(choices, language_code="en-US"):
+    """Block until one of `choices` is heard, and return it.
+
+    Each utterance is recognized with the shared speech client, hinted with
+    the choices, so short answers reuse the meeting's warm connection.
+    """
+    from google.api_core import exceptions
+    from google.cloud.speech_v1p1beta1 import enums
+    from google.cloud.speech_v1p1beta1 import types
+
+    # Worth asking again; anything else (bad credentials, a bad config)
+    # would fail every time.
+    transient = (exceptions.ServiceUnavailable, exceptions.DeadlineExceeded,
+                 exceptions.InternalServerError, exceptions.Aborted)
+    config = types.RecognitionConfig(
+        encoding=enums.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=SAMPLE_RATE,
+        language_code=language_code,
+        speech_contexts=[types.SpeechContext(phrases=list(choices))])
+    client = clients.speech_client()
+
+    stream = _open_stream()
+    try:
+        while True:
+            audio = record_utterance(stream)
+            if not audio:
+                continue
+            try:
+                response = client.recognize(
+                    config, types.RecognitionAudio(content=audio))
+            except transient:
+                continue
+            for result in response.results:
+                answer = result.alternatives[0].transcript.strip().lower()
+                print(answer)
+                if answer in choices:
+                    return answer
+    finally:
+        stream.stop_stream()
+        stream.close()
+
+
+def enrolled(path=TEMPLATE_PATH):
+    return os.path.exists(path)
+
+
+def _open_stream():
+    import pyaudio
+
+    return clients.audio_interface().open(format=pyaudio.paInt16,
+                                          channels=1,
+                                          rate=SAMPLE_RATE,
+                                          frames_per_buffer=CHUNK,
+                                          input=True)
+
+
+def enroll(count=3, path=TEMPLATE_PATH):
+    """Record the wake word `count` times and save the templates."""
+    import numpy as np
+    import keyword_spotter
+
+    recordings = []
+    stream = _open_stream()
+    try:
+        for i in range(count):
+            input("Press Enter, then say 'Hey Dolly' (%d/%d)" % (i + 1, count))
+            data = b''.join(stream.read(CHUNK) for _ in
+                            range(int(ENROLL_SECONDS * SAMPLE_RATE / CHUNK)))
+            recordings.append(np.frombuffer(data, dtype='<i2'))
+    finally:
+        stream.stop_stream()
+        stream.close()
+
+    templates = keyword_spotter.Templates.enroll(recordings, SAMPLE_RATE)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    templates.save(path)
+    return templates
+
+
+def wait_for_wake_word(path=TEMPLATE_PATH, sensitivity=0.5):
+    """Block until the enrolled wake word is heard; return the spotter.
+
+    The spotter's cpu_per_audio_second tells how much of a core listening
+    took.
+    """
+    import keyword_spotter
+
+    spotter = keyword_spotter.KeywordSpotter(
+        keyword_spotter.Templates.load(path), sensitivity=sensitivity)
+    stream = _open_stream()
+    try:
+        while not spotter.feed(stream.read(CHUNK,
+                                           exception_on_overflow=False)):
+            pass
+    finally:
+        stream.stop_stream()
+        stream.close()
+    return spotter
+
+
+def measure(filename, path=TEMPLATE_PATH, sensitivity=0.5):
+    """Run the spotter over a 16-bit mono WAV file as if it were live."""
+    import keyword_spotter
+
+    templates = keyword_spotter.Templates.load(path)
+    spotter = keyword_spotter.KeywordSpotter(templates,
+                                             sensitivity=sensitivity)
+    with wave.open(filename, 'rb') as f:
+        if f.getframerate() != templates.sample_rate or f.getnchannels() != 1:
+            raise ValueError("Expected %d Hz mono audio"
+                             % templates.sample_rate)
+        chunk = templates.sample_rate // 10
+        started = time.time()
+        while True:
+            data = f.readframes(chunk)
+            if not data:
+                break
+            if spotter.feed(data):
+                print("Heard at %.1f s" % spotter.audio_seconds)
+    print("%.1f s of audio in %.3f s; %.2f%% of a core per audio second"
+          % (spotter.audio_seconds, time.time() - started,
+             spotter.cpu_per_audio_second * 100))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command")
+    enroll_parser = commands.add_parser("enroll")
+    enroll_parser.add_argument("--count", type=int, default=3)
+    measure_parser = commands.add_parser("measure")
+    measure_parser.add_argument("filename")
+    for command in (enroll_parser, measure_parser):
+        command.add_argument("--templates", default=TEMPLATE_PATH)
+    measure_parser.add_argument("--sensitivity", type=float, default=0.5)
+    options = parser.parse_args(argv)
+
+    if options.command == "enroll":
+        enroll(options.count, options.templates)
+    elif options.command == "measure":
+        measure(options.filename, options.templates, options.sensitivity)
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()